@@ -1,19 +1,67 @@
 import datetime
-from typing import List, Dict, Any
+import importlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Sequence, Set, Tuple
 
 from database import Database, JSONDatabase
 from definitions import Game, FieldDefinition, Session, \
-    DatabaseKeys, FieldType, ConversionRateFieldNames, Currencies, \
+    FilterOperator, FilterCondition, VisualizeFilters, \
+    DatabaseKeys, FieldType, DefaultFieldNames, CustomFieldNames, ConversionRateFieldNames, ExchangeRateFieldNames, Currencies, \
     useExchangeRatesAPI, EXCHANGE_RATE_URL, DEFAULT_RMB_EXCHANGE_RATE
+from instrumentation import stats, timed
 
 from .utils import get_json_from_url
+from .rate_refresher import ConversionRateRefresher
+from .ingestion import RowError, validate_rows_in_parallel, PARALLEL_VALIDATION_MIN_ROWS
+from .aggregate import SessionAggregate
 
+# Submodules which need numpy or pyarrow load on first use, so scripts which only record sessions start fast
+LAZY_EXPORTS = {
+    'ExchangeRateTable': 'currency',
+    'ExportFormat': 'export',
+    'ID_COLUMN': 'export',
+    'read_npz_export': 'export',
+}
+
+def __getattr__(name: str):
+    if name not in LAZY_EXPORTS:
+        raise AttributeError(f'module {__name__} has no attribute {name}')
+    return getattr(importlib.import_module(f'.{LAZY_EXPORTS[name]}', __name__), name)
+
+
+# Tables the Backend keeps for itself, which are not Games
+INTERNAL_TABLE_NAMES = (
+    ConversionRateFieldNames.RMB_CONVERSION_RATE,
+    ExchangeRateFieldNames.EXCHANGE_RATES,
+)
+# Id of the one row of the RMB_CONVERSION_RATE table, writing it replaces the cached rate
+RMB_CONVERSION_RATE_ID = 'USD_RMB'
+# Most analytics results cached per Game, the least recently used is dropped first
+ANALYTICS_CACHE_SIZE = 32
+
+"""
+    Backend is safe to share between threads when constructed with db=ConcurrentDatabase
+"""
 class Backend:
 
     def __init__(self, db: Database=JSONDatabase, dbFileName=None):
         self.db = db(filename=dbFileName)
+        self.rateRefresher = None
+        self.rateRefresherLock = threading.Lock()
+        # { gameName: (analytics version, OrderedDict { key: result }) }, see get_cached_analytics
+        self.analyticsCache = {}
+        self.analyticsCacheLock = threading.Lock()
+        # { gameName: (table version, TextIndex) }, see get_search_index
+        self.searchIndexes = {}
+        self.searchIndexLock = threading.Lock()
         self.init_conversion_rate_cache()
 
+    # Stops background threads, pending writes are committed first
+    def close(self):
+        self.stop_rate_refresher()
+        self.db.close()
+
     def reset_database(self):
         self.db.reset_database()
         self.init_conversion_rate_cache()
@@ -31,25 +79,110 @@ class Backend:
             }
         })
 
+    # Created on first use, so databases without cached rate vectors keep their layout
+    def init_exchange_rates_table(self):
+        # No-op if the table already exists
+        self.db.create_table(ExchangeRateFieldNames.EXCHANGE_RATES, {
+            ExchangeRateFieldNames.BASE: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.TEXT,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            ExchangeRateFieldNames.CURRENCIES: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.LIST,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            ExchangeRateFieldNames.RATES: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.LIST,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            ExchangeRateFieldNames.COLLECTION_TIME: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.DATE,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            }
+        })
+
     def add_game(self, name: str, fields: List[FieldDefinition]) -> Game:
         # Game init may throw error on incorrect field type
         game = Game(name, fields)
         created = self.db.create_table(name, game.all_fields_as_dict())
         return created and game
 
+    """
+    Adds, drops and retypes fields of a Game, instantly whatever the number of sessions
+    The schema is versioned and stored sessions are upgraded when read: added fields take their default,
+        dropped fields disappear and retyped values are converted, None where they can't be
+    defaults: { fieldName: value } of added fields, given to the sessions stored before, required fields need one
+    Returns the altered Game
+    Raises ValueError if a default field is dropped or retyped, or the change doesn't fit the Game
+    """
+    @timed('backend.alter_game')
+    def alter_game(self, gameName: str, add: List[FieldDefinition]=None, drop: List[str]=None,
+                   retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> Game:
+        defaultFieldNames = { field.get_field_name() for field in Game.DefaultFields }
+        for fieldName in list(drop or []) + list(retype or {}):
+            if fieldName in defaultFieldNames:
+                raise ValueError(f'default field {fieldName} cannot be dropped or retyped')
+        self.db.alter_table(gameName, add, drop, retype, defaults)
+        return self.construct_game_from_db(gameName)
+
     def get_all_games(self) -> List[str]:
         allTables = self.db.get_all_table_names()
-        allTables.remove(ConversionRateFieldNames.RMB_CONVERSION_RATE)
-        return allTables
+        return [t for t in allTables if t not in INTERNAL_TABLE_NAMES]
 
+    @timed('backend.add_session')
     def add_session(self, session: Session, _id=None) -> str:
+        gameName = session.game.get_name()
+        versionBefore = self.get_search_index_version(gameName)
         # Game must already exists in db
-        return self.db.insert_row(session.game.get_name(), session.get_values(), _id=_id)
+        _id = self.db.insert_row(gameName, session.get_values(), _id=_id)
+        self.update_search_index(gameName, versionBefore, lambda index: index.add(_id, session.get_values()))
+        return _id
+
+    # Adds Sessions of one Game in a single database write
+    # Returns the uuids in the same order as sessions
+    @timed('backend.add_sessions')
+    def add_sessions(self, sessions: List[Session]) -> List[str]:
+        if not sessions:
+            return []
+        gameName = sessions[0].game.get_name()
+        if any(session.game.get_name() != gameName for session in sessions):
+            raise ValueError('sessions must all belong to the same game')
+        rows = [session.get_values() for session in sessions]
+        versionBefore = self.get_search_index_version(gameName)
+        ids = self.db.insert_rows(gameName, rows)
+        self.update_search_index(gameName, versionBefore, lambda index: index.add_rows(dict(zip(ids, rows))))
+        return ids
 
+    """
+    Validates raw field values of many sessions and adds the valid ones in a single database write
+    Large batches are validated in a pool of worker processes
+    strict: add nothing if any row is rejected
+    Returns (uuids aligned with rows, None for rejected rows; RowError per rejected row)
+    """
+    @timed('backend.add_session_values')
+    def add_session_values(self, gameName: str, rows: List[Dict[str, Any]], workers: int=None,
+                           executor=None, parallelMinRows: int=PARALLEL_VALIDATION_MIN_ROWS,
+                           strict: bool=False):
+        game = self.construct_game_from_db(gameName)
+        valid, errors = validate_rows_in_parallel(game, rows, workers=workers, executor=executor,
+                                                  parallelMinRows=parallelMinRows)
+        sessionIds = [None] * len(rows)
+        if valid and not (strict and errors):
+            versionBefore = self.get_search_index_version(gameName)
+            validRows = [fieldValues for _, fieldValues in valid]
+            insertedIds = self.db.insert_rows(gameName, validRows)
+            self.update_search_index(gameName, versionBefore,
+                                     lambda index: index.add_rows(dict(zip(insertedIds, validRows))))
+            for (index, _), _id in zip(valid, insertedIds):
+                sessionIds[index] = _id
+        return sessionIds, errors
+
+    @timed('backend.construct_game')
     def construct_game_from_db(self, gameName: str) -> Game:
         dbSchema = self.db.get_table_schema(gameName)
         return Game(gameName, dbSchema)
 
+    @timed('backend.get_sessions')
     def get_sessions(self, gameName: str, _filter) -> Dict[str, Session]:
 
         game = self.construct_game_from_db(gameName)
@@ -58,10 +191,19 @@ class Backend:
             _id: Session(game, fieldValues) for _id, fieldValues in dbRows.items()
         }
 
+    """
+    Returns the QueryPlan get_sessions follows to read the sessions of a Game satisfying _filter
+    analyze: also run the read, recording actual rows and timings per filter stage
+    Raises ValueError if the Game doesn't exist
+    """
+    def explain(self, gameName: str, _filter: VisualizeFilters=None, analyze: bool=False) -> 'QueryPlan':
+        return self.db.explain(gameName, _filter, analyze=analyze)
+
     def get_session_by_id(self, gameName: str, sessionId: str):
         sessions = self.get_sessions(gameName, _filter=None)
         return sessionId in sessions and sessions[sessionId]
 
+    @timed('backend.edit_session')
     def edit_session(self, gameName: str, sessionId: str, newValues: Dict[str, Any]):
         session = self.get_session_by_id(gameName, sessionId)
         if not session:
@@ -73,34 +215,335 @@ class Backend:
         newSession = Session(game, updatedNewValues)
         return self.add_session(newSession, _id=sessionId)
 
+    @timed('backend.delete_session')
     def delete_session(self, gameName: str, sessionId: str):
-        return self.db.delete_row(gameName, sessionId)
+        versionBefore = self.get_search_index_version(gameName)
+        deleted = self.db.delete_row(gameName, sessionId)
+        self.update_search_index(gameName, versionBefore, lambda index: index.remove(sessionId))
+        return deleted
 
-    def get_conversion_rate_from_cache(self):
-        cachedDbRows = self.db.get_all_rows(ConversionRateFieldNames.RMB_CONVERSION_RATE).values()
+    """
+    Returns the TextIndex of the TEXT fields of a Game's sessions
+    Built on first use, then kept up to date by the Backend's own writes
+    Rebuilt when the table was changed some other way, such as by another process
+    """
+    def get_search_index(self, gameName: str) -> 'TextIndex':
+        from .search import build_text_index
+
+        with self.searchIndexLock:
+            version = self.db.get_table_version(gameName)
+            cached = self.searchIndexes.get(gameName)
+            if version is not None and cached and cached[0] == version:
+                stats.count('backend.search_index_hits')
+                return cached[1]
+            stats.count('backend.search_index_builds')
+            fieldNames = [
+                field.get_field_name() for field in self.construct_game_from_db(gameName).fields
+                    if field.get_field_type() == FieldType.TEXT
+            ]
+            index = build_text_index(fieldNames, self.db.get_all_rows(gameName) or {})
+            if version is not None:
+                self.searchIndexes[gameName] = (version, index)
+            return index
+
+    # Version of the table the search index of gameName was built at, None if there is none
+    def get_search_index_version(self, gameName: str):
+        cached = self.searchIndexes.get(gameName)
+        return cached and cached[0]
+
+    """
+    Applies a write the Backend just made to the search index of gameName, update: TextIndex -> None
+    versionBefore: get_search_index_version before the write
+    The index is dropped instead when the table changed since it was built, it is rebuilt on next use
+    A write from another process landing between the Backend's write and this update goes unnoticed
+        until the table changes again
+    """
+    def update_search_index(self, gameName: str, versionBefore, update):
+        if versionBefore is None:
+            return
+        with self.searchIndexLock:
+            version = self.db.get_table_version(gameName)
+            cached = self.searchIndexes.get(gameName)
+            # The write changed nothing, such as deleting a missing session
+            if version == versionBefore:
+                return
+            if not cached or cached[0] != versionBefore:
+                self.searchIndexes.pop(gameName, None)
+                return
+            update(cached[1])
+            self.searchIndexes[gameName] = (version, cached[1])
+
+    """
+    Full-text search of the TEXT fields of a Game's sessions, such as NOTE
+    query: terms separated by spaces must all appear, OR between terms matches either side,
+        a term ending with * matches any word starting with it, e.g. 'bluff OR tilt* river'
+    Matching ignores case and punctuation
+    Returns the ids of the matching sessions
+    """
+    @timed('backend.search')
+    def search(self, gameName: str, query: str) -> Set[str]:
+        return self.get_search_index(gameName).search(query)
+
+    """
+    Exports sessions of a Game into a columnar file for analytics
+    format: one of ExportFormat, defaults to the file extension, or Parquet if pyarrow is installed and npz otherwise
+    columns: fields to export, defaults to ID_COLUMN followed by every field of the Game
+    TEXT and LIST columns are dictionary-encoded
+    Returns the number of sessions exported
+    """
+    @timed('backend.export')
+    def export(self, gameName: str, path: str, format: str=None, _filter: VisualizeFilters=None,
+               columns: List[str]=None) -> int:
+        from .export import ID_COLUMN, resolve_export_format, export_rows
+
+        schema = {
+            field.get_field_name(): field.get_field_type() for field in self.db.get_table_schema(gameName)
+        }
+        columns = columns or [ID_COLUMN] + list(schema)
+        for column in columns:
+            if column != ID_COLUMN and column not in schema:
+                raise ValueError(f'field {column} is not defined for game {gameName}')
+
+        exportFormat = resolve_export_format(path, format)
+        dbRows = self.db.get_rows_with_filter(gameName, _filter) or {}
+        return export_rows(dbRows.items(), path, { c: schema.get(c) for c in columns }, exportFormat)
+
+    """
+    Sums net earns, converted into target, and session lengths of a Game's sessions
+    groupBy: field to group sessions by, None aggregates all sessions together
+    Returns { group value: SessionAggregate }
+    Raises ValueError if groupBy is not a TEXT, NUMBER or DATE field of the Game
+    """
+    @timed('backend.aggregate')
+    def aggregate(self, gameName: str, groupBy: str=None, _filter: VisualizeFilters=None,
+                  target: str=Currencies.USD) -> Dict[Any, SessionAggregate]:
+        from .aggregate import aggregate_sessions
+
+        if groupBy:
+            _, field = self.construct_game_from_db(gameName).find_field_definition_by_name(groupBy)
+            if not field or field.get_field_type() == FieldType.LIST:
+                raise ValueError(f'cannot group sessions of game {gameName} by {groupBy}')
+
+        _, rows, netEarns, lengths = self._load_converted_rows(gameName, _filter, target)
+        if not rows:
+            return {}
+        return aggregate_sessions(netEarns, lengths, groupBy and [row.get(groupBy) for row in rows])
+
+    """
+    Reads a Game's sessions satisfying _filter and converts their net earns into target
+    Returns (ids, rows, net earns, lengths), in the same order
+    """
+    def _load_converted_rows(self, gameName: str, _filter: VisualizeFilters,
+                             target: str) -> Tuple[List[str], List[Dict[str, Any]], Sequence[float], List[float]]:
+        dbRows = self.db.get_rows_with_filter(gameName, _filter) or {}
+        rows = list(dbRows.values())
+        netEarns = self.convert(
+            [row[DefaultFieldNames.NET_EARN] for row in rows],
+            [row.get(CustomFieldNames.CURRENCY) for row in rows],
+            target,
+            [row.get(DefaultFieldNames.DATE) for row in rows]
+        ) if rows else []
+        return list(dbRows), rows, netEarns, [row.get(DefaultFieldNames.LENGTH) for row in rows]
+
+    """
+    Version of everything analytics of gameName are computed from: its table and the exchange rate tables
+    None if the database can't tell when the table of gameName changes
+    """
+    def get_analytics_version(self, gameName: str):
+        version = self.db.get_table_version(gameName)
+        if version is None:
+            return
+        return (version, *(self.db.get_table_version(tableName) for tableName in INTERNAL_TABLE_NAMES))
+
+    """
+    Returns compute(), reusing the result cached under (gameName, key) while its tables are unchanged
+    Keeps the ANALYTICS_CACHE_SIZE results of each Game used last, and drops them all when its tables change
+    Nothing is cached if the database can't tell when a table changes
+    """
+    def get_cached_analytics(self, gameName: str, key, compute):
+        version = self.get_analytics_version(gameName)
+        with self.analyticsCacheLock:
+            cached = self.analyticsCache.get(gameName)
+            results = cached and cached[0] == version and cached[1]
+            if version is not None and results and key in results:
+                stats.count('backend.analytics_cache_hits')
+                results.move_to_end(key)
+                return results[key]
+        stats.count('backend.analytics_cache_misses')
+        # The version is taken before computing, a write landing meanwhile invalidates the result
+        result = compute()
+        if version is None:
+            return result
+        with self.analyticsCacheLock:
+            cached = self.analyticsCache.get(gameName)
+            if not cached or cached[0] != version:
+                cached = (version, OrderedDict())
+                self.analyticsCache[gameName] = cached
+            results = cached[1]
+            results[key] = result
+            results.move_to_end(key)
+            while len(results) > ANALYTICS_CACHE_SIZE:
+                results.popitem(last=False)
+        return result
+
+    """
+    Returns the dated sessions of a Game sorted by date, net earns converted into target
+    Cached until the table changes
+    """
+    def get_session_series(self, gameName: str, _filter: VisualizeFilters=None,
+                           target: str=Currencies.USD) -> 'SessionSeries':
+        from .analytics import build_session_series, filter_cache_key
+
+        def load():
+            ids, rows, netEarns, lengths = self._load_converted_rows(gameName, _filter, target)
+            return build_session_series(ids, [row.get(DefaultFieldNames.DATE) for row in rows], netEarns, lengths)
+        return self.get_cached_analytics(gameName, ('series', filter_cache_key(_filter), target), load)
+
+    """
+    Time series metrics of a Game's dated sessions: daily, weekly and monthly totals,
+        rolling windows over the last sessionWindow sessions and the last dayWindow days,
+        max drawdown and longest losing streak, see analytics.Trends
+    Cached until the table changes
+    Raises ValueError if a window is below 1
+    """
+    @timed('backend.get_trends')
+    def get_trends(self, gameName: str, _filter: VisualizeFilters=None, sessionWindow: int=None,
+                   dayWindow: int=None, target: str=Currencies.USD) -> 'Trends':
+        from .analytics import compute_trends, filter_cache_key, DEFAULT_SESSION_WINDOW, DEFAULT_DAY_WINDOW
+
+        sessionWindow = sessionWindow or DEFAULT_SESSION_WINDOW
+        dayWindow = dayWindow or DEFAULT_DAY_WINDOW
+        return self.get_cached_analytics(
+            gameName, ('trends', filter_cache_key(_filter), target, sessionWindow, dayWindow),
+            lambda: compute_trends(self.get_session_series(gameName, _filter, target), sessionWindow, dayWindow)
+        )
+
+    """
+    Inverted index of a LIST field of a Game's sessions, such as PEOPLE or TAGS, net earns converted into target
+    Gives net earn, sessions and hours per listed value and how often values are listed together,
+        see list_index.ListFieldIndex
+    Cached until the table changes
+    Raises ValueError if fieldName is not a LIST field of the Game
+    """
+    @timed('backend.get_list_field_index')
+    def get_list_field_index(self, gameName: str, fieldName: str, _filter: VisualizeFilters=None,
+                             target: str=Currencies.USD) -> 'ListFieldIndex':
+        from .analytics import filter_cache_key
+        from .list_index import build_list_field_index
+
+        _, field = self.construct_game_from_db(gameName).find_field_definition_by_name(fieldName)
+        if not field or field.get_field_type() != FieldType.LIST:
+            raise ValueError(f'field {fieldName} of game {gameName} is not a LIST field')
+
+        def compute():
+            ids, rows, netEarns, lengths = self._load_converted_rows(gameName, _filter, target)
+            return build_list_field_index(fieldName, ids, [row.get(fieldName) for row in rows], netEarns, lengths)
+        return self.get_cached_analytics(
+            gameName, ('list_index', fieldName, filter_cache_key(_filter), target), compute
+        )
+
+    """
+    Variance, standard deviation per hour and bootstrap confidence intervals of the mean and hourly win rate
+        of a Game's sessions, net earns converted into target, see bankroll.BankrollStats
+    groupBy: field to group sessions by, None computes stats over all sessions together
+    The same seed gives the same intervals, resampling runs in worker processes for long histories
+    Cached until the table changes
+    Returns { group value: BankrollStats }
+    Raises ValueError if groupBy is not a TEXT, NUMBER or DATE field of the Game, or confidence is outside (0, 1)
+    """
+    @timed('backend.get_bankroll_stats')
+    def get_bankroll_stats(self, gameName: str, groupBy: str=None, _filter: VisualizeFilters=None,
+                           resamples: int=None, seed=0, confidence: float=None,
+                           target: str=Currencies.USD, workers: int=None) -> Dict[Any, 'BankrollStats']:
+        from .analytics import filter_cache_key
+        from .bankroll import compute_grouped_bankroll_stats, DEFAULT_RESAMPLES, DEFAULT_CONFIDENCE
+
+        resamples = resamples or DEFAULT_RESAMPLES
+        confidence = confidence or DEFAULT_CONFIDENCE
+        if not 0 < confidence < 1:
+            raise ValueError(f'confidence must be between 0 and 1, not {confidence}')
+        if groupBy:
+            _, field = self.construct_game_from_db(gameName).find_field_definition_by_name(groupBy)
+            if not field or field.get_field_type() == FieldType.LIST:
+                raise ValueError(f'cannot group sessions of game {gameName} by {groupBy}')
+
+        def compute():
+            _, rows, netEarns, lengths = self._load_converted_rows(gameName, _filter, target)
+            if not rows:
+                return {}
+            return compute_grouped_bankroll_stats(
+                netEarns, lengths, groupBy and [row.get(groupBy) for row in rows],
+                resamples, seed, confidence, workers
+            )
+        return self.get_cached_analytics(
+            gameName, ('bankroll', filter_cache_key(_filter), groupBy, target, resamples, seed, confidence), compute
+        )
+
+    # Returns (rate, collection date) of the cached conversion rate, or (None, None)
+    # The entry may be expired
+    def get_cached_rate_entry(self):
+        cachedDbRows = self.db.get_all_rows(ConversionRateFieldNames.RMB_CONVERSION_RATE)
         if len(cachedDbRows):
-            cachedDbEntry = list(cachedDbRows)[0]
-            rate, date = cachedDbEntry[ConversionRateFieldNames.RATE], cachedDbEntry[ConversionRateFieldNames.COLLECTION_TIME]
-            if date == str(datetime.date.today()):
-                return rate
+            # Databases written before RMB_CONVERSION_RATE_ID hold the rate under a random id
+            cachedDbEntry = cachedDbRows.get(RMB_CONVERSION_RATE_ID) or next(iter(cachedDbRows.values()))
+            return cachedDbEntry[ConversionRateFieldNames.RATE], cachedDbEntry[ConversionRateFieldNames.COLLECTION_TIME]
+        return None, None
 
-    def get_conversion_rate_from_api(self):
+    # A cached rate stays valid through its COLLECTION_TIME date
+    # which may be tomorrow if the rate was pre-fetched by the refresher
+    def get_conversion_rate_from_cache(self):
+        rate, date = self.get_cached_rate_entry()
+        if date and date >= str(datetime.date.today()):
+            stats.count('backend.rate_cache_hits')
+            return rate
+        stats.count('backend.rate_cache_misses')
+
+    # Fetches the full rate vector and caches it
+    # Returns { currency: rate } relative to the API's base currency, or None
+    def get_exchange_rates_from_api(self):
         res = get_json_from_url(EXCHANGE_RATE_URL)
         if res:
-            CNYRate = res['rates'][Currencies.CNY]
-            USDRate = res['rates'][Currencies.USD]
-            return CNYRate / USDRate
+            self.cache_exchange_rates(res['rates'], base=res.get('base', Currencies.EUR))
+            return res['rates']
 
-    def cache_exchange_rate(self, rate):
-        cachedDbRows = self.db.get_all_rows(ConversionRateFieldNames.RMB_CONVERSION_RATE)
-        for uuid in cachedDbRows:
-            self.db.delete_row(ConversionRateFieldNames.RMB_CONVERSION_RATE, uuid)
+    def get_conversion_rate_from_api(self):
+        rates = self.get_exchange_rates_from_api()
+        if rates:
+            return rates[Currencies.CNY] / rates[Currencies.USD]
+
+    # Replaces the cached rate in one write, readers never find the table empty
+    def cache_exchange_rate(self, rate, collectionDate: datetime.date=None):
+        collectionDate = collectionDate or datetime.date.today()
         self.db.insert_row(ConversionRateFieldNames.RMB_CONVERSION_RATE, {
             ConversionRateFieldNames.RATE: rate,
-            ConversionRateFieldNames.COLLECTION_TIME: str(datetime.date.today())
-        })
+            ConversionRateFieldNames.COLLECTION_TIME: str(collectionDate)
+        }, _id=RMB_CONVERSION_RATE_ID)
+        # Once, for databases written before RMB_CONVERSION_RATE_ID
+        for uuid in self.db.get_all_rows(ConversionRateFieldNames.RMB_CONVERSION_RATE):
+            if uuid != RMB_CONVERSION_RATE_ID:
+                self.db.delete_row(ConversionRateFieldNames.RMB_CONVERSION_RATE, uuid)
+
+    """
+    Starts refreshing the conversion rate in the background
+    While running, get_rmb_conversion_rate never blocks on the exchange rate API
+    """
+    def start_rate_refresher(self, **kwargs) -> ConversionRateRefresher:
+        with self.rateRefresherLock:
+            if not self.rateRefresher:
+                self.rateRefresher = ConversionRateRefresher(self, **kwargs)
+            self.rateRefresher.start()
+            return self.rateRefresher
+
+    def stop_rate_refresher(self):
+        with self.rateRefresherLock:
+            rateRefresher, self.rateRefresher = self.rateRefresher, None
+        if rateRefresher:
+            rateRefresher.stop()
 
     def get_rmb_conversion_rate(self):
+        rateRefresher = self.rateRefresher
+        if rateRefresher and rateRefresher.is_running():
+            return rateRefresher.get_rate()
         cachedRate = self.get_conversion_rate_from_cache()
         urlRate = None
         if cachedRate:
@@ -110,3 +553,60 @@ class Backend:
         returnRate = urlRate if urlRate else DEFAULT_RMB_EXCHANGE_RATE
         self.cache_exchange_rate(returnRate)
         return returnRate
+
+    """
+    Caches the rate vector of one API response under its collection date
+    Replaces any vector previously cached for the same date
+    """
+    def cache_exchange_rates(self, rates: Dict[str, float], base: str, collectionDate: datetime.date=None):
+        collectionDate = str(collectionDate or datetime.date.today())
+        self.init_exchange_rates_table()
+        sameDateRows = self.db.get_rows_with_filter(ExchangeRateFieldNames.EXCHANGE_RATES, VisualizeFilters({
+            ExchangeRateFieldNames.COLLECTION_TIME: [FilterCondition(FilterOperator.EQUAL, collectionDate)]
+        }))
+        for uuid in sameDateRows or {}:
+            self.db.delete_row(ExchangeRateFieldNames.EXCHANGE_RATES, uuid)
+
+        currencies = sorted(rates)
+        self.db.insert_row(ExchangeRateFieldNames.EXCHANGE_RATES, {
+            ExchangeRateFieldNames.BASE: base,
+            ExchangeRateFieldNames.CURRENCIES: currencies,
+            ExchangeRateFieldNames.RATES: [float(rates[c]) for c in currencies],
+            ExchangeRateFieldNames.COLLECTION_TIME: collectionDate
+        })
+
+    """
+    Builds the exchange rate table from all cached rate vectors
+    Falls back to the cached USD/RMB rate, expired or not, if no vector has been cached yet
+    Only goes to the API when nothing is cached, keeping the cache fresh is up to
+        get_rmb_conversion_rate and the rate refresher
+    """
+    @timed('backend.exchange_rate_table')
+    def get_exchange_rate_table(self) -> 'ExchangeRateTable':
+        from .currency import ExchangeRateTable
+
+        cachedDbRows = self.db.get_all_rows(ExchangeRateFieldNames.EXCHANGE_RATES) or {}
+        rateVectors = {}
+        for row in cachedDbRows.values():
+            rates = zip(row[ExchangeRateFieldNames.CURRENCIES], row[ExchangeRateFieldNames.RATES])
+            rateVectors[row[ExchangeRateFieldNames.COLLECTION_TIME]] = dict(rates)
+        if not rateVectors:
+            rmbRate, collectionDate = self.get_cached_rate_entry()
+            if rmbRate is None:
+                rmbRate, collectionDate = self.get_rmb_conversion_rate(), str(datetime.date.today())
+            rateVectors[collectionDate] = {
+                Currencies.USD: 1,
+                Currencies.CNY: rmbRate
+            }
+        return ExchangeRateTable.from_rate_vectors(rateVectors)
+
+    """
+    Converts values recorded in currencies into target, in bulk
+    dates, if provided, selects the rate vector collected closest before each value
+    Returns a numpy array aligned with values
+    Raises ValueError on a currency without a known rate
+    """
+    @timed('backend.convert')
+    def convert(self, values: Sequence[float], currencies: Sequence[str],
+                target: str=Currencies.USD, dates: Sequence[str]=None) -> 'numpy.ndarray':
+        return self.get_exchange_rate_table().convert(values, currencies, target, dates)
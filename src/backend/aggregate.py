@@ -0,0 +1,44 @@
+from typing import Any, Dict, NamedTuple, Sequence
+
+
+class SessionAggregate(NamedTuple):
+    sessions: int
+    netEarn: float
+    # Net earn and hours of the sessions which recorded their length
+    timedNetEarn: float
+    hours: float
+
+    # Hourly win over the timed sessions, None without any recorded hours
+    def get_hourly(self):
+        return self.timedNetEarn / self.hours if self.hours else None
+
+
+"""
+Sums net earns and session lengths per group in bulk
+groups: group of each session, None groups every session together
+lengths: hours of each session, None where not recorded
+Returns { group: SessionAggregate }, in order of first appearance
+"""
+def aggregate_sessions(netEarns: Sequence[float], lengths: Sequence[float],
+                       groups: Sequence[Any]=None) -> Dict[Any, SessionAggregate]:
+    # SessionAggregate is imported by the service client, which should not pay for numpy
+    import numpy as np
+
+    netEarns = np.asarray(netEarns, dtype=float)
+    lengths = np.array([np.nan if length is None else length for length in lengths], dtype=float)
+    groupCodes = {}
+    codes = np.array([groupCodes.setdefault(g, len(groupCodes)) for g in groups], dtype=np.intp) \
+        if groups is not None else np.zeros(len(netEarns), dtype=np.intp)
+    groupCount = len(groupCodes) if groups is not None else int(len(netEarns) > 0)
+
+    timed = ~np.isnan(lengths)
+    sessions = np.bincount(codes, minlength=groupCount)
+    netEarn = np.bincount(codes, weights=netEarns, minlength=groupCount)
+    timedNetEarn = np.bincount(codes[timed], weights=netEarns[timed], minlength=groupCount)
+    hours = np.bincount(codes[timed], weights=lengths[timed], minlength=groupCount)
+
+    groupNames = list(groupCodes) if groups is not None else [None] * groupCount
+    return {
+        group: SessionAggregate(int(sessions[i]), float(netEarn[i]), float(timedNetEarn[i]), float(hours[i]))
+        for i, group in enumerate(groupNames)
+    }
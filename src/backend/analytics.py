@@ -0,0 +1,190 @@
+import json
+from typing import Any, List, NamedTuple, Sequence
+
+from definitions import VisualizeFilters
+
+from .timeseries import Bucket, bucket_starts, to_datetime64
+
+# numpy is imported inside each function, importing the backend must not load it
+
+
+DEFAULT_SESSION_WINDOW = 20
+DEFAULT_DAY_WINDOW = 30
+
+
+"""
+    SessionSeries is the dated sessions of a Game, sorted by date, as columns
+    Sessions without a DATE are left out, sessions of the same day keep their insertion order
+
+    Attributes:
+    - ids: List[str] : Session ids
+    - dates: numpy.ndarray : datetime64[D] date of each session
+    - netEarns: numpy.ndarray : Net earn of each session, converted into one currency
+    - lengths: numpy.ndarray : Hours of each session, NaN where not recorded
+"""
+class SessionSeries(NamedTuple):
+    ids: List[str]
+    dates: Any
+    netEarns: Any
+    lengths: Any
+
+class BucketTotals(NamedTuple):
+    # datetime64[D] start of every bucket with sessions
+    starts: Any
+    netEarn: Any
+    sessions: Any
+    hours: Any
+
+"""
+    RollingWindow holds, for every session, metrics over the window of sessions ending with it
+    winRate: fraction of the window's sessions with a positive net earn
+    hourly: net earn per hour over the window's timed sessions, NaN without recorded hours
+"""
+class RollingWindow(NamedTuple):
+    netEarn: Any
+    winRate: Any
+    hourly: Any
+
+class Drawdown(NamedTuple):
+    # Largest fall of the cumulative net earn from a previous high
+    amount: float
+    # Dates of the high and of the low, None for a high before the first session
+    peakDate: str
+    troughDate: str
+
+class Streak(NamedTuple):
+    sessions: int
+    startDate: str
+    endDate: str
+
+"""
+    Trends is every time series metric of a SessionSeries, see compute_trends
+    Per-session arrays are aligned with the SessionSeries
+"""
+class Trends(NamedTuple):
+    dates: Any
+    cumulative: Any
+    daily: BucketTotals
+    weekly: BucketTotals
+    monthly: BucketTotals
+    sessionWindow: int
+    rollingSessions: RollingWindow
+    dayWindow: int
+    rollingDays: RollingWindow
+    maxDrawdown: Drawdown
+    longestLosingStreak: Streak
+
+
+# Cache key part identifying a filter, equal filters give equal keys
+def filter_cache_key(_filter: VisualizeFilters) -> str:
+    if not _filter:
+        return ''
+    return json.dumps(sorted(
+        (column, condition.operator.value, condition.operand, condition.negate)
+            for column, conditions in _filter.filters.items() for condition in conditions
+    ), default=str)
+
+"""
+Sorts sessions by date into a SessionSeries
+Sessions without a date are left out
+"""
+def build_session_series(ids: Sequence[str], dates: Sequence[str], netEarns: Sequence[float],
+                         lengths: Sequence[float]) -> SessionSeries:
+    import numpy as np
+
+    dates = to_datetime64(dates)
+    lengths = np.array([np.nan if length is None else length for length in lengths], dtype=float)
+    dated = np.flatnonzero(~np.isnat(dates))
+    order = dated[np.argsort(dates[dated], kind='stable')]
+    return SessionSeries(
+        [ids[i] for i in order], dates[order], np.asarray(netEarns, dtype=float)[order], lengths[order]
+    )
+
+def bucket_totals(series: SessionSeries, bucket: str) -> BucketTotals:
+    import numpy as np
+
+    timed = ~np.isnan(series.lengths)
+    starts, codes = np.unique(bucket_starts(series.dates, bucket), return_inverse=True)
+    codes = codes.ravel()
+    return BucketTotals(
+        starts,
+        np.bincount(codes, weights=series.netEarns, minlength=len(starts)),
+        np.bincount(codes, minlength=len(starts)),
+        np.bincount(codes[timed], weights=series.lengths[timed], minlength=len(starts)),
+    )
+
+"""
+Metrics of the windows of sessions [starts[i], i], from prefix sums
+Each prefix sum has a leading 0, so prefix[i + 1] - prefix[start] sums sessions start to i
+"""
+def window_metrics(starts, cumulativeNet, cumulativeWins, cumulativeTimedNet, cumulativeHours) -> RollingWindow:
+    import numpy as np
+
+    ends = np.arange(1, len(cumulativeNet))
+    hours = cumulativeHours[ends] - cumulativeHours[starts]
+    timedNet = cumulativeTimedNet[ends] - cumulativeTimedNet[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hourly = np.where(hours > 0, timedNet / hours, np.nan)
+    return RollingWindow(
+        cumulativeNet[ends] - cumulativeNet[starts],
+        (cumulativeWins[ends] - cumulativeWins[starts]) / (ends - starts),
+        hourly,
+    )
+
+def get_max_drawdown(dates, cumulativeNet) -> Drawdown:
+    import numpy as np
+
+    # cumulativeNet starts with the 0 before the first session
+    drawdowns = np.maximum.accumulate(cumulativeNet) - cumulativeNet
+    trough = int(np.argmax(drawdowns))
+    if not drawdowns[trough]:
+        return Drawdown(0.0, None, None)
+    peak = int(np.argmax(cumulativeNet[:trough + 1]))
+    return Drawdown(float(drawdowns[trough]), str(dates[peak - 1]) if peak else None, str(dates[trough - 1]))
+
+def get_longest_losing_streak(dates, netEarns) -> Streak:
+    import numpy as np
+
+    losing = np.concatenate(([0], (netEarns < 0).astype(np.int8), [0]))
+    edges = np.diff(losing)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    if not len(starts):
+        return Streak(0, None, None)
+    longest = int(np.argmax(ends - starts))
+    return Streak(int(ends[longest] - starts[longest]), str(dates[starts[longest]]), str(dates[ends[longest] - 1]))
+
+"""
+Computes every Trends metric from one set of prefix sums over the date-sorted sessions
+sessionWindow: rolling windows span the last sessionWindow sessions
+dayWindow: rolling windows span the sessions of the last dayWindow days, the session's day included
+"""
+def compute_trends(series: SessionSeries, sessionWindow: int=DEFAULT_SESSION_WINDOW,
+                   dayWindow: int=DEFAULT_DAY_WINDOW) -> Trends:
+    import numpy as np
+
+    if sessionWindow < 1 or dayWindow < 1:
+        raise ValueError('windows must span at least one session and one day')
+    netEarns, lengths = series.netEarns, series.lengths
+    timed = ~np.isnan(lengths)
+    prefix = lambda values: np.concatenate(([0], np.cumsum(values)))
+    cumulativeNet = prefix(netEarns)
+    prefixSums = (
+        cumulativeNet, prefix(netEarns > 0), prefix(np.where(timed, netEarns, 0)), prefix(np.where(timed, lengths, 0))
+    )
+
+    indices = np.arange(len(netEarns))
+    sessionStarts = np.maximum(indices + 1 - sessionWindow, 0)
+    dayStarts = np.searchsorted(series.dates, series.dates - np.timedelta64(dayWindow - 1, 'D'), side='left')
+    return Trends(
+        series.dates,
+        cumulativeNet[1:],
+        bucket_totals(series, Bucket.DAY),
+        bucket_totals(series, Bucket.WEEK),
+        bucket_totals(series, Bucket.MONTH),
+        sessionWindow,
+        window_metrics(sessionStarts, *prefixSums),
+        dayWindow,
+        window_metrics(dayStarts, *prefixSums),
+        get_max_drawdown(series.dates, cumulativeNet),
+        get_longest_losing_streak(series.dates, netEarns),
+    )
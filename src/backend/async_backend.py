@@ -0,0 +1,110 @@
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Tuple
+
+from definitions import Session, VisualizeFilters, Currencies
+
+from . import Backend
+from .aggregate import SessionAggregate
+from .currency import ExchangeRateTable
+
+
+"""
+    AsyncBackend exposes a Backend to asyncio code
+    Blocking disk and network calls run in an executor, so the event loop is never stalled
+    Sessions added concurrently are coalesced into one database write per Game
+    Concurrent rate lookups share a single fetch
+
+    Attributes:
+    - backend: Backend : The Backend calls are delegated to
+    - executor: Executor : Where blocking calls run, None for the event loop's default executor
+"""
+class AsyncBackend:
+
+    def __init__(self, backend: Backend=None, executor: Executor=None, **backendKwargs):
+        self.backend = backend or Backend(**backendKwargs)
+        self.executor = executor
+        self.pendingSessions: List[Tuple[Session, asyncio.Future]] = []
+        self.flushTask = None
+        self.rateTask = None
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # Waits for pending sessions to be written and closes the Backend
+    async def close(self):
+        if self.flushTask:
+            await self.flushTask
+        await self.run(self.backend.close)
+
+    """
+    Adds a Session, returns its uuid once it is written
+    Sessions added while a write is pending join the next write
+    """
+    async def add_session(self, session: Session) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self.pendingSessions.append((session, future))
+        if not self.flushTask:
+            self.flushTask = asyncio.ensure_future(self.flush_sessions())
+        return await future
+
+    async def flush_sessions(self):
+        try:
+            # Lets sessions added in the same iteration of the event loop join the first write
+            await asyncio.sleep(0)
+            while self.pendingSessions:
+                pending, self.pendingSessions = self.pendingSessions, []
+                byGame = {}
+                for session, future in pending:
+                    byGame.setdefault(session.game.get_name(), []).append((session, future))
+                for gamePending in byGame.values():
+                    await self.write_sessions(gamePending)
+        finally:
+            self.flushTask = None
+
+    async def write_sessions(self, pending: List[Tuple[Session, asyncio.Future]]):
+        try:
+            sessionIds = await self.run(self.backend.add_sessions, [session for session, _ in pending])
+        except Exception as e:
+            if len(pending) == 1:
+                sessionIds = [e]
+            else:
+                # add_sessions writes all or nothing, so retry one by one to fail only the bad sessions
+                for onePending in pending:
+                    await self.write_sessions([onePending])
+                return
+        for (_, future), result in zip(pending, sessionIds):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def get_sessions(self, gameName: str, _filter: VisualizeFilters) -> Dict[str, Session]:
+        return await self.run(self.backend.get_sessions, gameName, _filter)
+
+    async def delete_session(self, gameName: str, sessionId: str):
+        return await self.run(self.backend.delete_session, gameName, sessionId)
+
+    """
+    Returns the USD/RMB conversion rate
+    Concurrent callers share one lookup, which only goes to the API when the cached rate expired
+    """
+    async def get_rmb_conversion_rate(self) -> float:
+        if not self.rateTask:
+            self.rateTask = asyncio.ensure_future(self.run(self.backend.get_rmb_conversion_rate))
+            self.rateTask.add_done_callback(self.clear_rate_task)
+        return await asyncio.shield(self.rateTask)
+
+    def clear_rate_task(self, _):
+        self.rateTask = None
+
+    async def get_exchange_rate_table(self) -> ExchangeRateTable:
+        return await self.run(self.backend.get_exchange_rate_table)
+
+    async def aggregate(self, gameName: str, groupBy: str=None, _filter: VisualizeFilters=None,
+                        target: str=Currencies.USD) -> Dict[Any, SessionAggregate]:
+        return await self.run(self.backend.aggregate, gameName, groupBy, _filter, target)
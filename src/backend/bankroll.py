@@ -0,0 +1,183 @@
+import concurrent.futures
+import os
+from concurrent.futures import Executor
+from typing import Any, Dict, NamedTuple, Sequence
+
+# numpy is imported inside each function, importing the backend must not load it
+
+
+DEFAULT_RESAMPLES = 10000
+DEFAULT_CONFIDENCE = 0.95
+# Session draws per bootstrap chunk, the unit of work given to a worker process
+BOOTSTRAP_CHUNK_DRAWS = 1 << 22
+# Session draws resampled at once within a chunk, small enough for the indices and counts to stay in the CPU cache
+BOOTSTRAP_BLOCK_DRAWS = 1 << 18
+# Below this many draws in total, resampling stays in-process, pool start-up outweighs the gain
+PARALLEL_BOOTSTRAP_MIN_DRAWS = 1 << 24
+
+
+class ConfidenceInterval(NamedTuple):
+    estimate: float
+    low: float
+    high: float
+    confidence: float
+
+
+"""
+    BankrollStats summarises the results of a group of sessions
+
+    Attributes:
+    - sessions: int : Number of sessions
+    - netEarn: float : Total net earn
+    - meanPerSession: ConfidenceInterval : Mean net earn per session, with its bootstrap interval
+    - variancePerSession: float : Sample variance of the net earn per session, None below 2 sessions
+    - stdPerSession: float : Standard deviation of the net earn per session, None below 2 sessions
+    - hours: float : Hours of the sessions which recorded their length
+    - hourly: ConfidenceInterval : Win rate per hour over the timed sessions, with its bootstrap interval,
+        None without recorded hours
+    - stdPerHour: float : Standard deviation per hour, None without recorded hours
+        Results are assumed to vary linearly with time played, so it is
+        sqrt(sum((netEarn - hourly * length) ** 2) / hours) over the timed sessions
+"""
+class BankrollStats(NamedTuple):
+    sessions: int
+    netEarn: float
+    meanPerSession: ConfidenceInterval
+    variancePerSession: float
+    stdPerSession: float
+    hours: float
+    hourly: ConfidenceInterval
+    stdPerHour: float
+
+
+# seed: an int, or a numpy SeedSequence spawned from one
+def to_seed_sequence(seed) -> 'numpy.random.SeedSequence':
+    import numpy as np
+
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+"""
+Column totals of resamples of the sessions drawn with replacement
+columns: (sessions, k) array, one row per session
+Each resample's draws are turned into a count per session, so every column is summed by one matrix product
+Resamples are drawn in blocks of about BOOTSTRAP_BLOCK_DRAWS, which halves the time of drawing them all at once
+    by keeping the indices and counts in the CPU cache
+Runs in worker processes, so it must stay a module-level function
+Returns a (resamples, k) array
+"""
+def bootstrap_totals_chunk(columns, resamples: int, seed) -> 'numpy.ndarray':
+    import numpy as np
+
+    count = len(columns)
+    rng = np.random.default_rng(seed)
+    blockSize = max(1, BOOTSTRAP_BLOCK_DRAWS // max(1, count))
+    totals = np.empty((resamples, columns.shape[1]))
+    for start in range(0, resamples, blockSize):
+        block = min(blockSize, resamples - start)
+        indices = rng.integers(0, count, size=(block, count), dtype=np.int64)
+        # Offsets each resample's draws into its own row of the counts matrix
+        indices += np.arange(0, block * count, count, dtype=np.int64)[:, None]
+        counts = np.bincount(indices.ravel(), minlength=block * count).reshape(block, count)
+        totals[start:start + block] = counts @ columns
+    return totals
+
+"""
+Bootstrap distribution of the column totals of sessions, see bootstrap_totals_chunk
+The same seed gives the same totals, however many workers share the work
+Chunks are resampled in a process pool when there are enough draws and workers allows it
+The cost grows with resamples x sessions: on one core, 10k resamples take about 0.1s for 1k sessions,
+    0.6s for 5k and 2.7s for 20k, of which drawing the indices alone is about 1s
+    Histories beyond about 5k sessions stay under a second only when the pool has several cores
+"""
+def bootstrap_totals(columns, resamples: int=DEFAULT_RESAMPLES, seed=0, workers: int=None,
+                     executor: Executor=None) -> 'numpy.ndarray':
+    import numpy as np
+
+    columns = np.asarray(columns, dtype=float)
+    chunkSize = max(1, BOOTSTRAP_CHUNK_DRAWS // max(1, len(columns)))
+    chunks = [min(chunkSize, resamples - start) for start in range(0, resamples, chunkSize)]
+    seeds = to_seed_sequence(seed).spawn(len(chunks))
+    args = ([columns] * len(chunks), chunks, seeds)
+
+    workers = workers or os.cpu_count() or 1
+    if executor:
+        results = executor.map(bootstrap_totals_chunk, *args)
+    elif workers == 1 or len(chunks) == 1 or resamples * len(columns) < PARALLEL_BOOTSTRAP_MIN_DRAWS:
+        results = map(bootstrap_totals_chunk, *args)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(bootstrap_totals_chunk, *args))
+    return np.concatenate(list(results))
+
+def percentile_interval(estimate: float, ratios, confidence: float) -> ConfidenceInterval:
+    import numpy as np
+
+    tail = (1 - confidence) / 2 * 100
+    # A resample without timed sessions has no hourly rate, it is NaN
+    low, high = np.nanpercentile(ratios, [tail, 100 - tail])
+    return ConfidenceInterval(float(estimate), float(low), float(high), confidence)
+
+"""
+Computes BankrollStats of sessions
+lengths: hours of each session, None or NaN where not recorded
+Raises ValueError without sessions or with confidence outside (0, 1)
+"""
+def compute_bankroll_stats(netEarns: Sequence[float], lengths: Sequence[float],
+                           resamples: int=DEFAULT_RESAMPLES, seed=0, confidence: float=DEFAULT_CONFIDENCE,
+                           workers: int=None, executor: Executor=None) -> BankrollStats:
+    import numpy as np
+
+    if not 0 < confidence < 1:
+        raise ValueError(f'confidence must be between 0 and 1, not {confidence}')
+    netEarns = np.asarray(netEarns, dtype=float)
+    if not len(netEarns):
+        raise ValueError('no sessions to compute bankroll stats of')
+    lengths = np.array([np.nan if length is None else length for length in lengths], dtype=float)
+    timed = ~np.isnan(lengths) & (np.nan_to_num(lengths) > 0)
+    timedLengths = np.where(timed, lengths, 0)
+    timedNetEarns = np.where(timed, netEarns, 0)
+    hours = float(timedLengths.sum())
+
+    # One resampling serves both intervals, untimed sessions add nothing to the hourly totals
+    totals = bootstrap_totals(np.stack([netEarns, timedNetEarns, timedLengths], axis=1),
+                              resamples, seed, workers, executor)
+    variance = float(netEarns.var(ddof=1)) if len(netEarns) > 1 else None
+    meanPerSession = percentile_interval(netEarns.mean(), totals[:, 0] / len(netEarns), confidence)
+
+    hourly = stdPerHour = None
+    if hours:
+        rate = timedNetEarns.sum() / hours
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hourlyRates = np.where(totals[:, 2] > 0, totals[:, 1] / totals[:, 2], np.nan)
+        hourly = percentile_interval(rate, hourlyRates, confidence)
+        stdPerHour = float(np.sqrt(((timedNetEarns - rate * timedLengths) ** 2).sum() / hours))
+
+    return BankrollStats(
+        len(netEarns), float(netEarns.sum()), meanPerSession,
+        variance, variance ** 0.5 if variance is not None else None,
+        hours, hourly, stdPerHour,
+    )
+
+"""
+Computes BankrollStats per group of sessions, see compute_bankroll_stats
+groups: group of each session, None computes one BankrollStats under None
+Each group resamples with its own seed derived from seed, in order of first appearance
+Returns { group: BankrollStats }
+"""
+def compute_grouped_bankroll_stats(netEarns: Sequence[float], lengths: Sequence[float], groups: Sequence[Any]=None,
+                                   resamples: int=DEFAULT_RESAMPLES, seed=0,
+                                   confidence: float=DEFAULT_CONFIDENCE, workers: int=None,
+                                   executor: Executor=None) -> Dict[Any, BankrollStats]:
+    import numpy as np
+
+    groupIndices = {}
+    for index, group in enumerate(groups if groups is not None else [None] * len(netEarns)):
+        groupIndices.setdefault(group, []).append(index)
+    netEarns = np.asarray(netEarns, dtype=float)
+    lengths = np.array([np.nan if length is None else length for length in lengths], dtype=float)
+    seeds = to_seed_sequence(seed).spawn(len(groupIndices))
+    return {
+        group: compute_bankroll_stats(netEarns[indices], lengths[indices], resamples, groupSeed,
+                                      confidence, workers, executor)
+        for (group, indices), groupSeed in zip(groupIndices.items(), seeds)
+    }
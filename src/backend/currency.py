@@ -0,0 +1,102 @@
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from definitions import CURRENCY_ALIASES
+
+from .timeseries import to_datetime64
+
+
+def normalize_currency(currency: str) -> str:
+    return CURRENCY_ALIASES.get(currency, currency)
+
+"""
+    ExchangeRateTable holds one exchange rate vector per collection date
+    Converts values between any pair of known currencies in bulk
+
+    Attributes:
+    - dates: np.ndarray[datetime64[D]] : Collection dates, ascending
+    - currencies: List[str] : ISO code of each rate column
+    - rates: np.ndarray[float] : rates[i, j] is units of currencies[j] per unit of base on dates[i]
+"""
+class ExchangeRateTable:
+
+    def __init__(self, dates: Sequence[str], currencies: List[str], rates: np.ndarray):
+        dates = to_datetime64(dates)
+        order = np.argsort(dates, kind='stable')
+        self.dates = dates[order]
+        self.currencies = list(currencies)
+        self.currencyIndex = { c: i for i, c in enumerate(self.currencies) }
+        self.rates = fill_missing_rates(np.asarray(rates, dtype=float)[order])
+
+    """
+    Builds a table from rate vectors which may each list different currencies
+    rateVectors: { date: { currency: rate } }
+    """
+    @classmethod
+    def from_rate_vectors(cls, rateVectors: Dict[str, Dict[str, float]]) -> 'ExchangeRateTable':
+        currencies = sorted({ c for rates in rateVectors.values() for c in rates })
+        currencyIndex = { c: i for i, c in enumerate(currencies) }
+        matrix = np.full((len(rateVectors), len(currencies)), np.nan)
+        for row, rates in enumerate(rateVectors.values()):
+            for currency, rate in rates.items():
+                matrix[row, currencyIndex[currency]] = rate
+        return cls(list(rateVectors.keys()), currencies, matrix)
+
+    def get_currency_indices(self, currencies: np.ndarray) -> np.ndarray:
+        uniques, inverse = np.unique(currencies, return_inverse=True)
+        uniqueIndices = np.empty(len(uniques), dtype=np.intp)
+        for i, currency in enumerate(uniques):
+            normalized = normalize_currency(currency)
+            if normalized not in self.currencyIndex:
+                raise ValueError(f'no exchange rate known for currency {currency}')
+            uniqueIndices[i] = self.currencyIndex[normalized]
+        return uniqueIndices[inverse.reshape(-1)]
+
+    """
+    Converts values recorded in currencies into target
+    Each value uses the latest rate vector collected on or before its date
+        or the earliest vector if it predates all of them
+    Values without a date use the latest vector
+    Values without a currency are taken to be in target already
+    Raises ValueError on a currency without a known rate
+    """
+    def convert(self, values: Sequence[float], currencies: Sequence[str], target: str,
+                dates: Sequence[str]=None) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return values
+
+        currencyArray = np.asarray(currencies, dtype=object)
+        currencyArray[currencyArray == None] = target
+        fromIndices = self.get_currency_indices(currencyArray.astype(str))
+        toIndex = self.get_currency_indices(np.asarray([target]))[0]
+
+        if dates is None:
+            dateIndices = np.full(len(values), len(self.dates) - 1)
+        else:
+            # NaT sorts last, so values without a date land on the latest vector
+            dateArray = to_datetime64(dates)
+            dateIndices = np.searchsorted(self.dates, dateArray, side='right') - 1
+            dateIndices = np.clip(dateIndices, 0, len(self.dates) - 1)
+
+        converted = values / self.rates[dateIndices, fromIndices] * self.rates[dateIndices, toIndex]
+        return np.where(fromIndices == toIndex, values, converted)
+
+
+# Fills each missing rate from the nearest earlier vector, or the nearest later one
+# Vectors may use different bases, so they are first rebased onto a currency they all share
+# Raises ValueError if the vectors share no currency
+def fill_missing_rates(rates: np.ndarray) -> np.ndarray:
+    sharedColumns = np.flatnonzero(~np.isnan(rates).any(axis=0))
+    if not len(sharedColumns):
+        raise ValueError('exchange rate vectors share no currency to convert between them')
+    rates = rates / rates[:, sharedColumns[:1]]
+    for column in rates.T:
+        known = ~np.isnan(column)
+        if known.all() or not known.any():
+            continue
+        lastKnown = np.maximum.accumulate(np.where(known, np.arange(len(column)), -1))
+        firstKnown = np.argmax(known)
+        column[:] = column[np.where(lastKnown >= 0, lastKnown, firstKnown)]
+    return rates
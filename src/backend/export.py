@@ -0,0 +1,212 @@
+import csv
+import os
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from definitions import FieldType
+
+from .timeseries import to_datetime64
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+ID_COLUMN = 'ID'
+
+class ExportFormat:
+    PARQUET = 'parquet'
+    ARROW = 'arrow'
+    NPZ = 'npz'
+    CSV = 'csv'
+
+EXTENSION_TO_FORMAT = {
+    '.parquet': ExportFormat.PARQUET,
+    '.arrow': ExportFormat.ARROW,
+    '.feather': ExportFormat.ARROW,
+    '.npz': ExportFormat.NPZ,
+    '.csv': ExportFormat.CSV,
+}
+
+# Suffixes of the arrays a dictionary-encoded column is split into in an npz export
+NPZ_CODES_SUFFIX = '.codes'
+NPZ_CATEGORIES_SUFFIX = '.categories'
+NPZ_OFFSETS_SUFFIX = '.offsets'
+NPZ_VALID_SUFFIX = '.valid'
+NPZ_COLUMNS_KEY = '__columns__'
+NPZ_TYPES_KEY = '__types__'
+
+
+"""
+Picks the export format from the requested one or the file extension
+Falls back to npz when Arrow/Parquet is not requested explicitly and pyarrow is missing
+Raises ValueError if an Arrow/Parquet export is requested without pyarrow installed
+"""
+def resolve_export_format(path: str, exportFormat: str=None) -> str:
+    extensionFormat = EXTENSION_TO_FORMAT.get(os.path.splitext(path)[1].lower())
+    exportFormat = exportFormat or extensionFormat or ExportFormat.PARQUET
+    if exportFormat not in EXTENSION_TO_FORMAT.values():
+        raise ValueError(f'unknown export format {exportFormat}')
+    if exportFormat in (ExportFormat.PARQUET, ExportFormat.ARROW) and not pyarrow:
+        if extensionFormat == exportFormat:
+            raise ValueError(f'pyarrow is required to export {exportFormat} files')
+        return ExportFormat.NPZ
+    return exportFormat
+
+
+"""
+    ColumnBuilder collects the values of one field while sessions stream by
+    Strings are dictionary-encoded as they are appended
+
+    Attributes:
+    - name: str : Column name
+    - fieldType: str : FieldType of the column, None for the session id
+"""
+class ColumnBuilder:
+
+    def __init__(self, name: str, fieldType: str):
+        self.name = name
+        self.fieldType = fieldType
+        self.values = []
+        self.codes = []
+        self.offsets = [0]
+        self.valid = []
+        self.categories = {}
+
+    def encode(self, value: str) -> int:
+        code = self.categories.get(value)
+        if code is None:
+            code = self.categories[value] = len(self.categories)
+        return code
+
+    def append(self, value: Any) -> None:
+        if self.fieldType == FieldType.TEXT:
+            self.codes.append(-1 if value is None else self.encode(value))
+        elif self.fieldType == FieldType.LIST:
+            self.valid.append(value is not None)
+            self.codes += [self.encode(str(v)) for v in value or []]
+            self.offsets.append(len(self.codes))
+        else:
+            self.values.append(value)
+
+    def get_categories(self) -> np.ndarray:
+        return np.array(list(self.categories), dtype=str)
+
+    def as_numpy(self) -> Dict[str, np.ndarray]:
+        if self.fieldType == FieldType.NUMBER:
+            return { self.name: np.array([np.nan if v is None else v for v in self.values], dtype=float) }
+        if self.fieldType == FieldType.DATE:
+            return { self.name: to_datetime64(self.values) }
+        if self.fieldType == FieldType.TEXT:
+            return {
+                self.name + NPZ_CODES_SUFFIX: np.array(self.codes, dtype=np.int32),
+                self.name + NPZ_CATEGORIES_SUFFIX: self.get_categories(),
+            }
+        if self.fieldType == FieldType.LIST:
+            return {
+                self.name + NPZ_OFFSETS_SUFFIX: np.array(self.offsets, dtype=np.int64),
+                self.name + NPZ_VALID_SUFFIX: np.array(self.valid, dtype=bool),
+                self.name + NPZ_CODES_SUFFIX: np.array(self.codes, dtype=np.int32),
+                self.name + NPZ_CATEGORIES_SUFFIX: self.get_categories(),
+            }
+        return { self.name: np.array(self.values, dtype=str) }
+
+    def as_arrow(self):
+        if self.fieldType == FieldType.NUMBER:
+            return pyarrow.array(self.values, type=pyarrow.float64())
+        if self.fieldType == FieldType.DATE:
+            return pyarrow.array(to_datetime64(self.values), from_pandas=True)
+        if self.fieldType == FieldType.TEXT:
+            codes = np.array(self.codes, dtype=np.int32)
+            return pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(codes, mask=codes < 0),
+                pyarrow.array(self.get_categories(), type=pyarrow.string())
+            )
+        if self.fieldType == FieldType.LIST:
+            dictionaryValues = pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(self.codes, type=pyarrow.int32()),
+                pyarrow.array(self.get_categories(), type=pyarrow.string())
+            )
+            return pyarrow.ListArray.from_arrays(
+                pyarrow.array(self.offsets, type=pyarrow.int32()),
+                dictionaryValues,
+                mask=pyarrow.array(~np.array(self.valid, dtype=bool))
+            )
+        return pyarrow.array(self.values, type=pyarrow.string())
+
+    def as_text(self) -> List[str]:
+        if self.fieldType == FieldType.TEXT:
+            categories = list(self.categories)
+            return ['' if code < 0 else categories[code] for code in self.codes]
+        if self.fieldType == FieldType.LIST:
+            categories = list(self.categories)
+            return [
+                ','.join(categories[code] for code in self.codes[start:end]) if valid else ''
+                for start, end, valid in zip(self.offsets, self.offsets[1:], self.valid)
+            ]
+        return ['' if v is None else str(v) for v in self.values]
+
+
+"""
+Writes rows to path as a columnar file, in a single pass over rows
+rows: (session id, field values) pairs
+columns: { columnName: FieldType }, ID_COLUMN holds the session id
+Returns the number of rows written
+"""
+def export_rows(rows: Iterable[tuple], path: str, columns: Dict[str, str], exportFormat: str) -> int:
+    builders = [ColumnBuilder(name, fieldType) for name, fieldType in columns.items()]
+    rowCount = 0
+    for _id, fieldValues in rows:
+        for builder in builders:
+            builder.append(_id if builder.name == ID_COLUMN else fieldValues.get(builder.name))
+        rowCount += 1
+
+    if exportFormat == ExportFormat.NPZ:
+        arrays = {
+            NPZ_COLUMNS_KEY: np.array([b.name for b in builders], dtype=str),
+            NPZ_TYPES_KEY: np.array([b.fieldType or '' for b in builders], dtype=str),
+        }
+        for builder in builders:
+            arrays.update(builder.as_numpy())
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+    elif exportFormat == ExportFormat.CSV:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([b.name for b in builders])
+            writer.writerows(zip(*[b.as_text() for b in builders]))
+    else:
+        table = pyarrow.table({ b.name: b.as_arrow() for b in builders })
+        if exportFormat == ExportFormat.PARQUET:
+            pyarrow.parquet.write_table(table, path)
+        else:
+            pyarrow.feather.write_feather(table, path)
+    return rowCount
+
+
+"""
+Loads an npz export back into one array per column
+Dictionary-encoded TEXT columns are decoded into object arrays, None where missing
+LIST columns are decoded into object arrays of lists
+"""
+def read_npz_export(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as npz:
+        columns = {}
+        for name, fieldType in zip(npz[NPZ_COLUMNS_KEY], npz[NPZ_TYPES_KEY]):
+            if fieldType == FieldType.TEXT:
+                categories = np.append(npz[name + NPZ_CATEGORIES_SUFFIX].astype(object), None)
+                columns[name] = categories[npz[name + NPZ_CODES_SUFFIX]]
+            elif fieldType == FieldType.LIST:
+                values = npz[name + NPZ_CATEGORIES_SUFFIX][npz[name + NPZ_CODES_SUFFIX]].tolist()
+                offsets = npz[name + NPZ_OFFSETS_SUFFIX]
+                column = np.empty(len(offsets) - 1, dtype=object)
+                for i, valid in enumerate(npz[name + NPZ_VALID_SUFFIX]):
+                    column[i] = values[offsets[i]:offsets[i + 1]] if valid else None
+                columns[name] = column
+            else:
+                columns[name] = npz[name]
+        return columns
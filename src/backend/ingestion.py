@@ -0,0 +1,59 @@
+import math
+import os
+import concurrent.futures
+from concurrent.futures import Executor
+from typing import Any, Dict, List, NamedTuple
+
+from definitions import Game, Session
+
+
+# Below this many rows validation stays in-process, pool start-up outweighs the gain
+PARALLEL_VALIDATION_MIN_ROWS = 10000
+
+
+class RowError(NamedTuple):
+    index: int
+    message: str
+    values: Dict[str, Any]
+
+
+"""
+Validates rows against game, numbering them from offset
+Runs in worker processes, so it must stay a module-level function
+Returns (list of (index, parsed fieldValues), list of RowError)
+"""
+def validate_rows(game: Game, rows: List[Dict[str, Any]], offset: int=0):
+    valid, errors = [], []
+    for index, fieldValues in enumerate(rows, start=offset):
+        try:
+            valid.append((index, Session(game, dict(fieldValues)).get_values()))
+        except (TypeError, ValueError) as e:
+            errors.append(RowError(index, str(e), fieldValues))
+    return valid, errors
+
+"""
+Validates rows against game, in chunks across a process pool if there are enough rows
+executor, if provided, is reused instead of starting a pool for this call
+Returns (list of (index, parsed fieldValues), list of RowError), both ordered by index
+"""
+def validate_rows_in_parallel(game: Game, rows: List[Dict[str, Any]], workers: int=None,
+                              executor: Executor=None, parallelMinRows: int=PARALLEL_VALIDATION_MIN_ROWS):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(rows) < parallelMinRows:
+        return validate_rows(game, rows)
+
+    chunkSize = math.ceil(len(rows) / workers)
+    offsets = list(range(0, len(rows), chunkSize))
+    chunks = [rows[offset:offset + chunkSize] for offset in offsets]
+    if executor:
+        results = list(executor.map(validate_rows, [game] * len(chunks), chunks, offsets))
+    else:
+        # Accessed on use, loading concurrent.futures.process pulls in multiprocessing
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_rows, [game] * len(chunks), chunks, offsets))
+
+    valid, errors = [], []
+    for chunkValid, chunkErrors in results:
+        valid += chunkValid
+        errors += chunkErrors
+    return valid, errors
@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+from .aggregate import SessionAggregate
+
+# numpy is imported inside each function, importing the backend must not load it
+
+
+"""
+    ListFieldIndex is an inverted index of a LIST field of a Game, such as PEOPLE or TAGS
+    Every value listed maps to the sessions listing it, so questions about a value are answered
+        from its postings rather than by scanning every session
+
+    Attributes:
+    - fieldName: str : The LIST field indexed
+    - ids: List[str] : Session ids, postings are positions into it
+    - netEarns: numpy.ndarray : Net earn of each session, converted into one currency
+    - lengths: numpy.ndarray : Hours of each session, NaN where not recorded
+    - postings: Dict[Any, numpy.ndarray] : Sorted positions of the sessions listing each value,
+        values in order of first appearance
+    - aggregates: Dict[Any, SessionAggregate] : Net earn, sessions and hours of the sessions listing each value
+    - cooccurrences: Dict[Any, Dict[Any, int]] : Sessions listing both values, in both directions,
+        values never listed together are left out
+"""
+class ListFieldIndex(NamedTuple):
+    fieldName: str
+    ids: List[str]
+    netEarns: Any
+    lengths: Any
+    postings: Dict[Any, Any]
+    aggregates: Dict[Any, SessionAggregate]
+    cooccurrences: Dict[Any, Dict[Any, int]]
+
+    # Positions of the sessions listing every one of values
+    def get_positions(self, values: Sequence[Any]) -> 'numpy.ndarray':
+        import numpy as np
+
+        positions = None
+        # Rarest value first, so every intersection is at most as large as the smallest posting
+        for value in sorted(values, key=lambda value: len(self.postings.get(value, ()))):
+            posting = self.postings.get(value)
+            if posting is None:
+                return np.array([], dtype=np.intp)
+            positions = posting if positions is None else np.intersect1d(positions, posting, assume_unique=True)
+        return positions if positions is not None else np.arange(len(self.ids))
+
+    # Ids of the sessions listing every one of values
+    def get_session_ids(self, values: Sequence[Any]) -> List[str]:
+        return [self.ids[position] for position in self.get_positions(values)]
+
+    """
+    Aggregates the sessions listing every one of values, e.g. the sessions played with both X and Y
+    No values aggregates every session
+    """
+    def aggregate_with(self, values: Sequence[Any]) -> SessionAggregate:
+        import numpy as np
+
+        positions = self.get_positions(values)
+        netEarns, lengths = self.netEarns[positions], self.lengths[positions]
+        timed = ~np.isnan(lengths)
+        return SessionAggregate(len(positions), float(netEarns.sum()), float(netEarns[timed].sum()),
+                                float(lengths[timed].sum()))
+
+
+"""
+Explodes the lists of a LIST field once into a ListFieldIndex
+listedValues: list of each session, None where not recorded, a value listed twice counts once
+lengths: hours of each session, None where not recorded
+"""
+def build_list_field_index(fieldName: str, ids: Sequence[str], listedValues: Sequence[List[Any]],
+                           netEarns: Sequence[float], lengths: Sequence[float]) -> ListFieldIndex:
+    import numpy as np
+
+    netEarns = np.asarray(netEarns, dtype=float)
+    lengths = np.array([np.nan if length is None else length for length in lengths], dtype=float)
+    valueCodes = {}
+    codes, positions = [], []
+    for position, listed in enumerate(listedValues):
+        if listed:
+            codes += [valueCodes.setdefault(value, len(valueCodes)) for value in listed]
+            positions += [position] * len(listed)
+    values = list(valueCodes)
+
+    # Sorted by session then value, a value listed twice in one session counts once
+    keys = np.sort(np.array(positions, dtype=np.int64) * max(1, len(values)) + np.array(codes, dtype=np.int64))
+    # Rather than numpy.unique, the keys are nearly sorted already and a sort is much cheaper than hashing them
+    keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+    positions, codes = np.divmod(keys, max(1, len(values)))
+    # Stable, so each value's positions stay sorted
+    order = np.argsort(codes, kind='stable')
+    sessions = np.bincount(codes, minlength=len(values))
+    postings = dict(zip(values, np.split(positions[order], np.cumsum(sessions)[:-1]))) if values else {}
+
+    timed = ~np.isnan(lengths[positions])
+    netEarn = np.bincount(codes, weights=netEarns[positions], minlength=len(values))
+    timedNetEarn = np.bincount(codes[timed], weights=netEarns[positions][timed], minlength=len(values))
+    hours = np.bincount(codes[timed], weights=lengths[positions][timed], minlength=len(values))
+    aggregates = {
+        value: SessionAggregate(int(sessions[i]), float(netEarn[i]), float(timedNetEarn[i]), float(hours[i]))
+        for i, value in enumerate(values)
+    }
+
+    # Pairs of values of the same session: each entry against the entry offset after it, for every offset
+    #   up to the longest list, codes ascend within a session so every pair is found once
+    pairKeys = [np.array([], dtype=np.int64)]
+    for offset in range(1, int(np.bincount(positions).max()) if len(positions) else 0):
+        sameSession = positions[:-offset] == positions[offset:]
+        pairKeys.append(codes[:-offset][sameSession] * len(values) + codes[offset:][sameSession])
+    pairs, pairCounts = np.unique(np.concatenate(pairKeys), return_counts=True)
+    cooccurrences = { value: {} for value in values }
+    for pair, count in zip(pairs.tolist(), pairCounts.tolist()):
+        first, second = values[pair // len(values)], values[pair % len(values)]
+        cooccurrences[first][second] = cooccurrences[second][first] = count
+    return ListFieldIndex(fieldName, list(ids), netEarns, lengths, postings, aggregates, cooccurrences)
@@ -0,0 +1,98 @@
+import datetime
+import threading
+
+from definitions import useExchangeRatesAPI, DEFAULT_RMB_EXCHANGE_RATE
+
+
+DEFAULT_REFRESH_LEAD_TIME = datetime.timedelta(minutes=10)
+DEFAULT_RETRY_INTERVAL = datetime.timedelta(minutes=5)
+
+"""
+    ConversionRateRefresher keeps the RMB conversion rate fresh on a daemon thread
+    The cached rate is valid through its COLLECTION_TIME date. The refresher wakes up
+        leadTime before that expires, fetches the next rate and caches it for the coming day
+    Readers are always served the last known rate from memory, including while a fetch is in flight
+
+    Attributes:
+    - backend: Backend : The Backend whose conversion rate cache is refreshed
+    - leadTime: timedelta : How long before expiry the next rate is pre-fetched
+    - retryInterval: timedelta : How long to wait before retrying a failed fetch
+"""
+class ConversionRateRefresher:
+
+    def __init__(self, backend, leadTime=DEFAULT_REFRESH_LEAD_TIME, retryInterval=DEFAULT_RETRY_INTERVAL):
+        self.backend = backend
+        self.leadTime = leadTime
+        self.retryInterval = retryInterval
+        self.rateLock = threading.Lock()
+        self.stopEvent = threading.Event()
+        self.refreshedEvent = threading.Event()
+        self.thread = None
+
+        # Seed with the last cached rate even if expired; it is better than blocking
+        rate, collectionTime = backend.get_cached_rate_entry()
+        self.rate = rate or DEFAULT_RMB_EXCHANGE_RATE
+        self.validThrough = collectionTime
+
+    def start(self):
+        if self.is_running():
+            return
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, name='ConversionRateRefresher', daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stopEvent.set()
+        if self.thread:
+            self.thread.join(timeout)
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def get_rate(self):
+        with self.rateLock:
+            return self.rate
+
+    # Blocks until at least one refresh succeeded, returns False on timeout
+    def wait_for_refresh(self, timeout=None):
+        return self.refreshedEvent.wait(timeout)
+
+    # Computes when the next refresh should happen
+    # Output: (datetime to refresh at, date the refreshed rate will be cached for)
+    def get_next_refresh(self, now: datetime.datetime):
+        today = now.date()
+        if self.validThrough is None or self.validThrough < str(today):
+            return now, today
+        expiryDate = datetime.date.fromisoformat(self.validThrough) + datetime.timedelta(days=1)
+        expiry = datetime.datetime.combine(expiryDate, datetime.time.min)
+        return expiry - self.leadTime, expiryDate
+
+    def run(self):
+        while not self.stopEvent.is_set():
+            refreshAt, validFor = self.get_next_refresh(datetime.datetime.now())
+            waitSeconds = (refreshAt - datetime.datetime.now()).total_seconds()
+            if waitSeconds > 0:
+                self.stopEvent.wait(waitSeconds)
+            elif not self.refresh(validFor):
+                self.stopEvent.wait(self.retryInterval.total_seconds())
+
+    # Fetches a new rate and caches it for validFor
+    # Returns True if successful; on failure the last known rate keeps being served
+    def refresh(self, validFor: datetime.date):
+        rate = None
+        if useExchangeRatesAPI:
+            try:
+                rate = self.backend.get_conversion_rate_from_api()
+            except Exception:
+                rate = None
+            if not rate:
+                return False
+        rate = rate or DEFAULT_RMB_EXCHANGE_RATE
+
+        self.backend.cache_exchange_rate(rate, collectionDate=validFor)
+        with self.rateLock:
+            self.rate = rate
+            self.validThrough = str(validFor)
+        self.refreshedEvent.set()
+        return True
@@ -0,0 +1,109 @@
+import bisect
+import re
+from typing import Any, Dict, List, Sequence, Set
+
+
+TOKEN_PATTERN = re.compile(r'\w+')
+# Query terms ending with it match every term starting with the rest
+PREFIX_WILDCARD = '*'
+OR_OPERATOR = 'OR'
+AND_OPERATOR = 'AND'
+
+
+# Lowercased words of text, nothing for a value which is not text
+def tokenize(text) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower()) if isinstance(text, str) else []
+
+"""
+Parses a search query into clauses, the query matches sessions matching any clause
+Terms are separated by spaces and ANDed within a clause, an OR between terms starts a new clause
+A term ending with PREFIX_WILDCARD is a prefix, other punctuation splits terms like it does notes
+Returns [[term]], prefixes keep their PREFIX_WILDCARD
+"""
+def parse_query(query: str) -> List[List[str]]:
+    clauses = [[]]
+    for word in query.split():
+        if word == OR_OPERATOR:
+            clauses.append([])
+        elif word != AND_OPERATOR:
+            terms = tokenize(word)
+            if terms and word.endswith(PREFIX_WILDCARD):
+                terms[-1] += PREFIX_WILDCARD
+            clauses[-1] += terms
+    return [clause for clause in clauses if clause]
+
+
+"""
+    TextIndex is an inverted index of the words of the TEXT fields of a Game's sessions
+    Kept up to date one session at a time, so a write never rebuilds it
+
+    Attributes:
+    - fieldNames: List[str] : TEXT fields indexed
+    - postings: Dict[str, Set[str]] : Ids of the sessions containing each term
+    - sessionTerms: Dict[str, Set[str]] : Terms of each indexed session, to remove it
+    - sortedTerms: List[str] : Every term in order, for prefix matches
+"""
+class TextIndex:
+
+    def __init__(self, fieldNames: Sequence[str]):
+        self.fieldNames = list(fieldNames)
+        self.postings = {}
+        self.sessionTerms = {}
+        self.sortedTerms = []
+
+    def __len__(self):
+        return len(self.sessionTerms)
+
+    # Indexes a session, replacing what was indexed under _id
+    def add(self, _id: str, values: Dict[str, Any]):
+        self.remove(_id)
+        terms = { term for fieldName in self.fieldNames for term in tokenize(values.get(fieldName)) }
+        if not terms:
+            return
+        self.sessionTerms[_id] = terms
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                self.postings[term] = { _id }
+                bisect.insort(self.sortedTerms, term)
+            else:
+                posting.add(_id)
+
+    def add_rows(self, rows: Dict[str, Dict[str, Any]]):
+        for _id, values in rows.items():
+            self.add(_id, values)
+
+    def remove(self, _id: str):
+        for term in self.sessionTerms.pop(_id, ()):
+            posting = self.postings[term]
+            posting.discard(_id)
+            if not posting:
+                del self.postings[term]
+                del self.sortedTerms[bisect.bisect_left(self.sortedTerms, term)]
+
+    # Ids of the sessions containing term, or any term starting with it if it ends with PREFIX_WILDCARD
+    def match_term(self, term: str) -> Set[str]:
+        if not term.endswith(PREFIX_WILDCARD):
+            return self.postings.get(term, set())
+        prefix = term[:-len(PREFIX_WILDCARD)]
+        matched = set()
+        for i in range(bisect.bisect_left(self.sortedTerms, prefix), len(self.sortedTerms)):
+            if not self.sortedTerms[i].startswith(prefix):
+                break
+            matched |= self.postings[self.sortedTerms[i]]
+        return matched
+
+    # Ids of the sessions matching query, see parse_query
+    def search(self, query: str) -> Set[str]:
+        results = set()
+        for clause in parse_query(query):
+            # Smallest first, so the intersection never grows beyond it
+            matches = sorted((self.match_term(term) for term in clause), key=len)
+            results |= matches[0].intersection(*matches[1:])
+        return results
+
+
+def build_text_index(fieldNames: Sequence[str], rows: Dict[str, Dict[str, Any]]) -> TextIndex:
+    index = TextIndex(fieldNames)
+    index.add_rows(rows)
+    return index
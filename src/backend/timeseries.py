@@ -0,0 +1,157 @@
+from typing import Sequence, Tuple
+
+from definitions import parse_date
+
+# numpy is imported inside each function, importing the backend must not load it
+
+
+class Bucket:
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+class DownsampleMethod:
+    # Lowest and highest point of every bucket, keeps every peak and trough of the series
+    MINMAX = 'minmax'
+    # Largest-Triangle-Three-Buckets, keeps the visual shape with one point per bucket
+    LTTB = 'lttb'
+
+# Points drawn per series, beyond this a chart only gets slower, not more detailed
+DEFAULT_MAX_POINTS = 2000
+
+
+"""
+Parses DATE values into a datetime64[D] array in bulk, every date recorded should go through here
+Zero-padded ISO dates are parsed by numpy, the other DATE_FORMATS once per distinct value
+None becomes NaT
+Raises ValueError on a value in none of DATE_FORMATS
+"""
+def to_datetime64(dates: Sequence[str]) -> 'numpy.ndarray':
+    import numpy as np
+
+    try:
+        return np.array(dates, dtype='datetime64[D]')
+    except ValueError:
+        pass
+    parsed = { None: None }
+    for date in dates:
+        if date not in parsed:
+            parsed[date] = parse_date(date)
+    return np.array([parsed[date] for date in dates], dtype='datetime64[D]')
+
+"""
+Truncates days to the start of their bucket
+Weeks start on Monday
+"""
+def bucket_starts(days: 'numpy.ndarray', bucket: str=Bucket.DAY) -> 'numpy.ndarray':
+    import numpy as np
+
+    if bucket == Bucket.DAY:
+        return days
+    if bucket == Bucket.WEEK:
+        # Day 0, 1970-01-01, was a Thursday
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    if bucket == Bucket.MONTH:
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f'unknown bucket {bucket}')
+
+"""
+Sums values per bucket of their dates
+Values without a date are left out
+Returns (start of each bucket with values, in date order; sum of each bucket)
+"""
+def sum_by_bucket(dates: Sequence[str], values: Sequence[float],
+                  bucket: str=Bucket.DAY) -> Tuple['numpy.ndarray', 'numpy.ndarray']:
+    import numpy as np
+
+    days = to_datetime64(dates)
+    values = np.asarray(values, dtype=float)
+    dated = ~np.isnat(days)
+    starts, codes = np.unique(bucket_starts(days[dated], bucket), return_inverse=True)
+    return starts, np.bincount(codes.ravel(), weights=values[dated], minlength=len(starts))
+
+"""
+Cumulative sum of values over time, one point per bucket
+Returns (start of each bucket, running total at the end of each bucket)
+"""
+def cumulative_by_bucket(dates: Sequence[str], values: Sequence[float],
+                         bucket: str=Bucket.DAY) -> Tuple['numpy.ndarray', 'numpy.ndarray']:
+    import numpy as np
+
+    starts, sums = sum_by_bucket(dates, values, bucket)
+    return starts, np.cumsum(sums)
+
+
+"""
+Indices of at most maxPoints points of y which keep its extremes
+Points are split into equal buckets, the lowest and highest of each are kept,
+    as are the first and the last point
+"""
+def downsample_minmax(y: 'numpy.ndarray', maxPoints: int) -> 'numpy.ndarray':
+    import numpy as np
+
+    count = len(y)
+    buckets = (maxPoints - 2) // 2
+    if count <= maxPoints or buckets < 1:
+        return np.arange(count)
+    bucketIds = np.arange(count) * buckets // count
+    # Sorted by bucket, then by value: each bucket's lowest point comes first and its highest last
+    order = np.lexsort((y, bucketIds))
+    ends = np.searchsorted(bucketIds, np.arange(1, buckets + 1))
+    starts = np.concatenate(([0], ends[:-1]))
+    return np.unique(np.concatenate(([0, count - 1], order[starts], order[ends - 1])))
+
+"""
+Indices of maxPoints points of (x, y) chosen by Largest-Triangle-Three-Buckets
+x must be sorted, datetime64 values are accepted
+"""
+def downsample_lttb(x: 'numpy.ndarray', y: 'numpy.ndarray', maxPoints: int) -> 'numpy.ndarray':
+    import numpy as np
+
+    count = len(y)
+    if count <= maxPoints or maxPoints < 3:
+        return np.arange(count)
+    x = x.astype(np.float64) if not np.issubdtype(x.dtype, np.datetime64) \
+        else x.astype('datetime64[D]').astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # maxPoints - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, count - 1, maxPoints - 1).astype(np.intp)
+    indices = np.empty(maxPoints, dtype=np.intp)
+    indices[0], indices[-1] = 0, count - 1
+    selected = 0
+    for i in range(maxPoints - 2):
+        start, end = edges[i], edges[i + 1]
+        nextEnd = edges[i + 2] if i + 2 < len(edges) else count
+        # The triangle's third corner is the average of the next bucket
+        averageX, averageY = x[end:nextEnd].mean(), y[end:nextEnd].mean()
+        areas = np.abs(
+            (x[selected] - averageX) * (y[start:end] - y[selected]) -
+            (x[selected] - x[start:end]) * (averageY - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+"""
+Indices of at most maxPoints points to draw of the series (x, y)
+Raises ValueError on an unknown method
+"""
+def downsample(x: 'numpy.ndarray', y: 'numpy.ndarray', maxPoints: int=DEFAULT_MAX_POINTS,
+               method: str=DownsampleMethod.MINMAX) -> 'numpy.ndarray':
+    if method == DownsampleMethod.MINMAX:
+        return downsample_minmax(y, maxPoints)
+    if method == DownsampleMethod.LTTB:
+        return downsample_lttb(x, y, maxPoints)
+    raise ValueError(f'unknown downsample method {method}')
+
+"""
+Cumulative sum of values over time, ready to draw
+One point per bucket, downsampled to at most maxPoints points
+Returns (datetime64 bucket starts, running totals)
+"""
+def prepare_cumulative_series(dates: Sequence[str], values: Sequence[float], bucket: str=Bucket.DAY,
+                              maxPoints: int=DEFAULT_MAX_POINTS, method: str=DownsampleMethod.MINMAX):
+    starts, cumulative = cumulative_by_bucket(dates, values, bucket)
+    indices = downsample(starts, cumulative, maxPoints, method)
+    return starts[indices], cumulative[indices]
@@ -1,6 +1,7 @@
-import requests
-
 def get_json_from_url(url):
+    # Only needed when rates are fetched, importing requests is slow
+    import requests
+
     res = requests.get(url)
     if res.status_code == 200:
         return res.json()
\ No newline at end of file
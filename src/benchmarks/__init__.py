@@ -0,0 +1,2 @@
+# Performance benchmarks, run as modules from src/
+# example: py -m benchmarks.startup
@@ -0,0 +1,98 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, NamedTuple
+
+import click
+
+
+SRC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules which only the commands using them should load
+HEAVY_MODULES = ('openpyxl', 'requests', 'matplotlib', 'numpy', 'pyarrow')
+
+
+class ImportTime(NamedTuple):
+    module: str
+    selfMicroseconds: int
+    cumulativeMicroseconds: int
+
+
+"""
+Imports module in a fresh interpreter with -X importtime
+Returns the ImportTime of every module it loaded, in import order
+"""
+def measure_import_times(module: str) -> List[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIRECTORY, capture_output=True, text=True, check=True
+    )
+    importTimes = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        selfTime, cumulativeTime, name = line[len('import time:'):].split('|')
+        importTimes.append(ImportTime(name.strip(), int(selfTime), int(cumulativeTime)))
+    return importTimes
+
+# Median cumulative import time of module in milliseconds, over runs fresh interpreters
+def measure_module_import_ms(module: str, runs: int) -> float:
+    totals = []
+    for _ in range(runs):
+        importTimes = { t.module: t for t in measure_import_times(module) }
+        totals.append(importTimes[module].cumulativeMicroseconds / 1000)
+    return statistics.median(totals)
+
+# Median wall time in milliseconds of running a script with args, interpreter start-up included
+def measure_command_ms(args: List[str], runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=SRC_DIRECTORY, capture_output=True, check=True)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+# Heavy modules importing module loads, directly or through its dependencies
+def find_heavy_imports(importTimes: List[ImportTime]) -> Dict[str, int]:
+    return {
+        t.module: t.cumulativeMicroseconds for t in importTimes if t.module in HEAVY_MODULES
+    }
+
+
+@click.command(help=
+    '''measure CLI start-up: import time of import_data, wall time of a no-op command, heavy modules loaded
+       example: py -m benchmarks.startup --runs 5 --max-ms 150
+    ''')
+@click.option('--module', type=str, default='import_data', help='Module whose import is measured')
+@click.option('--runs', type=int, default=5, help='Fresh interpreters per measurement, the median is reported')
+@click.option('--top', type=int, default=10, help='Slowest imports to list')
+@click.option('--max-ms', type=float, default=None, help='Fail if the import takes longer')
+def startup(module, runs, top, max_ms):
+    """CLI command to benchmark start-up"""
+    importTimes = measure_import_times(module)
+    importMs = measure_module_import_ms(module, runs)
+    commandMs = measure_command_ms([f'{module}.py', '--help'], runs) \
+        if os.path.exists(os.path.join(SRC_DIRECTORY, f'{module}.py')) else None
+
+    print(f'import {module}: {importMs:.1f} ms (median of {runs})')
+    if commandMs is not None:
+        print(f'{module}.py --help: {commandMs:.1f} ms wall time (median of {runs})')
+    print(f'Slowest imports (cumulative ms):')
+    for t in sorted(importTimes, key=lambda t: t.cumulativeMicroseconds, reverse=True)[:top]:
+        print(f'  {t.cumulativeMicroseconds / 1000:8.1f}  {t.module}')
+
+    failed = False
+    heavyImports = find_heavy_imports(importTimes)
+    for name, microseconds in heavyImports.items():
+        print(f'Heavy module loaded at start-up: {name} ({microseconds / 1000:.1f} ms)')
+        failed = True
+    if max_ms is not None and importMs > max_ms:
+        print(f'Import time {importMs:.1f} ms exceeds {max_ms} ms')
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    startup()
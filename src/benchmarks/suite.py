@@ -0,0 +1,278 @@
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import click
+
+from backend import Backend
+from database import JSONDatabase, SnapshotDatabase, ConcurrentDatabase, ShardedJSONDatabase, \
+    PartitionedJSONDatabase
+from definitions import Session, VisualizeFilters, FilterCondition, FilterOperator, \
+    DefaultFieldNames, CustomFieldNames, Currencies, DEFAULT_RMB_EXCHANGE_RATE
+
+from .synthetic import SYNTHETIC_GAME_NAME, build_history, generate_sessions
+
+
+DEFAULT_SIZES = '1000,10000'
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 1.25
+# Sessions added per repeat by the insert and bulk_import benchmarks
+INSERT_OPERATIONS = 10
+BULK_IMPORT_ROWS = 1000
+
+
+"""
+    DatabaseKind pairs a Database implementation with the one its file is built with
+    ConcurrentDatabase wraps a JSONDatabase file, so its history is written as JSON
+    ShardedJSONDatabase and PartitionedJSONDatabase keep a directory, which has no extension
+"""
+class DatabaseKind(NamedTuple):
+    database: type
+    builder: type
+    extension: str
+
+DATABASE_KINDS = {
+    'json': DatabaseKind(JSONDatabase, JSONDatabase, '.json'),
+    'snapshot': DatabaseKind(SnapshotDatabase, SnapshotDatabase, '.snapshot'),
+    'concurrent': DatabaseKind(ConcurrentDatabase, JSONDatabase, '.json'),
+    'sharded': DatabaseKind(ShardedJSONDatabase, ShardedJSONDatabase, ''),
+    'partitioned': DatabaseKind(PartitionedJSONDatabase, PartitionedJSONDatabase, ''),
+}
+
+
+class BenchmarkResult(NamedTuple):
+    benchmark: str
+    database: str
+    sessions: int
+    # Seconds per operation
+    median: float
+    min: float
+    repeat: int
+
+    def get_key(self) -> str:
+        return f'{self.benchmark}/{self.database}/{self.sessions}'
+
+
+"""
+    BenchmarkContext is the Backend, with history loaded, a benchmark runs against
+
+    Attributes:
+    - backend: Backend : Backend over the database under test
+    - sessionIds: List[str] : Ids of the generated sessions
+    - filename: str : The database file
+    - kind: DatabaseKind : The database implementation under test
+    - sessions: int : Sessions in the generated history
+    - historyChanged: bool : Whether a benchmark wrote to the database since the history was built
+"""
+class BenchmarkContext:
+
+    def __init__(self, kind: DatabaseKind, filename: str, sessions: int):
+        self.kind = kind
+        self.filename = filename
+        self.sessions = sessions
+        self.newSessions = generate_sessions(BULK_IMPORT_ROWS, seed=1)
+        self.build()
+
+    def build(self):
+        self.sessionIds = build_history(self.kind.builder(self.filename), self.sessions)
+        self.historyChanged = False
+        self.backend = self.open_backend()
+        # Conversion must not reach the exchange rate API mid-benchmark
+        self.backend.cache_exchange_rate(DEFAULT_RMB_EXCHANGE_RATE)
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: DEFAULT_RMB_EXCHANGE_RATE, Currencies.EUR: 0.9 },
+            base=Currencies.USD
+        )
+        self.game = self.backend.construct_game_from_db(SYNTHETIC_GAME_NAME)
+
+    # Builds the history again if a benchmark wrote to it, so every run measures the size it is labelled with
+    def restore_history(self):
+        if self.historyChanged:
+            self.close()
+            self.build()
+
+    def open_backend(self) -> Backend:
+        return Backend(db=self.kind.database, dbFileName=self.filename)
+
+    def close(self):
+        self.backend.close()
+
+
+def bench_startup(context: BenchmarkContext):
+    backend = context.open_backend()
+    backend.construct_game_from_db(SYNTHETIC_GAME_NAME)
+    backend.close()
+
+def bench_insert(context: BenchmarkContext):
+    for fieldValues in context.newSessions[:INSERT_OPERATIONS]:
+        context.backend.add_session(Session(context.game, dict(fieldValues)))
+
+def bench_bulk_import(context: BenchmarkContext):
+    context.backend.add_session_values(SYNTHETIC_GAME_NAME, context.newSessions, workers=1)
+
+def bench_filter(context: BenchmarkContext):
+    context.backend.db.get_rows_with_filter(SYNTHETIC_GAME_NAME, VisualizeFilters({
+        CustomFieldNames.OCCASION: [FilterCondition(FilterOperator.EQUAL, 'Home')],
+        DefaultFieldNames.TAGS: [FilterCondition(FilterOperator.CONTAINS, 'Cash')],
+    }))
+
+def bench_get_sessions(context: BenchmarkContext):
+    context.backend.get_sessions(SYNTHETIC_GAME_NAME, _filter=None)
+
+def bench_parse_field_values(context: BenchmarkContext):
+    for fieldValues in context.backend.db.get_all_rows(SYNTHETIC_GAME_NAME).values():
+        context.game.parse_field_values(fieldValues)
+
+def bench_aggregate(context: BenchmarkContext):
+    context.backend.aggregate(SYNTHETIC_GAME_NAME, groupBy=CustomFieldNames.OCCASION)
+
+def bench_edit(context: BenchmarkContext):
+    context.backend.edit_session(SYNTHETIC_GAME_NAME, context.sessionIds[0], { DefaultFieldNames.NOTE: 'edited' })
+
+# name: (benchmark, operations per call)
+# Benchmarks writing to the database are listed in MUTATING_BENCHMARKS
+BENCHMARKS: Dict[str, tuple] = {
+    'startup': (bench_startup, 1),
+    'insert': (bench_insert, INSERT_OPERATIONS),
+    'bulk_import': (bench_bulk_import, 1),
+    'filter': (bench_filter, 1),
+    'get_sessions': (bench_get_sessions, 1),
+    'parse_field_values': (bench_parse_field_values, 1),
+    'aggregate': (bench_aggregate, 1),
+    'edit': (bench_edit, 1),
+}
+MUTATING_BENCHMARKS = { 'insert', 'bulk_import', 'edit' }
+
+
+"""
+Times repeat runs of benchmark, each against the history as built
+mutates: whether benchmark writes to the database, the history is then built again, untimed, before the next run
+"""
+def time_benchmark(benchmark: Callable[[BenchmarkContext], Any], context: BenchmarkContext,
+                   repeat: int, operations: int=1, mutates: bool=False) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        context.restore_history()
+        start = time.perf_counter()
+        benchmark(context)
+        durations.append((time.perf_counter() - start) / operations)
+        context.historyChanged = context.historyChanged or mutates
+    return durations
+
+"""
+Runs every benchmark against every database kind and history size
+Each database kind and size gets a fresh history, in a temporary directory
+reportProgress, if provided, is called with each BenchmarkResult
+"""
+def run_suite(sizes: List[int], databases: List[str], benchmarks: List[str], repeat: int=DEFAULT_REPEAT,
+              reportProgress=None) -> List[BenchmarkResult]:
+    results = []
+    directory = tempfile.mkdtemp(prefix='winning-tracker-bench-')
+    try:
+        for databaseName in databases:
+            kind = DATABASE_KINDS[databaseName]
+            for sessions in sizes:
+                filename = os.path.join(directory, f'{databaseName}-{sessions}{kind.extension}')
+                context = BenchmarkContext(kind, filename, sessions)
+                try:
+                    for benchmarkName in benchmarks:
+                        benchmark, operations = BENCHMARKS[benchmarkName]
+                        durations = time_benchmark(benchmark, context, repeat, operations,
+                                                   mutates=benchmarkName in MUTATING_BENCHMARKS)
+                        result = BenchmarkResult(benchmarkName, databaseName, sessions,
+                                                 statistics.median(durations), min(durations), repeat)
+                        results.append(result)
+                        reportProgress and reportProgress(result)
+                finally:
+                    context.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def results_to_json(results: List[BenchmarkResult]) -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': [result._asdict() for result in results],
+    }
+
+def results_from_json(data: Dict[str, Any]) -> List[BenchmarkResult]:
+    return [BenchmarkResult(**result) for result in data['results']]
+
+
+class Comparison(NamedTuple):
+    key: str
+    baseline: float
+    current: float
+
+    def get_ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float('inf')
+
+"""
+Pairs results with the baseline results of the same benchmark, database and size
+Returns (comparisons, those slower than the baseline by more than threshold)
+"""
+def compare_results(results: List[BenchmarkResult], baseline: List[BenchmarkResult],
+                    threshold: float=DEFAULT_THRESHOLD):
+    baselineByKey = { result.get_key(): result for result in baseline }
+    comparisons = [
+        Comparison(result.get_key(), baselineByKey[result.get_key()].median, result.median)
+        for result in results if result.get_key() in baselineByKey
+    ]
+    return comparisons, [c for c in comparisons if c.get_ratio() > threshold]
+
+
+def parse_names(value: str, known) -> List[str]:
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    for name in names:
+        if name not in known:
+            raise click.BadParameter(f'{name} is not one of {", ".join(known)}')
+    return names
+
+
+@click.command(help=
+    '''benchmark the databases and the Backend on synthetic session histories
+       example: py -m benchmarks.suite --sizes 1000,10000,100000 --output results.json --baseline baseline.json
+    ''')
+@click.option('--sizes', type=str, default=DEFAULT_SIZES, help='Sessions of history, comma separated, such as 1000,10000,100000,1000000')
+@click.option('--databases', type=str, default=','.join(DATABASE_KINDS), help='Database implementations, comma separated')
+@click.option('--benchmarks', 'benchmarkNames', type=str, default=','.join(BENCHMARKS), help='Benchmarks, comma separated')
+@click.option('--repeat', type=int, default=DEFAULT_REPEAT, help='Runs per benchmark, the median is reported')
+@click.option('--output', 'outputPath', type=str, default=None, help='Write results as JSON')
+@click.option('--baseline', 'baselinePath', type=str, default=None, help='Compare against results written by --output')
+@click.option('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Slowdown ratio reported as a regression')
+def suite(sizes, databases, benchmarkNames, repeat, outputPath, baselinePath, threshold):
+    """CLI command to run the benchmark suite"""
+    sizes = [int(size) for size in sizes.split(',')]
+    results = run_suite(
+        sizes, parse_names(databases, DATABASE_KINDS), parse_names(benchmarkNames, BENCHMARKS), repeat,
+        lambda r: print(f'{r.get_key():40} {r.median * 1000:10.3f} ms')
+    )
+    if outputPath:
+        with open(outputPath, 'w') as f:
+            json.dump(results_to_json(results), f, indent=4)
+        print(f'Results written to {outputPath}')
+
+    if baselinePath:
+        with open(baselinePath) as f:
+            baseline = results_from_json(json.load(f))
+        comparisons, regressions = compare_results(results, baseline, threshold)
+        print(f'Compared with {baselinePath}:')
+        for comparison in comparisons:
+            flag = '  REGRESSION' if comparison in regressions else ''
+            print(f'{comparison.key:40} {comparison.baseline * 1000:10.3f} -> {comparison.current * 1000:10.3f} ms'
+                  f' ({comparison.get_ratio():.2f}x){flag}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    suite()
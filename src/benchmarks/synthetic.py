@@ -0,0 +1,74 @@
+import datetime
+import random
+import uuid
+from typing import Any, Dict, List
+
+from database import Database
+from definitions import Game, FieldDefinition, FieldType, DatabaseKeys, \
+    DefaultFieldNames, CustomFieldNames, GameName, Currencies
+
+
+SYNTHETIC_GAME_NAME = GameName.TEXAS_HOLDEM
+
+SYNTHETIC_FIELDS = [
+    FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT, required=True),
+    FieldDefinition(CustomFieldNames.PEOPLE, FieldType.LIST),
+    FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT, required=True)
+]
+
+# Distributions modelled on the legacy workbook: a few occasions dominate, most sessions are in USD
+OCCASIONS = ['Global', 'Home', 'SanMateo(RMB)', 'Casino', 'Online', 'Trip']
+OCCASION_WEIGHTS = [40, 25, 15, 10, 8, 2]
+CURRENCIES = [Currencies.USD, 'RMB', Currencies.EUR]
+CURRENCY_WEIGHTS = [70, 25, 5]
+TAGS = ['Purchase', 'Tournament', 'Cash', 'Deep', 'Short', 'Live', 'Bounty']
+PEOPLE = ['Alan', 'Bella', 'Cindy', 'Cora', 'Dan', 'Eve', 'Frank', 'Gina', 'Hank', 'Ivy']
+FIRST_DATE = datetime.date(2015, 1, 1)
+DAYS_OF_HISTORY = 365 * 8
+
+
+def get_synthetic_game() -> Game:
+    return Game(SYNTHETIC_GAME_NAME, SYNTHETIC_FIELDS)
+
+"""
+Generates field values of count sessions, already parsed as the database stores them
+Deterministic for a given seed
+"""
+def generate_sessions(count: int, seed: int=0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    occasions = rng.choices(OCCASIONS, OCCASION_WEIGHTS, k=count)
+    currencies = rng.choices(CURRENCIES, CURRENCY_WEIGHTS, k=count)
+    sessions = []
+    for occasion, currency in zip(occasions, currencies):
+        fieldValues = {
+            DefaultFieldNames.NET_EARN: round(rng.gauss(5, 150), 2),
+            DefaultFieldNames.DATE: str(FIRST_DATE + datetime.timedelta(days=rng.randrange(DAYS_OF_HISTORY))),
+            CustomFieldNames.OCCASION: occasion,
+            CustomFieldNames.CURRENCY: currency,
+        }
+        if rng.random() < 0.7:
+            fieldValues[DefaultFieldNames.LENGTH] = round(rng.uniform(0.5, 8), 1)
+        if rng.random() < 0.4:
+            fieldValues[DefaultFieldNames.TAGS] = rng.sample(TAGS, rng.randint(1, 3))
+        if rng.random() < 0.6:
+            fieldValues[CustomFieldNames.PEOPLE] = rng.sample(PEOPLE, rng.randint(1, 5))
+        if rng.random() < 0.1:
+            fieldValues[DefaultFieldNames.NOTE] = rng.choice(['great day', 'tilted', 'bad beat', 'deposit'])
+        sessions.append(fieldValues)
+    return sessions
+
+"""
+Fills db with the synthetic game and count generated sessions in a single write
+Skips per-row validation, so even a million sessions are set up quickly
+Returns the generated session ids
+"""
+def build_history(db: Database, count: int, seed: int=0) -> List[str]:
+    game = get_synthetic_game()
+    rows = { uuid.uuid4().hex: fieldValues for fieldValues in generate_sessions(count, seed) }
+    db.write_data_to_disk({
+        SYNTHETIC_GAME_NAME: {
+            DatabaseKeys.SCHEMA_KEY: game.all_fields_as_dict(),
+            DatabaseKeys.ROWS_KEY: rows,
+        }
+    })
+    return list(rows)
@@ -1,2 +1,7 @@
 from .json_database import JSONDatabase
+from .concurrent_database import ConcurrentDatabase
+from .snapshot_database import SnapshotDatabase, json_to_snapshot, snapshot_to_json
+from .sharded_database import ShardedJSONDatabase, json_to_sharded, sharded_to_json
+from .partitioned_database import PartitionedJSONDatabase, json_to_partitioned, partitioned_to_json
 from .abstract_database import Database
+from .query_plan import QueryPlan, FilterStage
@@ -4,6 +4,14 @@ from typing import List, Dict
 
 class Database(ABC):
 
+    # Releases resources held by the database, such as background threads
+    def close(self):
+        pass
+
+    # Changes whenever the rows of tableName may have changed, None if changes can't be detected
+    def get_table_version(self, tableName: str):
+        return None
+
     @abstractmethod
     def reset_database(self):
         pass
@@ -17,7 +25,11 @@ class Database(ABC):
         pass
 
     @abstractmethod
-    def insert_row(self, tableName: str, values: Dict[str, str]):
+    def insert_row(self, tableName: str, values: Dict[str, str], _id=None):
+        pass
+
+    @abstractmethod
+    def insert_rows(self, tableName: str, rows: List[Dict[str, str]], ids: List[str]=None):
         pass
     
     @abstractmethod
@@ -27,3 +39,13 @@ class Database(ABC):
     @abstractmethod
     def get_all_rows(self, tableName: str):
         pass
+
+    # Adds, drops and retypes columns of tableName without rewriting its rows, returns the new schema version
+    @abstractmethod
+    def alter_table(self, tableName: str, add=None, drop=None, retype=None, defaults=None) -> int:
+        pass
+
+    # Returns the QueryPlan of reading the rows of tableName which satisfy _filter
+    @abstractmethod
+    def explain(self, tableName: str, _filter, analyze: bool=False):
+        pass
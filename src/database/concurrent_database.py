@@ -0,0 +1,207 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, NamedTuple
+
+from .abstract_database import Database
+from .json_database import JSONDatabase, get_file_version, schema_to_field_definitions
+from .query_plan import QueryPlan, explain_filter
+from .schema_evolution import upgrade_table_rows
+from definitions import FieldDefinition, DatabaseKeys, VisualizeFilters
+from instrumentation import stats
+
+
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+
+class Snapshot(NamedTuple):
+    data: Dict[str, Dict]
+    version: tuple
+
+class PendingWrite(NamedTuple):
+    apply: Callable[[Dict[str, Dict]], Any]
+    future: Future
+
+# Queued by close, stops the writer once every write queued before it is committed
+STOP_WRITER = None
+
+
+"""
+    ConcurrentDatabase makes a JSONDatabase safe to share between threads
+    Reads are served without locking from a shared in-memory snapshot of the data,
+        which is reloaded only when the file was replaced, e.g. by another process
+    Writes are queued and committed by a single writer thread: every write pending
+        when the writer picks up work is applied and saved in one disk write (group commit)
+    Writers block until their write is on disk, and get the same results as from JSONDatabase
+
+    Data returned by reads is shared with other threads and must not be modified
+
+    Attributes:
+    - database: JSONDatabase : The database the snapshot is read from and writes are committed to
+    - maxBatchSize: int : Most writes committed in one disk write
+"""
+class ConcurrentDatabase(Database):
+
+    def __init__(self, filename=None, database=JSONDatabase, maxBatchSize: int=DEFAULT_MAX_BATCH_SIZE):
+        self.database = database(filename=filename)
+        self.filename = self.database.filename
+        self.maxBatchSize = maxBatchSize
+        self.snapshot = None
+        self.snapshotLock = threading.Lock()
+        # { tableName: (snapshot data, upgraded rows) }, see get_all_rows
+        self.upgradedRows = {}
+        self.pendingWrites = queue.Queue()
+        self.writer = threading.Thread(target=self.run_writer, name='ConcurrentDatabaseWriter', daemon=True)
+        self.writer.start()
+
+    # Commits the queued writes and stops the writer thread
+    def close(self):
+        if self.writer.is_alive():
+            self.pendingWrites.put(STOP_WRITER)
+            self.writer.join()
+
+    """
+    Returns the latest data, shared between threads
+    Only one thread reloads the file when it changed, the others keep reading without locks
+    """
+    def read_data_to_memory(self) -> Dict[str, Dict]:
+        version = get_file_version(self.filename)
+        snapshot = self.snapshot
+        if snapshot and snapshot.version == version:
+            stats.count('database.snapshot_hits')
+            return snapshot.data
+        with self.snapshotLock:
+            snapshot = self.snapshot
+            if snapshot and snapshot.version == get_file_version(self.filename):
+                stats.count('database.snapshot_hits')
+                return snapshot.data
+            stats.count('database.snapshot_misses')
+            # A write landing during the read leaves the snapshot stale, so the next read reloads it
+            version = get_file_version(self.filename)
+            self.snapshot = Snapshot(self.database.read_data_to_memory(), version)
+            return self.snapshot.data
+
+    def run_writer(self):
+        while True:
+            batch = [self.pendingWrites.get()]
+            while len(batch) < self.maxBatchSize:
+                try:
+                    batch.append(self.pendingWrites.get_nowait())
+                except queue.Empty:
+                    break
+            writes = [write for write in batch if write is not STOP_WRITER]
+            if writes:
+                self.commit(writes)
+            if len(writes) < len(batch):
+                return
+
+    """
+    Applies writes in order and saves them in a single disk write
+    A write which raises fails alone, the others in the batch are still committed
+    """
+    def commit(self, writes: List[PendingWrite]):
+        results = []
+        try:
+            with self.database.write_lock():
+                data = self.database.read_data_to_memory()
+                for write in writes:
+                    try:
+                        results.append((write.future, write.apply(data), None))
+                    except Exception as e:
+                        results.append((write.future, None, e))
+                if any(result for _, result, _ in results):
+                    self.database.write_data_to_disk(data)
+                # Taken under the write lock, so version belongs to exactly this data
+                version = get_file_version(self.filename)
+            with self.snapshotLock:
+                self.snapshot = Snapshot(data, version)
+        except Exception as e:
+            for write in writes:
+                write.future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    # Queues apply(data) for the writer and waits until it is committed
+    def submit_write(self, apply: Callable[[Dict[str, Dict]], Any]):
+        if not self.writer.is_alive():
+            raise RuntimeError('database is closed')
+        future = Future()
+        self.pendingWrites.put(PendingWrite(apply, future))
+        return future.result()
+
+    def reset_database(self):
+        def reset(data):
+            data.clear()
+            return True
+        self.submit_write(reset)
+
+    def create_table(self, tableName: str, columns: Dict[str, Dict[str, str]]) -> bool:
+        return self.submit_write(lambda data: self.database.apply_create_table(data, tableName, columns))
+
+    def insert_row(self, tableName: str, values: Dict[str, Any], _id=None) -> str:
+        ids = self.insert_rows(tableName, [values], ids=[_id])
+        return ids and ids[0]
+
+    def insert_rows(self, tableName: str, rows: List[Dict[str, Any]], ids: List[str]=None) -> List[str]:
+        return self.submit_write(lambda data: self.database.apply_insert_rows(data, tableName, rows, ids))
+
+    def delete_row(self, tableName: str, _id: str) -> bool:
+        return self.submit_write(lambda data: self.database.apply_delete_row(data, tableName, _id))
+
+    def alter_table(self, tableName: str, add: List[FieldDefinition]=None, drop: List[str]=None,
+                    retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> int:
+        return self.submit_write(
+            lambda data: self.database.apply_alter_table(data, tableName, add, drop, retype, defaults)
+        )
+
+    # Read from the snapshot, see JSONDatabase.get_table_version
+    def get_table_version(self, tableName: str):
+        table = self.read_data_to_memory().get(tableName)
+        if table is None:
+            return
+        return table.get(DatabaseKeys.TABLE_VERSION_KEY) or get_file_version(self.filename)
+
+    def get_all_table_names(self):
+        return list(self.read_data_to_memory().keys())
+
+    def get_table_schema(self, tableName: str) -> List[FieldDefinition]:
+        data = self.read_data_to_memory()
+        if tableName not in data:
+            raise ValueError(f'table {tableName} does not exist')
+        return schema_to_field_definitions(data[tableName][DatabaseKeys.SCHEMA_KEY])
+
+    """
+    Returns all entries under tableName, at its current schema version
+    Rows of an altered table are upgraded once per snapshot, not on every read
+    Returns None if tableName doesn't exist
+    """
+    def get_all_rows(self, tableName: str) -> Dict[str, Dict[str, Any]]:
+        data = self.read_data_to_memory()
+        if tableName not in data:
+            return
+        table = data[tableName]
+        if not table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY):
+            return table[DatabaseKeys.ROWS_KEY]
+        upgraded = self.upgradedRows.get(tableName)
+        if upgraded and upgraded[0] is data:
+            return upgraded[1]
+        rows = upgrade_table_rows(table)
+        self.upgradedRows[tableName] = (data, rows)
+        return rows
+
+    def get_rows_with_filter(self, tableName: str, _filter: VisualizeFilters):
+        allRows = self.get_all_rows(tableName)
+        if not allRows:
+            return
+        return self.database.filter_rows(allRows, _filter)
+
+    def filter_rows(self, rows: Dict[str, Dict[str, Any]], _filter: VisualizeFilters):
+        return self.database.filter_rows(rows, _filter)
+
+    def explain(self, tableName: str, _filter: VisualizeFilters, analyze: bool=False) -> QueryPlan:
+        return explain_filter(tableName, type(self).__name__, lambda: self.get_all_rows(tableName),
+                              _filter, self.database.get_single_filter_function, analyze)
@@ -1,13 +1,91 @@
 import json
+import os
+import tempfile
+import threading
 import uuid
+from contextlib import contextmanager
 from typing import List, Dict, Any
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: writers are only serialized between threads sharing a JSONDatabase
+    fcntl = None
+
 from .abstract_database import Database
+from .query_plan import QueryPlan, plan_filter_stages, run_filter_stages, explain_filter
+from .schema_evolution import build_migration, apply_migration_to_table, upgrade_table_rows, \
+    record_row_versions, forget_row_version
 from definitions import FilterOperator, FilterCondition, VisualizeFilters, \
     FieldDefinition, DatabaseKeys
+from instrumentation import stats, timed
 
 
 DEFAULT_DB_FILENAME = 'json_database.json'
+LOCK_FILE_SUFFIX = '.lock'
+
+
+"""
+Writes to a temporary file and atomically swaps it in
+Concurrent readers see either the old or the new file, never a partial one
+Returns the file version of the new file, see get_file_version
+"""
+def write_file_atomically(filename: str, content: bytes) -> tuple:
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmpFilename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            version = get_stat_version(os.fstat(f.fileno()))
+        os.replace(tmpFilename, filename)
+        return version
+    except:
+        os.remove(tmpFilename)
+        raise
+
+# Whether file is still the file at filename, i.e. no writer has replaced it since it was opened
+def is_current_file(filename: str, file) -> bool:
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return False
+    openedStat = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino) == (openedStat.st_dev, openedStat.st_ino)
+
+def get_stat_version(stat: os.stat_result) -> tuple:
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+# Changes whenever the file at filename is replaced, None if there is no file
+def get_file_version(filename: str) -> tuple:
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return
+    return get_stat_version(stat)
+
+# Gives the table a new TABLE_VERSION_KEY, called by every write to it
+def touch_table(table: Dict[str, Any]) -> None:
+    table[DatabaseKeys.TABLE_VERSION_KEY] = uuid.uuid4().hex
+
+"""
+Returns { tableName: table version } of data
+Tables written before TABLE_VERSION_KEY existed fall back to fileVersion, the version of the whole file
+"""
+def get_table_versions(data: Dict[str, Dict], fileVersion: tuple) -> Dict[str, Any]:
+    return {
+        tableName: table.get(DatabaseKeys.TABLE_VERSION_KEY) or fileVersion
+            for tableName, table in data.items() if isinstance(table, dict)
+    }
+
+def schema_to_field_definitions(schema: Dict[str, Dict[str, str]]) -> List[FieldDefinition]:
+    return [
+        FieldDefinition(fieldName, 
+                        fieldType=schemaDict[DatabaseKeys.SCHEMA_TYPE_KEY], 
+                        required=schemaDict[DatabaseKeys.SCHEMA_REQUIRED_KEY]
+        ) for (fieldName, schemaDict) in schema.items()
+    ]
+
 
 """
 A JSON-based Database implementation
@@ -35,25 +113,113 @@ Representation:
         ...
     }, ...
 }
+
+Concurrency:
+    The file is only ever replaced atomically, so readers take no lock
+    Writers hold an exclusive fcntl lock on filename + LOCK_FILE_SUFFIX for their
+        read-modify-write cycle, so processes sharing the file never lose each other's writes
 """
 class JSONDatabase(Database):
 
     def __init__(self, filename=None):
         self.filename = filename or DEFAULT_DB_FILENAME
+        self.lockFilename = self.filename + LOCK_FILE_SUFFIX
+        # Serializes read-modify-write cycles between threads sharing this instance
+        self.lock = threading.RLock()
+        # (file version, { tableName: table version }) of the file last read or written, see get_table_version
+        self.tableVersions = (None, {})
+
+    """
+    Held by writers, excludes other writers in this process and in other processes
+    Without fcntl only threads sharing this instance are excluded
+    """
+    @contextmanager
+    def write_lock(self):
+        with self.lock:
+            if not fcntl:
+                yield
+                return
+            with open(self.lockFilename, 'a') as lockFile:
+                fcntl.flock(lockFile, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    """
+    Applies modify to the data and writes it back if modify returns a truthy result
+    The data is parsed before the write lock is taken, and only parsed again under the lock
+        if another writer replaced the file in the meantime, which keeps the lock short
+    Returns the result of modify
+    """
+    def modify_data(self, modify):
+        # Keeping the parsed file open pins its inode, so an unchanged inode means unchanged data
+        try:
+            parsedFile = fcntl and open(self.filename, 'rb')
+        except FileNotFoundError:
+            parsedFile = None
+        try:
+            data = parsedFile and self.read_data_to_memory()
+            with self.write_lock():
+                if not parsedFile or not is_current_file(self.filename, parsedFile):
+                    data = self.read_data_to_memory()
+                result = modify(data)
+                if result:
+                    self.write_data_to_disk(data)
+                return result
+        finally:
+            if parsedFile:
+                parsedFile.close()
 
     def reset_database(self):
-        self.write_data_to_disk({})
+        with self.write_lock():
+            self.write_data_to_disk({})
 
+    @timed('database.read')
     def read_data_to_memory(self) -> Dict[str, Dict]:
         try:
-            with open(self.filename) as f:
-                return json.load(f)
+            return self.load_data()
         except:
             return {}
 
+    """
+    Returns the data of the file as read_data_to_memory does, but raises where it would return {}
+    Raises FileNotFoundError if there is no file, ValueError if the file is not a database of this format
+    """
+    def load_data(self) -> Dict[str, Dict]:
+        with open(self.filename, 'rb') as f:
+            # The version of the file opened, even if another writer replaces it meanwhile
+            fileVersion = get_stat_version(os.fstat(f.fileno()))
+            content = f.read()
+        stats.count('database.file_reads')
+        stats.count('database.bytes_parsed', len(content))
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise ValueError(f'{self.filename} is not a JSON database')
+        self.tableVersions = (fileVersion, get_table_versions(data, fileVersion))
+        return data
+
+    @timed('database.write')
     def write_data_to_disk(self, data: Dict[str, Dict]):
-        with open(self.filename, 'w') as f:
-            json.dump(data, f, indent=4)
+        content = json.dumps(data, indent=4).encode()
+        fileVersion = write_file_atomically(self.filename, content)
+        self.tableVersions = (fileVersion, get_table_versions(data, fileVersion))
+        stats.count('database.file_writes')
+        stats.count('database.bytes_written', len(content))
+
+    """
+    Changes with every write to tableName, but not with writes to other tables of the file
+    Read from the file only if it was replaced since this instance last read or wrote it
+    """
+    def get_table_version(self, tableName: str):
+        fileVersion = get_file_version(self.filename)
+        if fileVersion is None:
+            return
+        if self.tableVersions[0] != fileVersion:
+            self.read_data_to_memory()
+        cachedVersion, tableVersions = self.tableVersions
+        # Replaced again while being read, only the file version is known to be current
+        return tableVersions.get(tableName) if cachedVersion == fileVersion else fileVersion
 
     def get_all_table_names(self):
         data = self.read_data_to_memory()
@@ -64,28 +230,43 @@ class JSONDatabase(Database):
     Returns True if successful
     """
     def create_table(self, tableName: str, columns: Dict[str, Dict[str, str]]) -> bool:
-        data = self.read_data_to_memory()
+        return self.modify_data(lambda data: self.apply_create_table(data, tableName, columns))
+
+    def apply_create_table(self, data: Dict[str, Dict], tableName: str, columns: Dict[str, Dict[str, str]]) -> bool:
         if tableName in data:
             return False
         data[tableName] = { 
             DatabaseKeys.SCHEMA_KEY: dict(columns),
             DatabaseKeys.ROWS_KEY: {},
         }
-        self.write_data_to_disk(data)
+        touch_table(data[tableName])
         return True
 
+    """
+    Adds, drops and retypes columns of a table, see schema_evolution
+    Only the schema changes, stored rows are upgraded when read
+    defaults: { columnName: value } of added columns, given to the rows stored before
+    Returns the new schema version
+    Raises ValueError if the table doesn't exist or the change doesn't fit its schema
+    """
+    def alter_table(self, tableName: str, add: List[FieldDefinition]=None, drop: List[str]=None,
+                    retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> int:
+        return self.modify_data(lambda data: self.apply_alter_table(data, tableName, add, drop, retype, defaults))
+
+    def apply_alter_table(self, data: Dict[str, Dict], tableName: str, add: List[FieldDefinition]=None,
+                          drop: List[str]=None, retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> int:
+        if tableName not in data:
+            raise ValueError(f'table {tableName} does not exist')
+        table = data[tableName]
+        migration = build_migration(table[DatabaseKeys.SCHEMA_KEY], add, drop, retype, defaults)
+        touch_table(table)
+        return apply_migration_to_table(table, migration)
+
     def get_table_schema(self, tableName: str) -> List[FieldDefinition]:
         data = self.read_data_to_memory()
         if tableName not in data:
             raise ValueError(f'table {tableName} does not exist')
-        schema = data[tableName][DatabaseKeys.SCHEMA_KEY]
-
-        return [
-            FieldDefinition(fieldName, 
-                            fieldType=schemaDict[DatabaseKeys.SCHEMA_TYPE_KEY], 
-                            required=schemaDict[DatabaseKeys.SCHEMA_REQUIRED_KEY]
-            ) for (fieldName, schemaDict) in schema.items()
-        ]
+        return schema_to_field_definitions(data[tableName][DatabaseKeys.SCHEMA_KEY])
 
     """
     Verify whether the input value against schema
@@ -108,44 +289,66 @@ class JSONDatabase(Database):
     Returns uuid if successful
     """
     def insert_row(self, tableName: str, values: Dict[str, Any], _id=None) -> bool:
-        data = self.read_data_to_memory()
+        ids = self.insert_rows(tableName, [values], ids=[_id])
+        return ids and ids[0]
+
+    """
+    Creates new entries under tableName in a single write
+    Caller may specify a uuid for each entry, None entries get a new uuid
+    Either all entries are inserted or, if any fails the schema check, none
+    Returns the uuids in order if successful
+    """
+    def insert_rows(self, tableName: str, rows: List[Dict[str, Any]], ids: List[str]=None) -> List[str]:
+        return self.modify_data(lambda data: self.apply_insert_rows(data, tableName, rows, ids))
+
+    def apply_insert_rows(self, data: Dict[str, Dict], tableName: str, rows: List[Dict[str, Any]],
+                          ids: List[str]=None) -> List[str]:
         if tableName not in data:
             return
         schema = data[tableName][DatabaseKeys.SCHEMA_KEY]
-        self.verify_schema(schema, values)
+        for values in rows:
+            self.verify_schema(schema, values)
 
-        if not _id:
-            _id = uuid.uuid4().hex
-            while _id in data[tableName][DatabaseKeys.ROWS_KEY]:
+        tableRows = data[tableName][DatabaseKeys.ROWS_KEY]
+        insertedIds = []
+        for values, _id in zip(rows, ids or [None] * len(rows)):
+            if not _id:
                 _id = uuid.uuid4().hex
-        data[tableName][DatabaseKeys.ROWS_KEY][_id] = values
-        self.write_data_to_disk(data)
-        return _id
+                while _id in tableRows:
+                    _id = uuid.uuid4().hex
+            tableRows[_id] = values
+            insertedIds.append(_id)
+        record_row_versions(data[tableName], insertedIds)
+        touch_table(data[tableName])
+        return insertedIds
 
     """
     Deletes an entry under tableName
     Returns True if successful
     """
     def delete_row(self, tableName: str, _id: str) -> bool:
-        data = self.read_data_to_memory()
+        return self.modify_data(lambda data: self.apply_delete_row(data, tableName, _id))
+
+    def apply_delete_row(self, data: Dict[str, Dict], tableName: str, _id: str) -> bool:
         if tableName not in data:
             return
         rows = data[tableName][DatabaseKeys.ROWS_KEY]
         if _id not in rows:
             return
         del rows[_id]
-        self.write_data_to_disk(data)
+        forget_row_version(data[tableName], _id)
+        touch_table(data[tableName])
         return True
 
     """
-    Returns all entries under tableName
+    Returns all entries under tableName, at its current schema version
     Returns None if tableName doesn't exist
     """
     def get_all_rows(self, tableName: str) -> Dict[str, Dict[str, Any]]:
         data = self.read_data_to_memory()
         if tableName not in data:
             return
-        return data[tableName][DatabaseKeys.ROWS_KEY]
+        return upgrade_table_rows(data[tableName])
 
     """
     Constructs a filter function which returns True
@@ -186,7 +389,6 @@ class JSONDatabase(Database):
                     filterFuncs.append(self.get_single_filter_function(columnKey, filterCondition))
         return lambda entry: all([f(entry) for f in filterFuncs])
 
-
     """
     Returns all entries under tableName which satisfy the filter conditions
     """
@@ -194,8 +396,25 @@ class JSONDatabase(Database):
         allRows = self.get_all_rows(tableName)
         if not allRows:
             return
-        filterFunction = self.get_filter_function(_filter)
-        return {
-            _id: entry for _id, entry in allRows.items() \
-                if filterFunction(entry)
-        }
+        return self.filter_rows(allRows, _filter)
+
+    """
+    Returns the entries of rows which satisfy the filter conditions
+    Conditions run one after the other, the most selective first, see query_plan
+    """
+    @timed('database.filter')
+    def filter_rows(self, rows: Dict[str, Dict[str, Any]], _filter: VisualizeFilters):
+        stages = plan_filter_stages(rows, _filter, self.get_single_filter_function)
+        filteredRows, _ = run_filter_stages(rows, stages)
+        stats.count('database.rows_scanned', len(rows))
+        stats.count('database.rows_returned', len(filteredRows))
+        return filteredRows
+
+    """
+    Returns the QueryPlan get_rows_with_filter follows for tableName and _filter
+    analyze: also run the query, recording actual rows and timings per stage
+    Raises ValueError if tableName doesn't exist
+    """
+    def explain(self, tableName: str, _filter: VisualizeFilters, analyze: bool=False) -> QueryPlan:
+        return explain_filter(tableName, type(self).__name__, lambda: self.get_all_rows(tableName),
+                              _filter, self.get_single_filter_function, analyze)
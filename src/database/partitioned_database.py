@@ -0,0 +1,616 @@
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, Set
+
+from .abstract_database import Database
+from .json_database import JSONDatabase, write_file_atomically, get_file_version, schema_to_field_definitions, \
+    touch_table
+from .query_plan import QueryPlan, PARTITION_SCAN, explain_filter
+from .schema_evolution import get_schema_version, upgrade_rows, build_migration, apply_migration_to_table
+from .sharded_database import MANIFEST_FILENAME, MANIFEST_TABLES_KEY, get_table_file_stem
+from definitions import FilterOperator, FilterCondition, VisualizeFilters, FieldDefinition, \
+    DatabaseKeys, DefaultFieldNames
+from instrumentation import stats, timed
+
+
+DEFAULT_PARTITIONED_DIRECTORY = 'partitioned_database'
+# Rows are partitioned by the month of this column
+PARTITION_COLUMN = DefaultFieldNames.DATE
+PARTITION_PATTERN = re.compile(r'\d{4}[-/]\d{2}')
+# Decoded sealed segments kept in memory, sealed segments never change so a cached one is never stale
+SEGMENT_CACHE_SIZE = 32
+SEALED_SEGMENT_SUFFIX = '.gz'
+# Seconds a segment file stays on disk after a write made it obsolete, for readers still holding the manifest before it
+OBSOLETE_SEGMENT_GRACE_SECONDS = 60
+
+# { segment filename: time it became obsolete }, files to remove by a later write
+MANIFEST_OBSOLETE_KEY = 'OBSOLETE'
+
+SEGMENTS_KEY = 'SEGMENTS'
+SEGMENT_FILE_KEY = 'FILE'
+SEGMENT_PARTITION_KEY = 'PARTITION'
+SEGMENT_SEALED_KEY = 'SEALED'
+SEGMENT_ROW_COUNT_KEY = 'ROW_COUNT'
+SEGMENT_STATS_KEY = 'STATS'
+SEGMENT_SCHEMA_VERSION_KEY = 'SCHEMA_VERSION'
+SEGMENT_DELETED_KEY = 'DELETED'
+
+
+# 'YYYY-MM' of a DATE value, None for a value without one
+def get_partition(value: Any) -> str:
+    if isinstance(value, str) and PARTITION_PATTERN.match(value):
+        return f'{value[:4]}-{value[5:7]}'
+
+"""
+Returns { column: [min, max, count] } of rows, count being the rows with a value for column
+A column holding values which can't be ordered against each other, such as lists, None
+    or both numbers and text, gets None, it can't rule out any filter
+"""
+def compute_column_stats(rows: Iterable[Dict[str, Any]]) -> Dict[str, list]:
+    kinds = {}
+    columnStats = {}
+    for row in rows:
+        for column, value in row.items():
+            if isinstance(value, str):
+                kind = str
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                kind = float
+            else:
+                kind = None
+            if kinds.setdefault(column, kind) is not kind:
+                kinds[column] = None
+            if not kinds[column]:
+                continue
+            if column in columnStats:
+                low, high, count = columnStats[column]
+                columnStats[column] = [min(low, value), max(high, value), count + 1]
+            else:
+                columnStats[column] = [value, value, 1]
+    return { column: columnStats.get(column) if kind else None for column, kind in kinds.items() }
+
+# Columns added, dropped or retyped since schema version, their stored statistics no longer describe the rows as read
+def get_stale_columns(migrations: List[Dict[str, Any]], version: int) -> Set[str]:
+    columns = set()
+    for migration in migrations[version:]:
+        columns.update(migration[DatabaseKeys.MIGRATION_ADD_KEY])
+        columns.update(migration[DatabaseKeys.MIGRATION_DROP_KEY])
+        columns.update(migration[DatabaseKeys.MIGRATION_RETYPE_KEY])
+    return columns
+
+"""
+Whether no row can satisfy condition, given the [min, max, count] of its column over rowCount rows
+Follows JSONDatabase.get_single_filter_function: a row without the column fails every condition
+    and satisfies every negated one
+Raises TypeError if the operand can't be ordered against the values
+"""
+def rules_out(columnStats: list, rowCount: int, condition: FilterCondition) -> bool:
+    low, high, count = columnStats
+    operator, operand = condition.operator, condition.operand
+    if operator == FilterOperator.CONTAINS:
+        return False
+    if not condition.negate:
+        if count == 0:
+            return True
+        if operator == FilterOperator.GREATER:
+            return not high > operand
+        if operator == FilterOperator.LESS:
+            return not low < operand
+        return operand < low or operand > high
+    if count < rowCount:
+        return False
+    if operator == FilterOperator.GREATER:
+        return low > operand
+    if operator == FilterOperator.LESS:
+        return high < operand
+    return low == high == operand
+
+"""
+Whether the statistics of a sealed segment show none of its rows satisfy _filter
+The segment open for writes keeps no statistics and is always read
+"""
+def can_skip_segment(segment: Dict[str, Any], _filter: VisualizeFilters, migrations: List[Dict[str, Any]]) -> bool:
+    if not segment[SEGMENT_SEALED_KEY] or not _filter:
+        return False
+    staleColumns = get_stale_columns(migrations, segment[SEGMENT_SCHEMA_VERSION_KEY])
+    segmentStats = segment[SEGMENT_STATS_KEY]
+    for column, conditions in _filter.filters.items():
+        if column in staleColumns:
+            continue
+        # A column no row of the segment holds
+        columnStats = segmentStats.get(column, [None, None, 0])
+        if columnStats is None:
+            continue
+        for condition in conditions:
+            try:
+                if rules_out(columnStats, segment[SEGMENT_ROW_COUNT_KEY], condition):
+                    return True
+            except TypeError:
+                # Left to the filter, which compares the values itself
+                pass
+    return False
+
+def count_rows(table: Dict[str, Any]) -> int:
+    return sum(segment[SEGMENT_ROW_COUNT_KEY] - len(segment.get(SEGMENT_DELETED_KEY, ()))
+               for segment in table[SEGMENTS_KEY])
+
+
+"""
+A Database storing the rows of each table in segments partitioned by the month of their DATE, under one directory
+Representation:
+directory/
+    MANIFEST_FILENAME: { MANIFEST_TABLES_KEY: {
+        tableName: {
+            SCHEMA_KEY, SCHEMA_MIGRATIONS_KEY: as JSONDatabase stores them,
+            TABLE_VERSION_KEY: changes with every write to the table, see touch_table,
+            SEGMENTS_KEY: [
+                {
+                    SEGMENT_FILE_KEY: segment filename,
+                    SEGMENT_PARTITION_KEY: 'YYYY-MM', or None until a row with a DATE is written,
+                    SEGMENT_SEALED_KEY: bool,
+                    SEGMENT_ROW_COUNT_KEY: rows stored in the segment file,
+                    Sealed segments only:
+                    SEGMENT_STATS_KEY: { column: [min, max, count] }, see compute_column_stats,
+                    SEGMENT_SCHEMA_VERSION_KEY: schema version the statistics were computed at,
+                    SEGMENT_DELETED_KEY: ids of the rows deleted since the segment was sealed
+                }, ...
+            ]
+        }, ...
+    } }
+    MANIFEST_FILENAME: { ..., MANIFEST_OBSOLETE_KEY: { segment filename: time it became obsolete } }
+    segment filename: { ROWS_KEY: rows, ROW_SCHEMA_VERSIONS_KEY: row versions }, gzip compressed once sealed
+
+Only the last segment of a table is open for writes, its rows are rewritten by every insert
+A row of a later month seals it, computing its statistics and compressing it, and opens a new segment
+    Rows of earlier months, arriving late, still go to the open segment, the statistics of a segment
+    cover whatever it holds, so they stay correct
+Sealed segments are never rewritten, a deleted or replaced row is only recorded in SEGMENT_DELETED_KEY
+Filtered reads skip the sealed segments whose statistics rule out the filter
+
+Concurrency:
+    Writers hold the manifest write lock while they write segment files, then replace the manifest
+    Files a write makes obsolete, such as the open segment it sealed, are listed in the manifest and only
+        removed by the first write OBSOLETE_SEGMENT_GRACE_SECONDS later, so readers of the manifest before
+        can still read them
+    A reader finding a segment file missing nonetheless reads the newer manifest again, see read_tables
+
+Attributes:
+- filename: str : The directory, named like the file of the other Databases
+- manifest: JSONDatabase : The manifest file
+- segmentCache: OrderedDict : Decoded sealed segments by filename, least recently read first
+"""
+class PartitionedJSONDatabase(Database):
+
+    def __init__(self, filename=None):
+        self.filename = filename or DEFAULT_PARTITIONED_DIRECTORY
+        os.makedirs(self.filename, exist_ok=True)
+        self.manifest = JSONDatabase(os.path.join(self.filename, MANIFEST_FILENAME))
+        # (manifest file version, tables), the manifest is parsed again only when it was replaced
+        self.manifestCache = (None, {})
+        self.segmentCache = OrderedDict()
+        self.segmentCacheLock = threading.Lock()
+
+    # (manifest file version, { tableName: table }), the tables are shared and must not be modified
+    def load_manifest(self) -> tuple:
+        version = get_file_version(self.manifest.filename)
+        if version is None:
+            return None, {}
+        manifestCache = self.manifestCache
+        if version != manifestCache[0]:
+            manifestCache = (version, self.manifest.read_data_to_memory().get(MANIFEST_TABLES_KEY, {}))
+            self.manifestCache = manifestCache
+        return manifestCache
+
+    # { tableName: table }, shared, must not be modified
+    def get_manifest_tables(self) -> Dict[str, Dict[str, Any]]:
+        return self.load_manifest()[1]
+
+    """
+    Returns read(tables) of the latest manifest, read: { tableName: table } -> result
+    A segment file the manifest lists can only be missing if a writer removed it after replacing the manifest,
+        so read runs again on the newer manifest
+    Raises FileNotFoundError if the manifest did not change, the file is lost
+    """
+    def read_tables(self, read):
+        while True:
+            version, tables = self.load_manifest()
+            try:
+                return read(tables)
+            except FileNotFoundError:
+                if get_file_version(self.manifest.filename) == version:
+                    raise
+                stats.count('database.segment_read_retries')
+
+    def get_table(self, tableName: str) -> Dict[str, Any]:
+        return self.get_manifest_tables().get(tableName)
+
+    def get_segment_path(self, segmentFilename: str) -> str:
+        return os.path.join(self.filename, segmentFilename)
+
+    """
+    Returns the data of a segment file, {} if it is damaged
+    Raises FileNotFoundError if it is missing, see read_tables
+    """
+    @timed('database.read_segment')
+    def read_segment_file(self, segment: Dict[str, Any]) -> Dict[str, Any]:
+        with open(self.get_segment_path(segment[SEGMENT_FILE_KEY]), 'rb') as f:
+            content = f.read()
+        try:
+            if segment[SEGMENT_SEALED_KEY]:
+                content = gzip.decompress(content)
+            stats.count('database.file_reads')
+            stats.count('database.bytes_parsed', len(content))
+            return json.loads(content)
+        except:
+            return {}
+
+    # Returns the data of a segment, sealed segments are shared and must not be modified
+    def read_segment(self, segment: Dict[str, Any]) -> Dict[str, Any]:
+        if not segment[SEGMENT_SEALED_KEY]:
+            return self.read_segment_file(segment)
+        segmentFilename = segment[SEGMENT_FILE_KEY]
+        with self.segmentCacheLock:
+            if segmentFilename in self.segmentCache:
+                self.segmentCache.move_to_end(segmentFilename)
+                return self.segmentCache[segmentFilename]
+        data = self.read_segment_file(segment)
+        with self.segmentCacheLock:
+            self.segmentCache[segmentFilename] = data
+            while len(self.segmentCache) > SEGMENT_CACHE_SIZE:
+                self.segmentCache.popitem(last=False)
+        return data
+
+    @timed('database.write_segment')
+    def write_segment(self, segment: Dict[str, Any], data: Dict[str, Any]):
+        content = json.dumps(data, indent=None if segment[SEGMENT_SEALED_KEY] else 4).encode()
+        if segment[SEGMENT_SEALED_KEY]:
+            content = gzip.compress(content, mtime=0)
+        write_file_atomically(self.get_segment_path(segment[SEGMENT_FILE_KEY]), content)
+        stats.count('database.file_writes')
+        stats.count('database.bytes_written', len(content))
+
+    def remove_segment_files(self, segmentFilenames: List[str]):
+        for segmentFilename in segmentFilenames:
+            with self.segmentCacheLock:
+                self.segmentCache.pop(segmentFilename, None)
+            try:
+                os.remove(self.get_segment_path(segmentFilename))
+            except FileNotFoundError:
+                pass
+
+    # Rows of a segment at the table's current schema version, without the deleted ones
+    def read_segment_rows(self, table: Dict[str, Any], segment: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        data = self.read_segment(segment)
+        rows = data.get(DatabaseKeys.ROWS_KEY, {})
+        deleted = segment.get(SEGMENT_DELETED_KEY)
+        if deleted:
+            deleted = set(deleted)
+            rows = { _id: row for _id, row in rows.items() if _id not in deleted }
+        return upgrade_rows(rows, table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY),
+                            data.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY))
+
+    def read_rows(self, table: Dict[str, Any], segments: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        rows = {}
+        for segment in segments:
+            rows.update(self.read_segment_rows(table, segment))
+        stats.count('database.segments_read', len(segments))
+        return rows
+
+    # Segments of table which may hold rows satisfying _filter
+    def get_segments_to_read(self, table: Dict[str, Any], _filter: VisualizeFilters) -> List[Dict[str, Any]]:
+        migrations = table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY) or []
+        segments = [segment for segment in table[SEGMENTS_KEY] if not can_skip_segment(segment, _filter, migrations)]
+        stats.count('database.segments_skipped', len(table[SEGMENTS_KEY]) - len(segments))
+        return segments
+
+    def new_segment(self, tableName: str, partition: str) -> Dict[str, Any]:
+        return {
+            SEGMENT_FILE_KEY: f'{get_table_file_stem(tableName)}-{uuid.uuid4().hex[:12]}.json',
+            SEGMENT_PARTITION_KEY: partition,
+            SEGMENT_SEALED_KEY: False,
+            SEGMENT_ROW_COUNT_KEY: 0,
+        }
+
+    # Compresses the open segment into a new file, along with the statistics of its rows as read
+    def seal_segment(self, table: Dict[str, Any], segment: Dict[str, Any], data: Dict[str, Any],
+                     obsoleteFiles: List[str]):
+        rows = upgrade_rows(data[DatabaseKeys.ROWS_KEY], table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY),
+                            data.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY))
+        obsoleteFiles.append(segment[SEGMENT_FILE_KEY])
+        segment.update({
+            SEGMENT_FILE_KEY: segment[SEGMENT_FILE_KEY] + SEALED_SEGMENT_SUFFIX,
+            SEGMENT_SEALED_KEY: True,
+            SEGMENT_ROW_COUNT_KEY: len(rows),
+            SEGMENT_STATS_KEY: compute_column_stats(rows.values()),
+            SEGMENT_SCHEMA_VERSION_KEY: get_schema_version(table),
+            SEGMENT_DELETED_KEY: [],
+        })
+        self.write_segment(segment, data)
+        stats.count('database.segments_sealed')
+
+    """
+    Appends rows to the open segment of table, sealing it whenever a row of a later month arrives
+    Rows are taken month by month, so a bulk write of a whole history yields one segment per month
+    rowVersions: { id: schema version } of the rows written at a version other than 0
+    currentData: the data of the open segment, if the caller already read it
+    """
+    def append_rows(self, tableName: str, table: Dict[str, Any], rows: Dict[str, Dict[str, Any]],
+                    rowVersions: Dict[str, int], obsoleteFiles: List[str], currentData: Dict[str, Any]=None):
+        rowsByPartition = {}
+        for _id, row in rows.items():
+            rowsByPartition.setdefault(get_partition(row.get(PARTITION_COLUMN)), {})[_id] = row
+        partitions = sorted(partition for partition in rowsByPartition if partition is not None)
+        if None in rowsByPartition:
+            partitions.append(None)
+
+        segments = table[SEGMENTS_KEY]
+        current = segments[-1] if segments else None
+        if current and currentData is None:
+            currentData = self.read_segment(current)
+        for partition in partitions:
+            if current and partition and (not current[SEGMENT_PARTITION_KEY] or partition > current[SEGMENT_PARTITION_KEY]):
+                if current[SEGMENT_PARTITION_KEY] and currentData.get(DatabaseKeys.ROWS_KEY):
+                    self.seal_segment(table, current, currentData, obsoleteFiles)
+                    current = None
+                else:
+                    current[SEGMENT_PARTITION_KEY] = partition
+            if not current:
+                current = self.new_segment(tableName, partition)
+                segments.append(current)
+                currentData = {}
+            partitionRows = rowsByPartition[partition]
+            currentData.setdefault(DatabaseKeys.ROWS_KEY, {}).update(partitionRows)
+            versions = { _id: rowVersions[_id] for _id in partitionRows if rowVersions.get(_id) }
+            if versions:
+                currentData.setdefault(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {}).update(versions)
+        if current:
+            current[SEGMENT_ROW_COUNT_KEY] = len(currentData.get(DatabaseKeys.ROWS_KEY, {}))
+            self.write_segment(current, currentData)
+
+    """
+    Removes the rows with ids from table, looking in the newest segments first
+    Rows of the open segment are removed from currentData, which the caller writes back
+    Rows of sealed segments are recorded as deleted
+    Returns the ids found
+    """
+    def remove_rows(self, table: Dict[str, Any], ids: Set[str], currentData: Dict[str, Any]) -> Set[str]:
+        remaining = set(ids)
+        currentRows = currentData.get(DatabaseKeys.ROWS_KEY, {})
+        for _id in remaining & set(currentRows):
+            del currentRows[_id]
+            currentData.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {}).pop(_id, None)
+            remaining.discard(_id)
+        for segment in reversed(table[SEGMENTS_KEY]):
+            if not remaining:
+                break
+            if not segment[SEGMENT_SEALED_KEY]:
+                continue
+            rows = self.read_segment(segment).get(DatabaseKeys.ROWS_KEY, {})
+            deleted = segment[SEGMENT_DELETED_KEY]
+            for _id in [_id for _id in remaining if _id in rows and _id not in deleted]:
+                deleted.append(_id)
+                remaining.discard(_id)
+        return set(ids) - remaining
+
+    """
+    Applies modify(tables, obsoleteFiles) to the manifest, modify lists the segment files it made obsolete
+    Those are kept for OBSOLETE_SEGMENT_GRACE_SECONDS, once the new manifest is in place
+        the files obsolete for longer are removed
+    """
+    def modify_tables(self, modify):
+        removable = []
+        def modify_manifest(manifest):
+            obsoleteFiles = []
+            result = modify(manifest.setdefault(MANIFEST_TABLES_KEY, {}), obsoleteFiles)
+            if not result:
+                return result
+            obsolete = manifest.setdefault(MANIFEST_OBSOLETE_KEY, {})
+            now = time.time()
+            removable.extend(segmentFilename for segmentFilename, obsoleteSince in obsolete.items()
+                             if now - obsoleteSince >= OBSOLETE_SEGMENT_GRACE_SECONDS)
+            for segmentFilename in removable:
+                del obsolete[segmentFilename]
+            # Segments opened and sealed by this write never had a file of their own
+            obsolete.update((segmentFilename, now) for segmentFilename in obsoleteFiles
+                            if os.path.exists(self.get_segment_path(segmentFilename)))
+            return result
+        result = self.manifest.modify_data(modify_manifest)
+        self.remove_segment_files(removable)
+        return result
+
+    def reset_database(self):
+        self.write_data_to_disk({})
+
+    # Returns every table, as JSONDatabase.read_data_to_memory would
+    def read_data_to_memory(self) -> Dict[str, Dict]:
+        return self.read_tables(self.read_all_tables)
+
+    def read_all_tables(self, tables: Dict[str, Dict[str, Any]]) -> Dict[str, Dict]:
+        data = {}
+        for tableName, table in tables.items():
+            rows, rowVersions = {}, {}
+            for segment in table[SEGMENTS_KEY]:
+                segmentData = self.read_segment(segment)
+                deleted = set(segment.get(SEGMENT_DELETED_KEY, ()))
+                segmentRows = segmentData.get(DatabaseKeys.ROWS_KEY, {})
+                rows.update((_id, row) for _id, row in segmentRows.items() if _id not in deleted)
+                rowVersions.update((_id, version) for _id, version in segmentData.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {}).items()
+                                   if _id not in deleted)
+            data[tableName] = { DatabaseKeys.SCHEMA_KEY: table[DatabaseKeys.SCHEMA_KEY], DatabaseKeys.ROWS_KEY: rows }
+            if DatabaseKeys.SCHEMA_MIGRATIONS_KEY in table:
+                data[tableName][DatabaseKeys.SCHEMA_MIGRATIONS_KEY] = table[DatabaseKeys.SCHEMA_MIGRATIONS_KEY]
+            if rowVersions:
+                data[tableName][DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY] = rowVersions
+        return data
+
+    # Replaces every table with those of data, partitioning their rows by month
+    def write_data_to_disk(self, data: Dict[str, Dict]):
+        def replace(tables, obsoleteFiles):
+            for table in tables.values():
+                obsoleteFiles.extend(segment[SEGMENT_FILE_KEY] for segment in table[SEGMENTS_KEY])
+            tables.clear()
+            for tableName, tableData in data.items():
+                table = { DatabaseKeys.SCHEMA_KEY: dict(tableData[DatabaseKeys.SCHEMA_KEY]), SEGMENTS_KEY: [] }
+                if tableData.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY):
+                    table[DatabaseKeys.SCHEMA_MIGRATIONS_KEY] = tableData[DatabaseKeys.SCHEMA_MIGRATIONS_KEY]
+                self.append_rows(tableName, table, tableData.get(DatabaseKeys.ROWS_KEY, {}),
+                                 tableData.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {}), obsoleteFiles)
+                touch_table(table)
+                tables[tableName] = table
+            return True
+        self.modify_tables(replace)
+
+    def get_table_version(self, tableName: str):
+        table = self.get_table(tableName)
+        return table and table.get(DatabaseKeys.TABLE_VERSION_KEY)
+
+    def get_all_table_names(self):
+        return list(self.get_manifest_tables())
+
+    """
+    Creates a new table, its first segment is opened by its first insert
+    Returns True if successful
+    """
+    def create_table(self, tableName: str, columns: Dict[str, Dict[str, str]]) -> bool:
+        def create(tables, obsoleteFiles):
+            if tableName in tables:
+                return False
+            tables[tableName] = { DatabaseKeys.SCHEMA_KEY: dict(columns), SEGMENTS_KEY: [] }
+            touch_table(tables[tableName])
+            return True
+        return bool(self.modify_tables(create))
+
+    def get_table_schema(self, tableName: str) -> List[FieldDefinition]:
+        table = self.get_table(tableName)
+        if not table:
+            raise ValueError(f'table {tableName} does not exist')
+        return schema_to_field_definitions(table[DatabaseKeys.SCHEMA_KEY])
+
+    """
+    Adds, drops and retypes columns of a table, see schema_evolution
+    Only the manifest changes, the rows of every segment are upgraded when read
+    Returns the new schema version
+    Raises ValueError if the table doesn't exist or the change doesn't fit its schema
+    """
+    def alter_table(self, tableName: str, add: List[FieldDefinition]=None, drop: List[str]=None,
+                    retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> int:
+        def alter(tables, obsoleteFiles):
+            if tableName not in tables:
+                raise ValueError(f'table {tableName} does not exist')
+            table = tables[tableName]
+            migration = build_migration(table[DatabaseKeys.SCHEMA_KEY], add, drop, retype, defaults)
+            touch_table(table)
+            return apply_migration_to_table(table, migration)
+        return self.modify_tables(alter)
+
+    def insert_row(self, tableName: str, values: Dict[str, Any], _id=None) -> str:
+        ids = self.insert_rows(tableName, [values], ids=[_id])
+        return ids and ids[0]
+
+    """
+    Creates new entries under tableName in a single write, see JSONDatabase.insert_rows
+    A given id replaces the row holding it, whichever segment that is
+    Returns the uuids in order if successful
+    """
+    def insert_rows(self, tableName: str, rows: List[Dict[str, Any]], ids: List[str]=None) -> List[str]:
+        def insert(tables, obsoleteFiles):
+            table = tables.get(tableName)
+            if not table:
+                return
+            for values in rows:
+                self.manifest.verify_schema(table[DatabaseKeys.SCHEMA_KEY], values)
+
+            segments = table[SEGMENTS_KEY]
+            currentData = self.read_segment(segments[-1]) if segments else {}
+            givenIds = { _id for _id in ids or () if _id }
+            if givenIds:
+                self.remove_rows(table, givenIds, currentData)
+            currentRows = currentData.get(DatabaseKeys.ROWS_KEY, {})
+            newRows = {}
+            insertedIds = []
+            for values, _id in zip(rows, ids or [None] * len(rows)):
+                if not _id:
+                    _id = uuid.uuid4().hex
+                    while _id in newRows or _id in currentRows:
+                        _id = uuid.uuid4().hex
+                newRows[_id] = values
+                insertedIds.append(_id)
+            version = get_schema_version(table)
+            self.append_rows(tableName, table, newRows, dict.fromkeys(newRows, version),
+                             obsoleteFiles, currentData if segments else None)
+            touch_table(table)
+            return insertedIds
+        return self.modify_tables(insert)
+
+    """
+    Deletes an entry under tableName
+    Returns True if successful
+    """
+    def delete_row(self, tableName: str, _id: str) -> bool:
+        def delete(tables, obsoleteFiles):
+            table = tables.get(tableName)
+            if not table or not table[SEGMENTS_KEY]:
+                return
+            current = table[SEGMENTS_KEY][-1]
+            currentData = self.read_segment(current) if not current[SEGMENT_SEALED_KEY] else {}
+            inCurrent = _id in currentData.get(DatabaseKeys.ROWS_KEY, {})
+            if not self.remove_rows(table, { _id }, currentData):
+                return
+            if inCurrent:
+                current[SEGMENT_ROW_COUNT_KEY] = len(currentData[DatabaseKeys.ROWS_KEY])
+                self.write_segment(current, currentData)
+            touch_table(table)
+            return True
+        return self.modify_tables(delete)
+
+    """
+    Returns all entries under tableName, at its current schema version
+    Returns None if tableName doesn't exist
+    """
+    def get_all_rows(self, tableName: str) -> Dict[str, Dict[str, Any]]:
+        def read(tables):
+            table = tables.get(tableName)
+            return table and self.read_rows(table, table[SEGMENTS_KEY])
+        return self.read_tables(read)
+
+    """
+    Returns all entries under tableName which satisfy the filter conditions
+    Only the segments whose statistics don't rule out the filter are read
+    """
+    def get_rows_with_filter(self, tableName: str, _filter: VisualizeFilters):
+        def read(tables):
+            table = tables.get(tableName)
+            if not table or not count_rows(table):
+                return
+            return self.read_rows(table, self.get_segments_to_read(table, _filter))
+        rows = self.read_tables(read)
+        return rows and self.filter_rows(rows, _filter)
+
+    def filter_rows(self, rows: Dict[str, Dict[str, Any]], _filter: VisualizeFilters):
+        # Filtering reads no file, any JSONDatabase runs it
+        return self.manifest.filter_rows(rows, _filter)
+
+    def explain(self, tableName: str, _filter: VisualizeFilters, analyze: bool=False) -> QueryPlan:
+        table = self.get_table(tableName)
+        segments = table and self.get_segments_to_read(table, _filter)
+        def read(tables):
+            current = tables.get(tableName)
+            return current and self.read_rows(current, segments if current is table else self.get_segments_to_read(current, _filter))
+        plan = explain_filter(tableName, type(self).__name__, lambda: self.read_tables(read),
+                              _filter, self.manifest.get_single_filter_function, analyze)
+        return plan._replace(access=PARTITION_SCAN, segmentsRead=len(segments),
+                             segmentsSkipped=len(table[SEGMENTS_KEY]) - len(segments))
+
+
+def json_to_partitioned(jsonFilename: str, directory: str) -> None:
+    data = JSONDatabase(jsonFilename).load_data()
+    PartitionedJSONDatabase(directory).write_data_to_disk(data)
+
+def partitioned_to_json(directory: str, jsonFilename: str) -> None:
+    data = PartitionedJSONDatabase(directory).read_data_to_memory()
+    JSONDatabase(jsonFilename).write_data_to_disk(data)
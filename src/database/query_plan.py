@@ -0,0 +1,150 @@
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from definitions import FilterOperator, VisualizeFilters
+
+
+# Rows sampled, evenly spaced across the table, to estimate the selectivity of a FilterCondition
+SELECTIVITY_SAMPLE_SIZE = 256
+# Fewer rows are filtered in the order the conditions were given, sampling would cost about what reordering saves
+MIN_ROWS_TO_REORDER = 16 * SELECTIVITY_SAMPLE_SIZE
+
+# No Database keeps an index yet, every filtered read scans all rows of the table
+FULL_SCAN = 'full scan'
+# Scans the rows of the segments whose statistics don't rule out the filter, see PartitionedJSONDatabase
+PARTITION_SCAN = 'partition scan'
+
+
+class FilterStage(NamedTuple):
+    column: str
+    operator: FilterOperator
+    operand: Any
+    negate: bool
+    # Estimated fraction of rows which satisfy the condition, from a sample
+    selectivity: float
+    # Filled in by analyze: rows the stage examined, rows it kept, seconds it took
+    rowsIn: int=None
+    rowsOut: int=None
+    seconds: float=None
+
+    def describe(self) -> str:
+        condition = f'{self.column} {"NOT " if self.negate else ""}{self.operator.name} {self.operand!r}'
+        description = f'filter {condition} (selectivity {self.selectivity:.2f})'
+        if self.rowsIn is not None:
+            description += f' rows {self.rowsIn} -> {self.rowsOut} in {self.seconds * 1000:.3f} ms'
+        return description
+
+
+"""
+    QueryPlan describes how a filtered read of a table executes
+    Stages run in order, each on the rows kept by the previous one
+
+    Attributes:
+    - tableName: str : The table read
+    - database: str : Name of the Database implementation
+    - access: str : How rows are found, FULL_SCAN or PARTITION_SCAN
+    - rows: int : Rows in the table, or in the segments read by a PARTITION_SCAN
+    - stages: List[FilterStage] : Filter stages in execution order
+    - estimatedRows: int : Rows expected to satisfy every stage
+    - analyzed: bool : Whether the query was run, filling in actual rows and timings
+    - readSeconds: float : Analyze only, seconds spent reading the table
+    - rowsReturned: int : Analyze only, rows which satisfied every stage
+    - segmentsRead: int : PARTITION_SCAN only, segments whose rows are read
+    - segmentsSkipped: int : PARTITION_SCAN only, segments skipped by their statistics
+"""
+class QueryPlan(NamedTuple):
+    tableName: str
+    database: str
+    access: str
+    rows: int
+    stages: List[FilterStage]
+    estimatedRows: int
+    analyzed: bool=False
+    readSeconds: float=None
+    rowsReturned: int=None
+    segmentsRead: int=None
+    segmentsSkipped: int=None
+
+    def describe(self) -> str:
+        lines = [f'{self.access} of {self.tableName} on {self.database}: {self.rows} rows, '
+                 f'{self.estimatedRows} estimated to match']
+        if self.segmentsRead is not None:
+            lines.append(f'  {self.segmentsRead} segments read, {self.segmentsSkipped} skipped')
+        if self.analyzed:
+            lines.append(f'  read in {self.readSeconds * 1000:.3f} ms, {self.rowsReturned} rows returned')
+        lines += [f'  {i + 1}. {stage.describe()}' for i, stage in enumerate(self.stages)]
+        return '\n'.join(lines)
+
+    # JSON-serializable copy of the plan
+    def to_dict(self) -> Dict[str, Any]:
+        plan = self._asdict()
+        plan['stages'] = [dict(stage._asdict(), operator=stage.operator.name) for stage in self.stages]
+        return plan
+
+
+def sample_rows(rows: List[Dict[str, Any]], sampleSize: int=SELECTIVITY_SAMPLE_SIZE) -> List[Dict[str, Any]]:
+    step = max(1, len(rows) // sampleSize)
+    return rows[::step][:sampleSize]
+
+"""
+Estimates the selectivity of every FilterCondition of _filter on a sample of rows
+filterFunctionFactory: (column, FilterCondition) -> function testing one row
+Returns [(FilterStage, function)], most selective first
+    A single condition is not sampled, there is nothing to order
+    Without estimate, tables under MIN_ROWS_TO_REORDER rows are not sampled either
+"""
+def plan_filter_stages(rows: Dict[str, Dict[str, Any]], _filter: VisualizeFilters,
+                       filterFunctionFactory: Callable, estimate: bool=False) -> List[Tuple[FilterStage, Callable]]:
+    conditions = [
+        (column, condition) for column, conditions in (_filter.filters.items() if _filter else ())
+            for condition in conditions
+    ]
+    reorder = len(conditions) > 1 and len(rows) >= MIN_ROWS_TO_REORDER
+    sample = sample_rows(list(rows.values())) if estimate or reorder else []
+    stages = []
+    for column, condition in conditions:
+        function = filterFunctionFactory(column, condition)
+        selectivity = sum(1 for entry in sample if function(entry)) / len(sample) if sample else 1.0
+        stages.append((FilterStage(column, condition.operator, condition.operand, condition.negate, selectivity), function))
+    # Stable, so equally selective conditions keep the order they were given in
+    return sorted(stages, key=lambda stage: stage[0].selectivity)
+
+"""
+Runs the stages in order, each on the rows kept by the previous one
+Returns (the rows satisfying every stage, the stages with actual rows and timings)
+"""
+def run_filter_stages(rows: Dict[str, Dict[str, Any]], stages: List[Tuple[FilterStage, Callable]]):
+    candidates = list(rows.items())
+    executedStages = []
+    for stage, function in stages:
+        start = time.perf_counter()
+        kept = [(_id, entry) for _id, entry in candidates if function(entry)]
+        executedStages.append(stage._replace(
+            rowsIn=len(candidates), rowsOut=len(kept), seconds=time.perf_counter() - start
+        ))
+        candidates = kept
+    return dict(candidates), executedStages
+
+"""
+Plans, and with analyze runs, a filtered read of rows
+readRows: returns the rows of the table, or None if it doesn't exist
+Raises ValueError if the table doesn't exist
+"""
+def explain_filter(tableName: str, databaseName: str, readRows: Callable, _filter: VisualizeFilters,
+                   filterFunctionFactory: Callable, analyze: bool=False) -> QueryPlan:
+    start = time.perf_counter()
+    rows = readRows()
+    readSeconds = time.perf_counter() - start
+    if rows is None:
+        raise ValueError(f'table {tableName} does not exist')
+
+    stages = plan_filter_stages(rows, _filter, filterFunctionFactory, estimate=True)
+    estimatedRows = len(rows)
+    for stage, _ in stages:
+        estimatedRows *= stage.selectivity
+    plan = QueryPlan(tableName, databaseName, FULL_SCAN, len(rows), [stage for stage, _ in stages], round(estimatedRows))
+    if not analyze:
+        return plan
+
+    filteredRows, executedStages = run_filter_stages(rows, stages)
+    return plan._replace(stages=executedStages, analyzed=True, readSeconds=readSeconds, rowsReturned=len(filteredRows))
@@ -0,0 +1,148 @@
+from typing import Any, Dict, List
+
+from definitions import DatabaseKeys, FieldDefinition, FieldType
+
+
+"""
+Tables are altered without rewriting their rows
+
+A table records its migrations under SCHEMA_MIGRATIONS_KEY, migration i upgrades a row of schema version i to i + 1
+{
+    MIGRATION_ADD_KEY: {
+        columnName: { SCHEMA_TYPE_KEY: ..., SCHEMA_REQUIRED_KEY: ..., SCHEMA_DEFAULT_KEY: ... }, ...
+    },
+    MIGRATION_DROP_KEY: [columnName, ...],
+    MIGRATION_RETYPE_KEY: { columnName: fieldType, ... },
+}
+The schema version of a table is its number of migrations
+
+ROW_SCHEMA_VERSIONS_KEY maps the rows written since the first migration to the version they were written at,
+    every other row is at version 0
+Rows are upgraded when they are read, and stored at the current version once they are written again
+"""
+
+
+def get_schema_version(table: Dict[str, Any]) -> int:
+    return len(table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY) or ())
+
+"""
+Converts a stored value to fieldType
+Lists become comma-separated TEXT, the way LIST fields are parsed from text
+Returns None for a value which can't be converted
+"""
+def convert_value(value: Any, fieldType: str) -> Any:
+    if value is None:
+        return None
+    if fieldType == FieldType.TEXT:
+        if isinstance(value, list):
+            return ','.join(str(item) for item in value)
+        return value if isinstance(value, str) else str(value)
+    try:
+        return FieldDefinition('', fieldType).parse_entry(value)
+    except TypeError:
+        return None
+
+def apply_migration(row: Dict[str, Any], migration: Dict[str, Any]) -> None:
+    for columnName in migration.get(DatabaseKeys.MIGRATION_DROP_KEY, ()):
+        row.pop(columnName, None)
+    for columnName, fieldType in migration.get(DatabaseKeys.MIGRATION_RETYPE_KEY, {}).items():
+        if columnName in row:
+            row[columnName] = convert_value(row[columnName], fieldType)
+    for columnName, properties in migration.get(DatabaseKeys.MIGRATION_ADD_KEY, {}).items():
+        default = properties.get(DatabaseKeys.SCHEMA_DEFAULT_KEY)
+        if columnName not in row and default is not None:
+            row[columnName] = default
+
+"""
+Returns the rows of a table at its current schema version
+Rows already at the current version are returned as stored, older ones are upgraded copies
+Without migrations, rows itself is returned
+"""
+def upgrade_rows(rows: Dict[str, Dict[str, Any]], migrations: List[Dict[str, Any]],
+                 rowVersions: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    if not migrations:
+        return rows
+    currentVersion = len(migrations)
+    rowVersions = rowVersions or {}
+    upgradedRows = {}
+    for _id, row in rows.items():
+        version = rowVersions.get(_id, 0)
+        if version != currentVersion:
+            row = dict(row)
+            for migration in migrations[version:]:
+                apply_migration(row, migration)
+        upgradedRows[_id] = row
+    return upgradedRows
+
+def upgrade_table_rows(table: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    return upgrade_rows(table[DatabaseKeys.ROWS_KEY], table.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY),
+                        table.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY))
+
+# Records that rows were just written at the table's current schema version
+def record_row_versions(table: Dict[str, Any], ids: List[str]) -> None:
+    version = get_schema_version(table)
+    if version:
+        rowVersions = table.setdefault(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {})
+        for _id in ids:
+            rowVersions[_id] = version
+
+def forget_row_version(table: Dict[str, Any], _id: str) -> None:
+    table.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY, {}).pop(_id, None)
+
+"""
+Builds a migration and checks it against schema
+add: fields to add, defaults: { columnName: value } given to the rows stored before the migration
+A required field must be given a default
+Raises ValueError if the migration is empty or doesn't fit schema, TypeError if a default doesn't fit its field
+"""
+def build_migration(schema: Dict[str, Dict[str, Any]], add: List[FieldDefinition]=None, drop: List[str]=None,
+                    retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> Dict[str, Any]:
+    add, drop, retype, defaults = add or [], drop or [], retype or {}, defaults or {}
+    if not (add or drop or retype):
+        raise ValueError('nothing to alter')
+    for columnName in list(drop) + list(retype):
+        if columnName not in schema:
+            raise ValueError(f'field {columnName} does not exist')
+    if set(drop) & set(retype):
+        raise ValueError('a field cannot be both dropped and retyped')
+    for columnName, fieldType in retype.items():
+        if fieldType not in FieldDefinition.CommonNameToAcceptedTypes:
+            raise ValueError(f'{fieldType} is not an accepted type')
+
+    addedColumns = {}
+    for field in add:
+        columnName = field.get_field_name()
+        if columnName in addedColumns or columnName in schema and columnName not in drop:
+            raise ValueError(f'field {columnName} already exists')
+        if field.is_required() and defaults.get(columnName) is None:
+            raise ValueError(f'required field {columnName} needs a default for the rows already stored')
+        properties = dict(field.as_dict()[columnName])
+        properties[DatabaseKeys.SCHEMA_DEFAULT_KEY] = field.parse_entry(defaults.get(columnName))
+        addedColumns[columnName] = properties
+    unknownDefaults = set(defaults) - set(addedColumns)
+    if unknownDefaults:
+        raise ValueError(f'defaults given for fields not added: {sorted(unknownDefaults)}')
+
+    return {
+        DatabaseKeys.MIGRATION_ADD_KEY: addedColumns,
+        DatabaseKeys.MIGRATION_DROP_KEY: list(drop),
+        DatabaseKeys.MIGRATION_RETYPE_KEY: dict(retype),
+    }
+
+"""
+Appends migration to the table and moves its schema to the new version
+No row is touched
+Returns the new schema version
+"""
+def apply_migration_to_table(table: Dict[str, Any], migration: Dict[str, Any]) -> int:
+    schema = table[DatabaseKeys.SCHEMA_KEY]
+    for columnName in migration[DatabaseKeys.MIGRATION_DROP_KEY]:
+        del schema[columnName]
+    for columnName, fieldType in migration[DatabaseKeys.MIGRATION_RETYPE_KEY].items():
+        schema[columnName] = dict(schema[columnName], **{ DatabaseKeys.SCHEMA_TYPE_KEY: fieldType })
+    for columnName, properties in migration[DatabaseKeys.MIGRATION_ADD_KEY].items():
+        schema[columnName] = {
+            key: value for key, value in properties.items() if key != DatabaseKeys.SCHEMA_DEFAULT_KEY
+        }
+    table.setdefault(DatabaseKeys.SCHEMA_MIGRATIONS_KEY, []).append(migration)
+    return get_schema_version(table)
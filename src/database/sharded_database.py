@@ -0,0 +1,188 @@
+import hashlib
+import os
+import re
+import threading
+from typing import List, Dict, Any
+
+from .abstract_database import Database
+from .json_database import JSONDatabase, get_file_version
+from .query_plan import QueryPlan
+from definitions import FieldDefinition, VisualizeFilters
+
+
+DEFAULT_SHARDED_DIRECTORY = 'json_database'
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_TABLES_KEY = 'TABLES'
+
+
+# File name stem of a table, readable and unique even when table names only differ in punctuation
+def get_table_file_stem(tableName: str) -> str:
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', tableName).strip('_')[:40] or 'table'
+    return f'{slug}-{hashlib.sha1(tableName.encode()).hexdigest()[:8]}'
+
+def get_shard_filename(tableName: str) -> str:
+    return get_table_file_stem(tableName) + '.json'
+
+
+"""
+A Database storing each table in its own JSONDatabase file, its shard, under one directory
+Representation:
+directory/
+    MANIFEST_FILENAME: { MANIFEST_TABLES_KEY: { tableName: shard filename, ... } }
+    shard filename: { tableName: table }, the table as JSONDatabase stores it
+    ...
+
+A write reads and replaces only the shard of its table, under that shard's lock,
+    so writes to different tables don't wait for each other and a damaged shard only loses its own table
+The manifest only changes when tables are created or the database is reset
+
+Attributes:
+- filename: str : The directory, named like the file of the other Databases
+- manifest: JSONDatabase : The manifest file
+- shards: Dict[str, JSONDatabase] : Opened shards, by shard filename
+"""
+class ShardedJSONDatabase(Database):
+
+    def __init__(self, filename=None):
+        self.filename = filename or DEFAULT_SHARDED_DIRECTORY
+        os.makedirs(self.filename, exist_ok=True)
+        self.manifest = JSONDatabase(os.path.join(self.filename, MANIFEST_FILENAME))
+        # (manifest file version, tables), the manifest is parsed again only when it was replaced
+        self.manifestCache = (None, {})
+        self.shards = {}
+        self.shardsLock = threading.Lock()
+
+    # { tableName: shard filename }
+    def get_manifest_tables(self) -> Dict[str, str]:
+        version = get_file_version(self.manifest.filename)
+        if version is None:
+            return {}
+        cachedVersion, tables = self.manifestCache
+        if version != cachedVersion:
+            # Taken before the read, a manifest replaced meanwhile is parsed again on the next call
+            tables = self.manifest.read_data_to_memory().get(MANIFEST_TABLES_KEY, {})
+            self.manifestCache = (version, tables)
+        return tables
+
+    def open_shard(self, shardFilename: str) -> JSONDatabase:
+        with self.shardsLock:
+            if shardFilename not in self.shards:
+                self.shards[shardFilename] = JSONDatabase(os.path.join(self.filename, shardFilename))
+            return self.shards[shardFilename]
+
+    # Returns the shard of tableName, or None if tableName doesn't exist
+    def get_shard(self, tableName: str) -> JSONDatabase:
+        shardFilename = self.get_manifest_tables().get(tableName)
+        return shardFilename and self.open_shard(shardFilename)
+
+    def get_existing_shard(self, tableName: str) -> JSONDatabase:
+        shard = self.get_shard(tableName)
+        if not shard:
+            raise ValueError(f'table {tableName} does not exist')
+        return shard
+
+    def reset_database(self):
+        self.write_data_to_disk({})
+
+    # Returns every table, as JSONDatabase.read_data_to_memory would
+    def read_data_to_memory(self) -> Dict[str, Dict]:
+        data = {}
+        for tableName in self.get_manifest_tables():
+            table = self.get_shard(tableName).read_data_to_memory().get(tableName)
+            if table is not None:
+                data[tableName] = table
+        return data
+
+    # Replaces every table with those of data, one shard each
+    def write_data_to_disk(self, data: Dict[str, Dict]):
+        def replace(manifest):
+            for shardFilename in manifest.get(MANIFEST_TABLES_KEY, {}).values():
+                try:
+                    os.remove(os.path.join(self.filename, shardFilename))
+                except FileNotFoundError:
+                    pass
+            tables = {}
+            for tableName, table in data.items():
+                tables[tableName] = get_shard_filename(tableName)
+                shard = self.open_shard(tables[tableName])
+                with shard.write_lock():
+                    shard.write_data_to_disk({ tableName: table })
+            manifest[MANIFEST_TABLES_KEY] = tables
+            return True
+        self.manifest.modify_data(replace)
+
+    # Any write to a table replaces its shard, and only its shard
+    def get_table_version(self, tableName: str):
+        shard = self.get_shard(tableName)
+        return shard and get_file_version(shard.filename)
+
+    def get_all_table_names(self):
+        return list(self.get_manifest_tables())
+
+    """
+    Creates a new table in its own shard
+    Returns True if successful
+    """
+    def create_table(self, tableName: str, columns: Dict[str, Dict[str, str]]) -> bool:
+        def create(manifest):
+            tables = manifest.setdefault(MANIFEST_TABLES_KEY, {})
+            if tableName in tables:
+                return False
+            shardFilename = get_shard_filename(tableName)
+            shard = self.open_shard(shardFilename)
+            # The shard is written before the manifest lists it, a failed create leaves no table behind
+            data = {}
+            shard.apply_create_table(data, tableName, columns)
+            with shard.write_lock():
+                shard.write_data_to_disk(data)
+            tables[tableName] = shardFilename
+            return True
+        return bool(self.manifest.modify_data(create))
+
+    def get_table_schema(self, tableName: str) -> List[FieldDefinition]:
+        return self.get_existing_shard(tableName).get_table_schema(tableName)
+
+    def alter_table(self, tableName: str, add: List[FieldDefinition]=None, drop: List[str]=None,
+                    retype: Dict[str, str]=None, defaults: Dict[str, Any]=None) -> int:
+        return self.get_existing_shard(tableName).alter_table(tableName, add, drop, retype, defaults)
+
+    def insert_row(self, tableName: str, values: Dict[str, Any], _id=None) -> str:
+        ids = self.insert_rows(tableName, [values], ids=[_id])
+        return ids and ids[0]
+
+    def insert_rows(self, tableName: str, rows: List[Dict[str, Any]], ids: List[str]=None) -> List[str]:
+        shard = self.get_shard(tableName)
+        return shard and shard.insert_rows(tableName, rows, ids)
+
+    def delete_row(self, tableName: str, _id: str) -> bool:
+        shard = self.get_shard(tableName)
+        return shard and shard.delete_row(tableName, _id)
+
+    """
+    Returns all entries under tableName, reading only its shard
+    Returns None if tableName doesn't exist
+    """
+    def get_all_rows(self, tableName: str) -> Dict[str, Dict[str, Any]]:
+        shard = self.get_shard(tableName)
+        return shard and shard.get_all_rows(tableName)
+
+    def get_rows_with_filter(self, tableName: str, _filter: VisualizeFilters):
+        shard = self.get_shard(tableName)
+        return shard and shard.get_rows_with_filter(tableName, _filter)
+
+    def filter_rows(self, rows: Dict[str, Dict[str, Any]], _filter: VisualizeFilters):
+        # Filtering reads no file, any JSONDatabase runs it
+        return self.manifest.filter_rows(rows, _filter)
+
+    def explain(self, tableName: str, _filter: VisualizeFilters, analyze: bool=False) -> QueryPlan:
+        plan = self.get_existing_shard(tableName).explain(tableName, _filter, analyze=analyze)
+        return plan._replace(database=type(self).__name__)
+
+
+def json_to_sharded(jsonFilename: str, directory: str) -> None:
+    data = JSONDatabase(jsonFilename).load_data()
+    ShardedJSONDatabase(directory).write_data_to_disk(data)
+
+def sharded_to_json(directory: str, jsonFilename: str) -> None:
+    data = ShardedJSONDatabase(directory).read_data_to_memory()
+    JSONDatabase(jsonFilename).write_data_to_disk(data)
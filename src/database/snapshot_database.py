@@ -0,0 +1,148 @@
+import mmap
+import os
+from typing import List, Dict, Any
+
+from .json_database import JSONDatabase, write_file_atomically, schema_to_field_definitions
+from .snapshot_format import SnapshotTable, encode_snapshot, decode_directory
+from .schema_evolution import upgrade_rows
+from definitions import FieldDefinition, DatabaseKeys
+from instrumentation import stats, timed
+
+
+DEFAULT_SNAPSHOT_FILENAME = 'database.snapshot'
+
+"""
+A Database stored as a binary snapshot, see snapshot_format for the layout
+Holds the same tables and rows as JSONDatabase and shares its write path,
+    but the file is opened with mmap: only the directory is parsed up front,
+    and a table's columns are read from the mapping when that table is asked for
+"""
+class SnapshotDatabase(JSONDatabase):
+
+    def __init__(self, filename=None):
+        super().__init__(filename or DEFAULT_SNAPSHOT_FILENAME)
+        self.mapping = None
+        self.buffer = None
+        self.directory = {}
+        self.bodyOffset = 0
+        self.fileVersion = None
+
+    """
+    Maps the snapshot file, again only if it was replaced since the last call
+    Returns False if there is no snapshot to read
+    Raises ValueError if the file is not a snapshot
+    """
+    def map_snapshot(self) -> bool:
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            self.buffer, self.directory, self.fileVersion = None, {}, None
+            return False
+        fileVersion = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if fileVersion == self.fileVersion:
+            stats.count('database.snapshot_hits')
+        else:
+            stats.count('database.snapshot_misses')
+            if not stat.st_size:
+                self.buffer, self.directory = None, {}
+            else:
+                with open(self.filename, 'rb') as f:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                # The previous mapping is released once no SnapshotTable refers to it
+                self.mapping = mapping
+                self.buffer = memoryview(mapping)
+                self.directory, self.bodyOffset = decode_directory(self.buffer)
+                stats.count('database.file_reads')
+                stats.count('database.bytes_mapped', stat.st_size)
+            self.fileVersion = fileVersion
+        return self.buffer is not None
+
+    """
+    Unmaps the snapshot, Windows can't replace a file which is still mapped
+    A mapping still viewed through a SnapshotTable a caller holds is released with it instead
+    """
+    def close_mapping(self):
+        mapping, buffer = self.mapping, self.buffer
+        self.mapping, self.buffer, self.directory, self.fileVersion = None, None, {}, None
+        try:
+            if buffer is not None:
+                buffer.release()
+            if mapping is not None:
+                mapping.close()
+        except BufferError:
+            pass
+
+    # Returns the SnapshotTable for tableName, or None if tableName doesn't exist
+    def get_snapshot_table(self, tableName: str) -> SnapshotTable:
+        if not self.map_snapshot() or tableName not in self.directory:
+            return
+        return SnapshotTable(self.buffer, self.bodyOffset, self.directory[tableName])
+
+    @timed('database.read')
+    def read_data_to_memory(self) -> Dict[str, Dict]:
+        try:
+            return self.load_data()
+        except:
+            return {}
+
+    """
+    Returns the data of the snapshot as read_data_to_memory does, but raises where it would return {}
+    Raises FileNotFoundError if there is no file, ValueError if the file is not a snapshot
+    """
+    def load_data(self) -> Dict[str, Dict]:
+        if not self.map_snapshot():
+            if not os.path.exists(self.filename):
+                raise FileNotFoundError(f'{self.filename} does not exist')
+            raise ValueError(f'{self.filename} is empty, not a snapshot')
+        return { tableName: self.get_snapshot_table(tableName).get_table() for tableName in self.directory }
+
+    @timed('database.write')
+    def write_data_to_disk(self, data: Dict[str, Dict]):
+        content = encode_snapshot(data)
+        self.close_mapping()
+        write_file_atomically(self.filename, content)
+        stats.count('database.file_writes')
+        stats.count('database.bytes_written', len(content))
+
+    # Reads only the directory, the file version stands in for tables written before TABLE_VERSION_KEY existed
+    def get_table_version(self, tableName: str):
+        table = self.get_snapshot_table(tableName)
+        if not table:
+            return
+        return table.get_meta().get(DatabaseKeys.TABLE_VERSION_KEY) or self.fileVersion
+
+    def get_all_table_names(self):
+        self.map_snapshot()
+        return list(self.directory.keys())
+
+    def get_table_schema(self, tableName: str) -> List[FieldDefinition]:
+        table = self.get_snapshot_table(tableName)
+        if not table:
+            raise ValueError(f'table {tableName} does not exist')
+        return schema_to_field_definitions(table.get_schema())
+
+    """
+    Returns all entries under tableName, at its current schema version
+    Returns None if tableName doesn't exist
+    """
+    def get_all_rows(self, tableName: str) -> Dict[str, Dict[str, Any]]:
+        table = self.get_snapshot_table(tableName)
+        if not table:
+            return
+        meta = table.get_meta()
+        return upgrade_rows(table.get_rows(), meta.get(DatabaseKeys.SCHEMA_MIGRATIONS_KEY),
+                            meta.get(DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY))
+
+
+"""
+Converts between the JSON and the snapshot format
+The source is read in full before the target is written, so a missing or foreign source leaves the target as it was
+Raises FileNotFoundError if there is no source, ValueError if it is not in the source format
+"""
+def json_to_snapshot(jsonFilename: str, snapshotFilename: str) -> None:
+    data = JSONDatabase(jsonFilename).load_data()
+    SnapshotDatabase(snapshotFilename).write_data_to_disk(data)
+
+def snapshot_to_json(snapshotFilename: str, jsonFilename: str) -> None:
+    data = SnapshotDatabase(snapshotFilename).load_data()
+    JSONDatabase(jsonFilename).write_data_to_disk(data)
@@ -0,0 +1,290 @@
+import json
+import struct
+from array import array
+from typing import Any, Dict, List
+
+from definitions import FieldType, DatabaseKeys
+
+
+"""
+Binary snapshot of a JSON Database, designed to be opened with mmap
+Layout:
+    Header: MAGIC, format version, length of the directory
+    Directory: JSON, per table its schema, remaining table keys, row count and column locations
+    Body, starting at the next 8-byte boundary, every column 8-byte aligned:
+        ids: string table column
+        NUMBER columns: uint8 state per row, then float64 value per row
+        TEXT/DATE columns: int32 code per row into a string table of distinct values
+        LIST columns: int32 code per row into a string table of JSON-encoded lists
+        extras: int32 code per row into a string table of JSON-encoded values
+            that do not fit a column, such as fields missing from the schema
+    String table: uint32 offsets of count + 1 boundaries, then the UTF-8 blob
+"""
+
+MAGIC = b'WTSNAP\x00\x01'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+# NUMBER column states
+STATE_MISSING = 0
+STATE_NULL = 1
+STATE_FLOAT = 2
+STATE_INT = 3
+
+# String column codes below 0
+CODE_MISSING = -1
+CODE_NULL = -2
+
+DIRECTORY_SCHEMA_KEY = 'schema'
+DIRECTORY_META_KEY = 'meta'
+DIRECTORY_TABLE_KEYS_KEY = 'tableKeys'
+DIRECTORY_ROW_COUNT_KEY = 'rowCount'
+DIRECTORY_IDS_KEY = 'ids'
+DIRECTORY_COLUMNS_KEY = 'columns'
+DIRECTORY_EXTRAS_KEY = 'extras'
+
+MISSING = object()
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+# Whether value can be stored in a column of fieldType
+def fits_column(fieldType: str, value: Any) -> bool:
+    if value is None:
+        return True
+    if fieldType == FieldType.NUMBER:
+        return is_number(value)
+    if fieldType in (FieldType.TEXT, FieldType.DATE):
+        return isinstance(value, str)
+    if fieldType == FieldType.LIST:
+        return isinstance(value, list)
+    return False
+
+
+"""
+    SnapshotWriter appends 8-byte aligned sections to the snapshot body
+    and records where each section starts
+"""
+class SnapshotWriter:
+
+    def __init__(self):
+        self.body = bytearray()
+
+    def append(self, data: bytes) -> int:
+        offset = len(self.body)
+        self.body += data
+        self.body += bytes(-len(self.body) % ALIGNMENT)
+        return offset
+
+    def write_number_column(self, values: List[Any]) -> Dict[str, int]:
+        states = bytearray(len(values))
+        numbers = array('d', bytes(8 * len(values)))
+        for i, value in enumerate(values):
+            if value is MISSING:
+                states[i] = STATE_MISSING
+            elif value is None:
+                states[i] = STATE_NULL
+            else:
+                states[i] = STATE_INT if isinstance(value, int) else STATE_FLOAT
+                numbers[i] = value
+        return {
+            'states': self.append(bytes(states)),
+            'values': self.append(numbers.tobytes()),
+        }
+
+    # deduplicate: encode equal values once, pointless for unique values such as ids
+    def write_string_column(self, values: List[Any], encode=None, deduplicate=True) -> Dict[str, int]:
+        strings = []
+        stringCodes = {}
+        codes = array('i', bytes(4 * len(values)))
+        for i, value in enumerate(values):
+            if value is MISSING:
+                codes[i] = CODE_MISSING
+            elif value is None:
+                codes[i] = CODE_NULL
+            else:
+                string = encode(value) if encode else value
+                code = stringCodes.get(string) if deduplicate else None
+                if code is None:
+                    code = len(strings)
+                    strings.append(string)
+                    if deduplicate:
+                        stringCodes[string] = code
+                codes[i] = code
+
+        encodedStrings = [s.encode() for s in strings]
+        offsets = array('I', [0])
+        for encodedString in encodedStrings:
+            offsets.append(offsets[-1] + len(encodedString))
+        return {
+            'codes': self.append(codes.tobytes()),
+            'count': len(strings),
+            'offsets': self.append(offsets.tobytes()),
+            'blob': self.append(b''.join(encodedStrings)),
+        }
+
+    def write_table(self, table: Dict[str, Any]) -> Dict[str, Any]:
+        rows = table.get(DatabaseKeys.ROWS_KEY) or {}
+        schema = table.get(DatabaseKeys.SCHEMA_KEY) or {}
+        columnTypes = {
+            name: properties.get(DatabaseKeys.SCHEMA_TYPE_KEY) for name, properties in schema.items()
+        }
+
+        columnValues = { name: [] for name in columnTypes }
+        extras = []
+        for entry in rows.values():
+            rowExtras = {}
+            for name, fieldType in columnTypes.items():
+                value = entry.get(name, MISSING)
+                if value is not MISSING and not fits_column(fieldType, value):
+                    rowExtras[name] = value
+                    value = MISSING
+                columnValues[name].append(value)
+            for name, value in entry.items():
+                if name not in columnTypes:
+                    rowExtras[name] = value
+            extras.append(rowExtras or MISSING)
+
+        columns = {}
+        for name, fieldType in columnTypes.items():
+            if fieldType == FieldType.NUMBER:
+                columns[name] = self.write_number_column(columnValues[name])
+            elif fieldType == FieldType.LIST:
+                columns[name] = self.write_string_column(columnValues[name], encode=json.dumps)
+            else:
+                columns[name] = self.write_string_column(columnValues[name])
+
+        return {
+            DIRECTORY_SCHEMA_KEY: schema,
+            DIRECTORY_META_KEY: { k: v for k, v in table.items() if k not in (DatabaseKeys.ROWS_KEY, DatabaseKeys.SCHEMA_KEY) },
+            DIRECTORY_TABLE_KEYS_KEY: list(table),
+            DIRECTORY_ROW_COUNT_KEY: len(rows),
+            DIRECTORY_IDS_KEY: self.write_string_column(list(rows), deduplicate=False),
+            DIRECTORY_COLUMNS_KEY: columns,
+            DIRECTORY_EXTRAS_KEY: self.write_string_column(extras, encode=json.dumps),
+        }
+
+
+# Encodes JSON Database data into snapshot bytes
+def encode_snapshot(data: Dict[str, Dict]) -> bytes:
+    writer = SnapshotWriter()
+    directory = { tableName: writer.write_table(table) for tableName, table in data.items() }
+    encodedDirectory = json.dumps(directory).encode()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(encodedDirectory)) + encodedDirectory
+    header += bytes(-len(header) % ALIGNMENT)
+    return header + writer.body
+
+
+"""
+Parses the header and directory of a snapshot
+Returns (directory, offset of the body)
+Raises ValueError if buffer is not a snapshot
+"""
+def decode_directory(buffer) -> tuple:
+    if len(buffer) < HEADER.size:
+        raise ValueError('snapshot is truncated')
+    magic, formatVersion, directoryLength = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or formatVersion != FORMAT_VERSION:
+        raise ValueError('not a winning-tracker snapshot')
+    directoryEnd = HEADER.size + directoryLength
+    directory = json.loads(bytes(buffer[HEADER.size:directoryEnd]))
+    return directory, directoryEnd + (-directoryEnd % ALIGNMENT)
+
+
+"""
+    SnapshotTable reads one table of a snapshot directly from its buffer
+    NUMBER columns are exposed as zero-copy memoryviews
+    Nothing is decoded until a column is asked for
+
+    Attributes:
+    - buffer: memoryview : The whole snapshot, usually backed by mmap
+    - bodyOffset: int : Where the body starts in buffer
+    - entry: Dict : The table's directory entry
+"""
+class SnapshotTable:
+
+    def __init__(self, buffer: memoryview, bodyOffset: int, entry: Dict[str, Any]):
+        self.buffer = buffer
+        self.bodyOffset = bodyOffset
+        self.entry = entry
+        self.rowCount = entry[DIRECTORY_ROW_COUNT_KEY]
+
+    def get_schema(self) -> Dict[str, Dict]:
+        return self.entry[DIRECTORY_SCHEMA_KEY]
+
+    # Keys of the table other than its schema and rows, such as its schema migrations
+    def get_meta(self) -> Dict[str, Any]:
+        return self.entry[DIRECTORY_META_KEY]
+
+    # Reassembles the JSON representation of the table, in its original key order
+    def get_table(self) -> Dict[str, Any]:
+        table = {}
+        for key in self.entry[DIRECTORY_TABLE_KEYS_KEY]:
+            if key == DatabaseKeys.SCHEMA_KEY:
+                table[key] = self.get_schema()
+            elif key == DatabaseKeys.ROWS_KEY:
+                table[key] = self.get_rows()
+            else:
+                table[key] = self.entry[DIRECTORY_META_KEY][key]
+        return table
+
+    def view(self, offset: int, length: int, format: str) -> memoryview:
+        start = self.bodyOffset + offset
+        return self.buffer[start:start + length].cast(format)
+
+    # Zero-copy (states, values) views of a NUMBER column
+    def get_number_views(self, columnName: str):
+        location = self.entry[DIRECTORY_COLUMNS_KEY][columnName]
+        return (
+            self.view(location['states'], self.rowCount, 'B'),
+            self.view(location['values'], 8 * self.rowCount, 'd'),
+        )
+
+    def decode_strings(self, location: Dict[str, int], decode=None) -> List[Any]:
+        offsets = self.view(location['offsets'], 4 * (location['count'] + 1), 'I')
+        blobStart = self.bodyOffset + location['blob']
+        strings = []
+        for i in range(location['count']):
+            string = str(self.buffer[blobStart + offsets[i]:blobStart + offsets[i + 1]], 'utf-8')
+            strings.append(decode(string) if decode else string)
+        return strings
+
+    def decode_string_column(self, location: Dict[str, int], decode=None) -> List[Any]:
+        strings = self.decode_strings(location, decode)
+        codes = self.view(location['codes'], 4 * self.rowCount, 'i')
+        return [
+            strings[code] if code >= 0 else (None if code == CODE_NULL else MISSING) for code in codes
+        ]
+
+    # Decodes a column into one value per row, MISSING where the row lacks the field
+    def get_column_values(self, columnName: str) -> List[Any]:
+        fieldType = self.get_schema()[columnName][DatabaseKeys.SCHEMA_TYPE_KEY]
+        location = self.entry[DIRECTORY_COLUMNS_KEY][columnName]
+        if fieldType == FieldType.NUMBER:
+            states, numbers = self.get_number_views(columnName)
+            return [
+                MISSING if state == STATE_MISSING else None if state == STATE_NULL else \
+                    int(number) if state == STATE_INT else number
+                for state, number in zip(states, numbers)
+            ]
+        if fieldType == FieldType.LIST:
+            return self.decode_string_column(location, decode=json.loads)
+        return self.decode_string_column(location)
+
+    def get_ids(self) -> List[str]:
+        return self.decode_string_column(self.entry[DIRECTORY_IDS_KEY])
+
+    # Decodes every row back into { uuid: { columnName: value } }
+    def get_rows(self) -> Dict[str, Dict[str, Any]]:
+        rows = [{} for _ in range(self.rowCount)]
+        for columnName in self.entry[DIRECTORY_COLUMNS_KEY]:
+            for row, value in zip(rows, self.get_column_values(columnName)):
+                if value is not MISSING:
+                    row[columnName] = value
+        extras = self.decode_string_column(self.entry[DIRECTORY_EXTRAS_KEY], decode=json.loads)
+        for row, rowExtras in zip(rows, extras):
+            if rowExtras is not MISSING:
+                row.update(rowExtras)
+        return dict(zip(self.get_ids(), rows))
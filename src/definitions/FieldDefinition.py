@@ -3,7 +3,7 @@
 
 import datetime
 from typing import Any
-from .constants import FieldType, DatabaseKeys, DISALLOWED_NUMBER_INPUTS
+from .constants import FieldType, DatabaseKeys, DISALLOWED_NUMBER_INPUTS, DATE_FORMATS
 
 
 """
@@ -36,6 +36,9 @@ class FieldDefinition:
     def get_field_name(self):
         return self.fieldName
 
+    def get_field_type(self):
+        return self.fieldType
+
     def is_required(self):
         return self.required
 
@@ -81,12 +84,9 @@ class FieldDefinition:
             else:
                 str_value = value
                 try:
-                    datetime.datetime.strptime(value, '%Y/%m/%d')
+                    parse_date(value)
                 except:
-                    try:
-                        datetime.datetime.strptime(value, '%Y-%m-%d')
-                    except:
-                        self.raise_incompatible_type_error(value)
+                    self.raise_incompatible_type_error(value)
             return str_value.split(' ')[0]
 
         # handle LIST type
@@ -100,5 +100,17 @@ class FieldDefinition:
         raise TypeError('unknown FieldDefinition type, please do not modify objects directly')
 
 
+"""
+Parses a DATE value in any of DATE_FORMATS
+Raises ValueError if it matches none of them
+"""
+def parse_date(value: str) -> datetime.date:
+    for dateFormat in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, dateFormat).date()
+        except ValueError:
+            pass
+    raise ValueError(f'{value} is not a date in any of {DATE_FORMATS}')
+
 def is_disallowed_number_str(value):
     return isinstance(value, str) and value.lower() in DISALLOWED_NUMBER_INPUTS
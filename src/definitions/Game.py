@@ -26,6 +26,7 @@ class Game:
     def __init__(self, name: str, fields: List[FieldDefinition]=None):
         self.name = name
         self.fields = list(Game.DefaultFields)
+        self.index_fields()
         for field in fields or []:
             if not isinstance(field, FieldDefinition):
                 raise TypeError("parameter was not wrapped in FieldDefinition type")
@@ -36,6 +37,17 @@ class Game:
                 self.fields.pop(index)
             
             self.fields.append(field)
+            self.index_fields()
+
+    # Rebuilds the lookups derived from self.fields
+    # parse_field_values runs once per Session, so lookups must not scan the field list
+    def index_fields(self):
+        self.fieldIndexByName = {
+            field.get_field_name(): index for index, field in enumerate(self.fields)
+        }
+        self.requiredFieldNames = frozenset(
+            field.get_field_name() for field in self.fields if field.is_required()
+        )
 
     def get_name(self):
         return self.name
@@ -49,33 +61,28 @@ class Game:
     # Finds FieldDefinition by fieldName
     # Input: fieldName: str, name of field to lookup
     # Output: (index, FieldDefinition object), or (None, None) if not found
-    # TODO: Optimize performance by rewriting self.fields as Dict
     def find_field_definition_by_name(self, fieldName: FieldDefinition):
-        for index, existingField in enumerate(self.fields):
-            if existingField.get_field_name() == fieldName:
-                return index, existingField
-        return (None, None)
+        index = self.fieldIndexByName.get(fieldName)
+        if index is None:
+            return (None, None)
+        return index, self.fields[index]
 
     # Gets name of all required fields
     # Output: name of all required fields in a Python set
     def get_required_fieldNames(self):
-        fieldNames = set()
-        for index, existingField in enumerate(self.fields):
-            if existingField.is_required():
-                fieldNames.add(existingField.get_field_name())
-        return fieldNames
+        return set(self.requiredFieldNames)
 
     # Validates whether values passed are legal values for the FieldDefinitions
     # Parses str format entries into expected format
+    # Returns the parsed values as a new dict, fieldValues may be rows shared with other readers
     # Throws TypeError if validation fails
     def parse_field_values(self, fieldValues: Dict[str, Any]):
-        fieldNamesPassed = set(fieldValues.keys())
-        requiredFieldsNotPassed = self.get_required_fieldNames() - fieldNamesPassed
+        requiredFieldsNotPassed = self.requiredFieldNames.difference(fieldValues.keys())
         if requiredFieldsNotPassed:
             raise TypeError(f'required fields not provided: {list(requiredFieldsNotPassed)}')
 
+        parsedValues = {}
         for fieldName, fieldValue in fieldValues.items():
-            _, existingField = self.find_field_definition_by_name(fieldName)
-            if existingField:
-                fieldValues[fieldName] = existingField.parse_entry(fieldValue)
-        return fieldValues
+            index = self.fieldIndexByName.get(fieldName)
+            parsedValues[fieldName] = self.fields[index].parse_entry(fieldValue) if index is not None else fieldValue
+        return parsedValues
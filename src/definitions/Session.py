@@ -3,6 +3,7 @@
 
 from typing import Dict, Any
 from .Game import Game
+from instrumentation import stats
 
 
 """
@@ -19,6 +20,7 @@ class Session:
     def __init__(self, game: Game, values: Dict[str, Any]):
         self.game = game
         self.fieldValues = game.parse_field_values(values)
+        stats.count('session.validations')
 
     def get_game(self):
         return self.game
@@ -1,7 +1,7 @@
 # Class definitions
 # Define objects used by both Backend and Client
 
-from .FieldDefinition import FieldDefinition
+from .FieldDefinition import FieldDefinition, parse_date
 from .Game import Game
 from .Session import Session
 from .VisualizeFilters import FilterOperator, FilterCondition, VisualizeFilters
@@ -10,6 +10,6 @@ from .VisualizeFilters import FilterOperator, FilterCondition, VisualizeFilters
 
 from .constants import GameName, FieldType, DefaultFieldNames, \
     CustomFieldNames, DatabaseKeys, ConversionRateFieldNames, \
-    Currencies, \
+    ExchangeRateFieldNames, Currencies, CURRENCY_ALIASES, DATE_FORMATS, \
     EXCHANGE_RATE_URL, DEFAULT_RMB_EXCHANGE_RATE
-from .configs import useExchangeRatesAPI
+from .configs import useExchangeRatesAPI, serviceHost, servicePort
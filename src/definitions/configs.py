@@ -1 +1,5 @@
 useExchangeRatesAPI = True
+
+# Address of the local query service, see service/
+serviceHost = '127.0.0.1'
+servicePort = 8765
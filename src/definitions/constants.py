@@ -28,15 +28,37 @@ class DatabaseKeys:
     SCHEMA_TYPE_KEY = 'SCHEMA_TYPE'
     SCHEMA_REQUIRED_KEY = 'SCHEMA_REQUIRED'
     ROWS_KEY = 'ROWS'
+    # Schema evolution, see database.schema_evolution
+    SCHEMA_MIGRATIONS_KEY = 'SCHEMA_MIGRATIONS'
+    ROW_SCHEMA_VERSIONS_KEY = 'ROW_SCHEMA_VERSIONS'
+    MIGRATION_ADD_KEY = 'ADD'
+    MIGRATION_DROP_KEY = 'DROP'
+    MIGRATION_RETYPE_KEY = 'RETYPE'
+    SCHEMA_DEFAULT_KEY = 'SCHEMA_DEFAULT'
+    # Changes with every write to the table, see Database.get_table_version
+    TABLE_VERSION_KEY = 'TABLE_VERSION'
 
 class ConversionRateFieldNames:
     RMB_CONVERSION_RATE = 'RMB_CONVERSION_RATE'
     RATE = 'RATE'
     COLLECTION_TIME = 'COLLECTION_TIME'
 
+class ExchangeRateFieldNames:
+    EXCHANGE_RATES = 'EXCHANGE_RATES'
+    BASE = 'BASE'
+    CURRENCIES = 'CURRENCIES'
+    RATES = 'RATES'
+    COLLECTION_TIME = 'COLLECTION_TIME'
+
 class Currencies:
     CNY = 'CNY'
     USD = 'USD'
+    EUR = 'EUR'
+
+# Currency names used in recorded sessions which are not ISO codes
+CURRENCY_ALIASES = {
+    'RMB': Currencies.CNY,
+}
 
 DISALLOWED_NUMBER_INPUTS = [
     'nan',
@@ -44,6 +66,12 @@ DISALLOWED_NUMBER_INPUTS = [
     'infinity',
 ]
 
+# Formats a DATE value may be recorded in, stored as given
+DATE_FORMATS = [
+    '%Y/%m/%d',
+    '%Y-%m-%d',
+]
+
 if useExchangeRatesAPI:
     from .api_key import exchangeRatesAPIKey
     EXCHANGE_RATE_URL = f'http://api.exchangeratesapi.io/v1/latest?access_key={exchangeRatesAPIKey}'
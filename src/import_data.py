@@ -1,128 +1,159 @@
 import click
+import csv
 import datetime
-import openpyxl
+import json
+import os
 import string
+import sys
+from typing import Iterable
 
+# Modules only some commands need are imported in those commands, to keep CLI startup fast
 from backend import Backend
+from backend.ingestion import validate_rows
 from definitions import Session, \
     GameName, FieldDefinition, FieldType, \
     DefaultFieldNames, CustomFieldNames
+from instrumentation import start_instrumentation_from_environment
 
 backend = None
-dataSheet = None
 game = None
 
+DEFAULT_LEGACY_FILE_PATH = 'C:/Users/17gua/Desktop/poker stuff/Lifetime Winning.xlsx'
+IMPORT_BATCH_SIZE = 500
 
-def read_sheet_from_excel(filePath: str=''):
-    filePath = filePath or 'C:/Users/17gua/Desktop/poker stuff/Lifetime Winning.xlsx'
-    wb = openpyxl.load_workbook(filePath, data_only=True)
-    return wb.active
+# Layout of the legacy workbook, as 1-based row and column indices
+# Occasions are named in the first row
+OCCASION_ROW = 1
+GLOBAL_VALUE_COLUMN = 6             # 'F', withdrawn diff; account diff and note follow
+GLOBAL_UNRECORDED_ROW = 7
+GLOBAL_FIRST_ROW = 8
+NORMAL_FIRST_VALUE_COLUMN = 10      # 'J', net earn; date precedes and note follows
+NORMAL_COLUMN_STRIDE = 3
+NORMAL_FIRST_ROW = 5
 
-def read_data_sheet(column: str, row: int):
-    return dataSheet[column + str(row)].value
 
-def get_neighbor_column(column: str, _dir: int) -> str:
-    if _dir not in (1, -1):
-        raise NotImplementedError('can only fetch neighbor one column away')
-    if len(column) == 2:
-        neighbor = column[0] + chr(ord(column[1]) + _dir)
-    else:
-        neighbor = chr(ord(column) + _dir)
-    specialCaseDict = {
-        chr(ord('Z') + 1): 'AA',
-        'A' + chr(ord('A') - 1): 'Z'
-    }
-    return specialCaseDict[neighbor] if neighbor in specialCaseDict else neighbor
+"""
+Streams rows of the active sheet as tuples of cell values
+Opens the workbook in read-only mode, so memory use does not grow with the sheet
+"""
+def iter_sheet_rows(filePath: str=''):
+    import openpyxl
 
-def get_column_occasion(column: str):
-    return read_data_sheet(column, 1)
+    filePath = filePath or DEFAULT_LEGACY_FILE_PATH
+    wb = openpyxl.load_workbook(filePath, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield row
+    finally:
+        wb.close()
 
-def parse_global_entries(column: str) -> None:
-    occasion = get_column_occasion(column)
-    currency = 'USD'
-    prevCol = get_neighbor_column(column, -1)
-    nextCol = get_neighbor_column(column, 1)
-    nextNextCol = get_neighbor_column(nextCol, 1)
+# Reads a cell by 1-based column index, read-only rows may be shorter than the sheet
+def get_cell(row: tuple, column: int):
+    return row[column - 1] if column <= len(row) else None
 
-    # Add row for unrecorded sessions
-    backend.add_session(Session(
+def parse_unrecorded_global_entry(row: tuple, occasion: str) -> Session:
+    return Session(
         game,
         {
-            DefaultFieldNames.NET_EARN: read_data_sheet(column, 7) + read_data_sheet(nextCol, 7),
+            DefaultFieldNames.NET_EARN: get_cell(row, GLOBAL_VALUE_COLUMN) + get_cell(row, GLOBAL_VALUE_COLUMN + 1),
             DefaultFieldNames.NOTE: 'Unrecorded sessions',
             DefaultFieldNames.DATE: '2021-05-14',
-            CustomFieldNames.CURRENCY: currency,
+            CustomFieldNames.CURRENCY: 'USD',
             CustomFieldNames.OCCASION: occasion
         }
-    ))
-    row = 8
+    )
+
+def parse_global_entry(row: tuple, rowIndex: int, occasion: str, date) -> Session:
+    withdrawnDiff = get_cell(row, GLOBAL_VALUE_COLUMN)
+    accountDiff = get_cell(row, GLOBAL_VALUE_COLUMN + 1)
+    netEarn = (withdrawnDiff or 0) + accountDiff
+    note = get_cell(row, GLOBAL_VALUE_COLUMN + 2)
+
+    tags = []
+    if withdrawnDiff is not None:
+        if withdrawnDiff > 0 and accountDiff < 0:
+            tags.append('Withdraw')
+        elif withdrawnDiff <= 0 and accountDiff > 0:
+            tags.append('Purchase')
+        else:
+            raise ValueError(f'incorrect data at row {rowIndex}')
+    return Session(
+        game,
+        {
+            DefaultFieldNames.NET_EARN: netEarn,
+            DefaultFieldNames.DATE: date,
+            DefaultFieldNames.NOTE: note,
+            DefaultFieldNames.TAGS: tags,
+            CustomFieldNames.CURRENCY: 'USD',
+            CustomFieldNames.OCCASION: occasion
+        }
+    )
+
+def parse_normal_entry(row: tuple, column: int, occasion: str) -> Session:
+    return Session(
+        game,
+        {
+            DefaultFieldNames.NET_EARN: get_cell(row, column),
+            DefaultFieldNames.DATE: get_cell(row, column - 1),
+            DefaultFieldNames.NOTE: get_cell(row, column + 1),
+            CustomFieldNames.CURRENCY: 'RMB' if 'RMB' in occasion else 'USD',
+            CustomFieldNames.OCCASION: occasion
+        }
+    )
+
+"""
+Parses the legacy workbook into Sessions in a single pass over its rows
+Each column block ends at its first empty value cell
+"""
+def iter_legacy_sessions(rows):
+    rows = iter(rows)
+    occasionRow = next(rows, ())
+    globalOccasion = get_cell(occasionRow, GLOBAL_VALUE_COLUMN)
+    normalOccasions = {}
+    column = NORMAL_FIRST_VALUE_COLUMN
+    while get_cell(occasionRow, column):
+        normalOccasions[column] = get_cell(occasionRow, column)
+        column += NORMAL_COLUMN_STRIDE
+
+    globalActive = True
     date = None
-    while read_data_sheet(nextCol, row) is not None:
-        withdrawnDiff = read_data_sheet(column, row)
-        accountDiff = read_data_sheet(nextCol, row)
-        netEarn = (withdrawnDiff or 0) + accountDiff
-        date = read_data_sheet(prevCol, row) or date
-        note = read_data_sheet(nextNextCol, row)
-
-        tags = []
-        if withdrawnDiff is not None:
-            if withdrawnDiff > 0 and accountDiff < 0:
-                tags.append('Withdraw')
-            elif withdrawnDiff <= 0 and accountDiff > 0:
-                tags.append('Purchase')
+    for rowIndex, row in enumerate(rows, start=OCCASION_ROW + 1):
+        if rowIndex == GLOBAL_UNRECORDED_ROW:
+            yield parse_unrecorded_global_entry(row, globalOccasion)
+        elif rowIndex >= GLOBAL_FIRST_ROW and globalActive:
+            if get_cell(row, GLOBAL_VALUE_COLUMN + 1) is None:
+                globalActive = False
             else:
-                raise ValueError(f'incorrect data at row {row}')
-        backend.add_session(Session(
-            game,
-            {
-                DefaultFieldNames.NET_EARN: netEarn,
-                DefaultFieldNames.DATE: date,
-                DefaultFieldNames.NOTE: note,
-                DefaultFieldNames.TAGS: tags,
-                CustomFieldNames.CURRENCY: currency,
-                CustomFieldNames.OCCASION: occasion
-            }
-        ))
-        row += 1
-
-def parse_normal_entries(column: str) -> None:
-    occasion = get_column_occasion(column)
-    currency = 'RMB' if 'RMB' in occasion else 'USD'
-    prevCol = get_neighbor_column(column, -1)
-    nextCol = get_neighbor_column(column, 1)
-    
-    row = 5
-    while read_data_sheet(column, row) is not None:
-        netEarn = read_data_sheet(column, row)
-        date = read_data_sheet(prevCol, row)
-        note = read_data_sheet(nextCol, row)
-        backend.add_session(Session(
-            game,
-            {
-                DefaultFieldNames.NET_EARN: netEarn,
-                DefaultFieldNames.DATE: date,
-                DefaultFieldNames.NOTE: note,
-                CustomFieldNames.CURRENCY: currency,
-                CustomFieldNames.OCCASION: occasion
-            }
-        ))
-        row += 1
-
-
-def import_data_to_db():
-    global dataSheet
-    dataSheet = read_sheet_from_excel()
-
-    parse_global_entries('F')
-    normalEntryColumn = 'J'
-    while get_column_occasion(normalEntryColumn):
-        parse_normal_entries(normalEntryColumn)
-        for _ in range(3):
-            normalEntryColumn = get_neighbor_column(normalEntryColumn, 1)
+                date = get_cell(row, GLOBAL_VALUE_COLUMN - 1) or date
+                yield parse_global_entry(row, rowIndex, globalOccasion, date)
+
+        if rowIndex >= NORMAL_FIRST_ROW:
+            for column, occasion in list(normalOccasions.items()):
+                if get_cell(row, column) is None:
+                    del normalOccasions[column]
+                else:
+                    yield parse_normal_entry(row, column, occasion)
+            if not normalOccasions and not globalActive:
+                return
+
+
+def import_data_to_db(filePath: str='', batchSize: int=IMPORT_BATCH_SIZE, reportProgress=None) -> int:
+    imported = 0
+    batch = []
+    for session in iter_legacy_sessions(iter_sheet_rows(filePath)):
+        batch.append(session)
+        if len(batch) >= batchSize:
+            imported += len(backend.add_sessions(batch))
+            batch = []
+            reportProgress and reportProgress(imported)
+    if batch:
+        imported += len(backend.add_sessions(batch))
+        reportProgress and reportProgress(imported)
+    return imported
 
 
 # Overwrites default database with imported data
-def import_legacy_data():
+def import_legacy_data(filePath: str='', batchSize: int=IMPORT_BATCH_SIZE, reportProgress=None) -> int:
     global game
     backend.reset_database()
 
@@ -132,7 +163,76 @@ def import_legacy_data():
         FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT, required=True)
     ]
     game = backend.add_game(GameName.TEXAS_HOLDEM, fields)
-    import_data_to_db()
+    return import_data_to_db(filePath, batchSize, reportProgress)
+
+class RecordFormat:
+    JSONL = 'jsonl'
+    CSV = 'csv'
+
+"""
+Parses session records, one JSON object per line or CSV with a header row of field names
+Blank lines and empty CSV cells are skipped
+Returns ([(line number, field values)], [(line number, error message)])
+"""
+def parse_session_records(lines: Iterable[str], recordFormat: str=RecordFormat.JSONL):
+    records, errors = [], []
+    if recordFormat == RecordFormat.CSV:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                errors.append((reader.line_num, 'more cells than header columns'))
+                continue
+            fieldValues = { k: v for k, v in row.items() if v not in (None, '') }
+            if fieldValues:
+                records.append((reader.line_num, fieldValues))
+        return records, errors
+
+    for lineNumber, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            fieldValues = json.loads(line)
+        except ValueError as e:
+            errors.append((lineNumber, f'invalid JSON: {e}'))
+            continue
+        if not isinstance(fieldValues, dict):
+            errors.append((lineNumber, 'expected a JSON object'))
+            continue
+        records.append((lineNumber, fieldValues))
+    return records, errors
+
+"""
+Validates every record and adds the valid ones to gameName in a single database write
+Records without a date are recorded today, like add-session
+strict: add nothing if any line is invalid
+Returns (number of sessions added, [(line number, error message)] sorted by line)
+"""
+def add_session_records(gameName: str, lines: Iterable[str], recordFormat: str=RecordFormat.JSONL,
+                        strict: bool=False):
+    records, errors = parse_session_records(lines, recordFormat)
+    today = str(datetime.date.today())
+    rows = [{ DefaultFieldNames.DATE: today, **fieldValues } for _, fieldValues in records]
+    if strict and errors:
+        # Nothing is added, the rows are only validated to report every invalid line
+        sessionIds = []
+        _, rowErrors = validate_rows(backend.construct_game_from_db(gameName), rows)
+    else:
+        sessionIds, rowErrors = backend.add_session_values(gameName, rows, strict=strict)
+    errors += [(records[e.index][0], e.message) for e in rowErrors]
+    return sum(1 for _id in sessionIds if _id), sorted(errors)
+
+"""
+Sets the global backend
+useService: use the running query service if there is one, which skips loading the database
+The conversion rate is only looked up once a command converts currencies
+"""
+def init_backend(useService: bool=False):
+    global backend
+    client = None
+    if useService:
+        from service import connect_to_service
+        client = connect_to_service()
+    backend = client or Backend()
 
 @click.group()
 def cli_options():
@@ -152,6 +252,7 @@ def cli_options():
 @click.option('--tags', type=str, default='', prompt='Tags, example: Purchase')
 def add_session(game, occasion, net_earn, currency, length, people, note, tags):
     """CLI command to add session to database"""
+    init_backend(useService=True)
     session_construct_dict = {
         DefaultFieldNames.NET_EARN: net_earn,
         DefaultFieldNames.DATE: str(datetime.date.today()),
@@ -174,13 +275,95 @@ def add_session(game, occasion, net_earn, currency, length, people, note, tags):
     print(f'Successfully added session {session_id}')
 
 
+@click.command(help=
+    '''record many sessions at once from JSON Lines or CSV, in a single database write
+       example: py import_data.py add-sessions --game "TEXAS HOLD'EM" --file sessions.jsonl
+       each line is a JSON object of field values, such as {"NET EARN": 100, "CURRENCY": "USD"}
+       CSV input needs a header row of field names; sessions without a date are recorded today
+    ''')
+@click.option('--game', type=str, default="TEXAS HOLD'EM")
+@click.option('--file', 'recordsFile', type=click.File('r'), default='-', help='Defaults to stdin')
+@click.option('--format', 'recordFormat', type=click.Choice([RecordFormat.JSONL, RecordFormat.CSV]), default=None,
+              help='Defaults to the file extension, or JSON Lines')
+@click.option('--strict', is_flag=True, help='Add nothing if any line is invalid')
+def add_sessions(game, recordsFile, recordFormat, strict):
+    """CLI command to add sessions to database in bulk"""
+    if not recordFormat:
+        isCsv = os.path.splitext(recordsFile.name)[1].lower() == '.csv'
+        recordFormat = RecordFormat.CSV if isCsv else RecordFormat.JSONL
+    init_backend()
+    added, errors = add_session_records(game, recordsFile, recordFormat, strict)
+    for lineNumber, message in errors:
+        print(f'line {lineNumber}: {message}', file=sys.stderr)
+    print(f'Successfully added {added} sessions, {len(errors)} invalid lines')
+    if errors:
+        sys.exit(1)
+
+
+@click.command(help=
+    '''import the legacy workbook, overwriting the database
+       example: py import_data.py import-legacy --file "Lifetime Winning.xlsx"
+    ''')
+@click.option('--file', 'filePath', type=str, default=DEFAULT_LEGACY_FILE_PATH)
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Sessions written to the database at once')
+@click.confirmation_option(prompt='This overwrites the database, continue?')
+def import_legacy(filePath, batch_size):
+    """CLI command to import the legacy workbook"""
+    init_backend()
+    imported = import_legacy_data(filePath, batch_size, lambda n: print(f'Imported {n} sessions...'))
+    print(f'Successfully imported {imported} sessions')
+
+
+@click.command(help=
+    '''import sessions from a CSV or XLSX export, as mapped by a JSON import spec
+       example: py import_data.py import-file --spec tracker_spec.json --file export.csv --errors rejected.csv
+    ''')
+@click.option('--spec', 'specPath', type=str, required=True, help='JSON file mapping columns to game fields')
+@click.option('--file', 'filePath', type=str, required=True)
+@click.option('--errors', 'errorsPath', type=str, default='', help='Write rejected rows to this CSV file')
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Sessions written to the database at once')
+@click.option('--workers', type=int, default=None, help='Validation worker processes, defaults to CPU count')
+def import_file(specPath, filePath, errorsPath, batch_size, workers):
+    """CLI command to import sessions from another tracker's export"""
+    from importer import ImportPipeline, load_import_spec
+
+    init_backend()
+    pipeline = ImportPipeline(backend, load_import_spec(specPath), batchSize=batch_size, workers=workers)
+    report = pipeline.run(filePath, lambda r: print(f'Read {r.rowsRead} rows, imported {r.imported} sessions...'))
+    print(f'Successfully imported {report.imported} sessions, rejected {len(report.rejected)} rows')
+    if report.rejected and errorsPath:
+        report.write_error_report(errorsPath)
+        print(f'Rejected rows written to {errorsPath}')
+
+
+@click.command(help=
+    '''convert the database between the JSON and the binary snapshot format
+       example: py import_data.py convert-db --from json_database.json --to database.snapshot
+    ''')
+@click.option('--from', 'sourceFilename', type=str, required=True)
+@click.option('--to', 'targetFilename', type=str, required=True)
+@click.option('--to-format', type=click.Choice(['snapshot', 'json']), default='snapshot')
+def convert_db(sourceFilename, targetFilename, to_format):
+    """CLI command to convert database file formats"""
+    from database import json_to_snapshot, snapshot_to_json
+
+    convert = json_to_snapshot if to_format == 'snapshot' else snapshot_to_json
+    try:
+        convert(sourceFilename, targetFilename)
+    except (OSError, ValueError) as e:
+        print(f'Cannot convert {sourceFilename}, {targetFilename} is left unchanged: {e}', file=sys.stderr)
+        sys.exit(1)
+    print(f'Successfully converted {sourceFilename} into {targetFilename}')
+
+
 cli_options.add_command(add_session)
+cli_options.add_command(add_sessions)
+cli_options.add_command(import_legacy)
+cli_options.add_command(import_file)
+cli_options.add_command(convert_db)
 
 def main():
-    global backend
-    backend = Backend()
-    # import_legacy_data()
-    backend.get_rmb_conversion_rate()
+    start_instrumentation_from_environment()
     cli_options()
 
 if __name__ == '__main__':
@@ -0,0 +1,3 @@
+from .spec import ImportSpec, load_import_spec
+from .readers import iter_file_rows
+from .pipeline import ImportPipeline, ImportReport, RejectedRow
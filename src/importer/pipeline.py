@@ -0,0 +1,132 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from backend.ingestion import PARALLEL_VALIDATION_MIN_ROWS
+
+from .spec import ImportSpec
+from .readers import iter_file_rows
+
+
+DEFAULT_BATCH_SIZE = 20000
+
+
+class RejectedRow(NamedTuple):
+    rowNumber: int
+    message: str
+    values: Dict[str, Any]
+
+
+"""
+    ImportReport summarizes one run of an ImportPipeline
+
+    Attributes:
+    - rowsRead: int : Data rows read from the file, blank rows excluded
+    - imported: int : Sessions written to the database
+    - rejected: List[RejectedRow] : Rows which failed validation, with their row number in the file
+"""
+class ImportReport:
+
+    def __init__(self):
+        self.rowsRead = 0
+        self.imported = 0
+        self.rejected: List[RejectedRow] = []
+
+    # Writes rejected rows as CSV: row number, error, then the mapped field values
+    def write_error_report(self, path: str) -> None:
+        fieldNames = []
+        for rejectedRow in self.rejected:
+            fieldNames += [f for f in rejectedRow.values if f not in fieldNames]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['ROW', 'ERROR'] + fieldNames)
+            for rejectedRow in self.rejected:
+                writer.writerow([rejectedRow.rowNumber, rejectedRow.message] + \
+                    [rejectedRow.values.get(f, '') for f in fieldNames])
+
+
+"""
+    ImportPipeline imports a CSV or XLSX file as described by an ImportSpec
+    Rows stream through parse -> validate -> batch insert, one database write per batch
+    Large batches are validated in a pool of worker processes
+    Rows which fail validation are collected in the ImportReport instead of aborting the import
+
+    Attributes:
+    - backend: Backend : The Backend sessions are written to
+    - spec: ImportSpec : How file columns map onto Game fields
+    - batchSize: int : Rows validated and written at once, bounds memory use
+    - workers: int : Worker processes for validation, 1 disables the pool
+"""
+class ImportPipeline:
+
+    def __init__(self, backend, spec: ImportSpec, batchSize: int=DEFAULT_BATCH_SIZE, workers: int=None,
+                 parallelMinRows: int=PARALLEL_VALIDATION_MIN_ROWS):
+        self.backend = backend
+        self.spec = spec
+        self.batchSize = batchSize
+        self.workers = workers or os.cpu_count() or 1
+        self.parallelMinRows = parallelMinRows
+        self.pool = None
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        if not self.pool:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self.pool
+
+    """
+    Imports filePath into the spec's Game
+    reportProgress, if provided, is called with the ImportReport after every batch
+    Raises ValueError if the spec does not fit the Game or the file header, or the file has no header row
+    """
+    def run(self, filePath: str, reportProgress=None) -> ImportReport:
+        self.spec.verify_fields(self.backend.construct_game_from_db(self.spec.gameName))
+        columnIndices = None if self.spec.headerRow else self.spec.resolve_column_indices()
+
+        report = ImportReport()
+        batch = []
+        try:
+            for rowNumber, row in iter_file_rows(filePath, self.spec):
+                if rowNumber == self.spec.headerRow:
+                    columnIndices = self.spec.resolve_column_indices(row)
+                if rowNumber < self.spec.firstDataRow or is_blank_row(row):
+                    continue
+                if columnIndices is None:
+                    raise self.missing_header_error(filePath)
+                batch.append((rowNumber, self.spec.map_row(row, columnIndices)))
+                if len(batch) >= self.batchSize:
+                    self.ingest_batch(batch, report)
+                    batch = []
+                    reportProgress and reportProgress(report)
+            if columnIndices is None:
+                raise self.missing_header_error(filePath)
+            if batch:
+                self.ingest_batch(batch, report)
+                reportProgress and reportProgress(report)
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+                self.pool = None
+        return report
+
+    def missing_header_error(self, filePath: str) -> ValueError:
+        return ValueError(f'header row {self.spec.headerRow} was not found in {filePath}')
+
+    def ingest_batch(self, batch: List[Tuple[int, Dict[str, Any]]], report: ImportReport) -> None:
+        report.rowsRead += len(batch)
+        useExecutor = self.workers > 1 and len(batch) >= self.parallelMinRows
+        sessionIds, errors = self.backend.add_session_values(
+            self.spec.gameName,
+            [fieldValues for _, fieldValues in batch],
+            workers=self.workers,
+            executor=useExecutor and self.get_pool() or None,
+            parallelMinRows=self.parallelMinRows
+        )
+        report.imported += sum(1 for _id in sessionIds if _id)
+        report.rejected += [
+            RejectedRow(batch[error.index][0], error.message, error.values) for error in errors
+        ]
+
+
+def is_blank_row(row: tuple) -> bool:
+    return all(cell is None or cell == '' for cell in row)
@@ -0,0 +1,43 @@
+import csv
+import os
+
+from .spec import ImportSpec
+
+
+CSV_EXTENSIONS = ('.csv', '.txt')
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+
+
+def iter_csv_rows(filePath: str, delimiter: str=','):
+    with open(filePath, newline='') as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            yield tuple(row)
+
+"""
+Streams rows of a worksheet as tuples of cell values
+Opens the workbook in read-only mode, so memory use does not grow with the sheet
+"""
+def iter_xlsx_rows(filePath: str, sheet: str=None):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(filePath, read_only=True, data_only=True)
+    try:
+        worksheet = wb[sheet] if sheet else wb.active
+        for row in worksheet.iter_rows(values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+"""
+Streams (1-based row number, row) pairs of a CSV or XLSX file
+The file type is picked from the file extension
+"""
+def iter_file_rows(filePath: str, spec: ImportSpec):
+    extension = os.path.splitext(filePath)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        rows = iter_csv_rows(filePath, spec.delimiter)
+    elif extension in XLSX_EXTENSIONS:
+        rows = iter_xlsx_rows(filePath, spec.sheet)
+    else:
+        raise ValueError(f'cannot import {extension} files')
+    return enumerate(rows, start=1)
@@ -0,0 +1,111 @@
+import json
+from typing import Any, Dict, List, Union
+
+from definitions import Game
+
+
+# Marks a column given as a spreadsheet column letter, such as '$F', so header names are never mistaken for one
+COLUMN_LETTER_MARKER = '$'
+
+"""
+    ImportSpec declares how rows of a CSV or XLSX export map onto the fields of a Game
+    DO NOT directly modify any attributes after init
+
+    Attributes:
+    - gameName: str : The Game sessions are imported into
+    - columns: Dict[str, str | int] : fieldName -> column, given as a header name,
+        a column letter marked with COLUMN_LETTER_MARKER such as '$F' or '$AB', or a 1-based column index
+    - constants: Dict[str, Any] : fieldName -> value shared by every imported session
+    - headerRow: int : 1-based row holding column names, 0 if the file has no header
+    - firstDataRow: int : 1-based row of the first session, defaults to the row after the header
+    - sheet: str : Worksheet to read from an XLSX file, defaults to the active sheet
+    - delimiter: str : Field delimiter of a CSV file
+
+    Example spec file:
+    {
+        "game": "TEXAS HOLD'EM",
+        "columns": { "NET EARN": "Profit", "DATE": "$A", "NOTE": 5 },
+        "constants": { "CURRENCY": "USD", "OCCASION": "Online" }
+    }
+"""
+class ImportSpec:
+
+    def __init__(self, gameName: str, columns: Dict[str, Union[str, int]], constants: Dict[str, Any]=None,
+                 headerRow: int=1, firstDataRow: int=None, sheet: str=None, delimiter: str=','):
+        if not columns:
+            raise ValueError('import spec must map at least one column')
+        self.gameName = gameName
+        self.columns = dict(columns)
+        self.constants = dict(constants or {})
+        self.headerRow = headerRow
+        self.firstDataRow = firstDataRow or headerRow + 1
+        self.sheet = sheet
+        self.delimiter = delimiter
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any]) -> 'ImportSpec':
+        return cls(
+            spec['game'],
+            spec['columns'],
+            constants=spec.get('constants'),
+            headerRow=spec.get('headerRow', 1),
+            firstDataRow=spec.get('firstDataRow'),
+            sheet=spec.get('sheet'),
+            delimiter=spec.get('delimiter', ',')
+        )
+
+    # Raises ValueError if the spec names fields the Game does not define
+    def verify_fields(self, game: Game) -> None:
+        for fieldName in list(self.columns) + list(self.constants):
+            _, existingField = game.find_field_definition_by_name(fieldName)
+            if not existingField:
+                raise ValueError(f'field {fieldName} is not defined for game {game.get_name()}')
+
+    """
+    Resolves every mapped column into a 0-based index into a row
+    header: the values of the header row, or None if the file has no header
+    Raises ValueError if a column cannot be found
+    """
+    def resolve_column_indices(self, header: List[Any]=None) -> Dict[str, int]:
+        headerIndex = { str(name).strip(): i for i, name in enumerate(header or []) if name is not None }
+        indices = {}
+        for fieldName, column in self.columns.items():
+            if isinstance(column, int):
+                indices[fieldName] = column - 1
+            elif is_column_letter(column):
+                indices[fieldName] = column_letter_to_index(column[len(COLUMN_LETTER_MARKER):].upper())
+            elif column in headerIndex:
+                indices[fieldName] = headerIndex[column]
+            else:
+                raise ValueError(f'column {column} for field {fieldName} is not in the header')
+        return indices
+
+    """
+    Builds the field values of one session from a row
+    Empty cells are left out, so they read as missing fields
+    """
+    def map_row(self, row: tuple, columnIndices: Dict[str, int]) -> Dict[str, Any]:
+        fieldValues = dict(self.constants)
+        for fieldName, index in columnIndices.items():
+            value = row[index] if index < len(row) else None
+            if isinstance(value, str):
+                value = value.strip()
+            if value is not None and value != '':
+                fieldValues[fieldName] = value
+        return fieldValues
+
+
+def load_import_spec(path: str) -> ImportSpec:
+    with open(path) as f:
+        return ImportSpec.from_dict(json.load(f))
+
+def is_column_letter(column: str) -> bool:
+    letters = column[len(COLUMN_LETTER_MARKER):]
+    return column.startswith(COLUMN_LETTER_MARKER) and letters.isascii() and letters.isalpha()
+
+# Converts a spreadsheet column letter of any length into a 0-based index: 'A' -> 0, 'AB' -> 27
+def column_letter_to_index(column: str) -> int:
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
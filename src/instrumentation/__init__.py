@@ -0,0 +1,6 @@
+# Instrumentation
+# Counters and timers on the hot paths of Database and Backend, plus an optional cProfile dump
+# Disabled unless the environment asks for it, a disabled hook costs one attribute check
+
+from .stats import Stats, TimerStats, stats, timed, STATS_ENVIRONMENT_VARIABLE
+from .profiling import profiled, start_instrumentation_from_environment, PROFILE_ENVIRONMENT_VARIABLE
@@ -0,0 +1,42 @@
+import atexit
+import os
+import sys
+from contextlib import contextmanager
+
+from .stats import stats
+
+
+# Set to a file path to profile the whole run with cProfile and dump it there on exit
+PROFILE_ENVIRONMENT_VARIABLE = 'WINNING_TRACKER_PROFILE'
+
+
+"""
+Profiles the enclosed block with cProfile and dumps it to path
+The dump loads with pstats.Stats(path) or tools such as snakeviz
+"""
+@contextmanager
+def profiled(path: str):
+    # Imported on use, scripts which are not profiled should not load it
+    import cProfile
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+"""
+Called by the scripts on start-up
+Profiles until exit if PROFILE_ENVIRONMENT_VARIABLE is set
+Prints the stats report to stderr on exit if stats are enabled
+"""
+def start_instrumentation_from_environment():
+    profilePath = os.environ.get(PROFILE_ENVIRONMENT_VARIABLE)
+    if profilePath:
+        profile = profiled(profilePath)
+        profile.__enter__()
+        atexit.register(profile.__exit__, None, None, None)
+    if stats.enabled:
+        atexit.register(lambda: print(stats.report(), file=sys.stderr))
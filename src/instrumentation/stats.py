@@ -0,0 +1,116 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, NamedTuple
+
+
+# Set to a non-empty value to collect stats from start-up
+STATS_ENVIRONMENT_VARIABLE = 'WINNING_TRACKER_STATS'
+
+
+class TimerStats(NamedTuple):
+    calls: int
+    # Seconds
+    total: float
+    max: float
+
+
+"""
+    Stats collects counters and per-operation timers
+    Nothing is recorded while disabled, so hooks can stay in hot paths
+    Safe to share between threads
+
+    Attributes:
+    - enabled: bool : Whether hooks record anything
+    - counters: Dict[str, int] : Count per counter name
+    - timers: Dict[str, TimerStats] : Timings per operation name
+"""
+class Stats:
+
+    def __init__(self, enabled: bool=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.timers = {}
+
+    def count(self, name: str, n: int=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, operation: str, seconds: float):
+        with self.lock:
+            calls, total, longest = self.timers.get(operation, (0, 0.0, 0.0))
+            self.timers[operation] = TimerStats(calls + 1, total + seconds, max(longest, seconds))
+
+    # Times the enclosed block as one call of operation
+    @contextmanager
+    def timer(self, operation: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(operation, time.perf_counter() - start)
+
+    def get_counters(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def get_timers(self) -> Dict[str, TimerStats]:
+        with self.lock:
+            return dict(self.timers)
+
+    # JSON-serializable copy of the stats
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'counters': self.get_counters(),
+            'timers': { operation: t._asdict() for operation, t in self.get_timers().items() },
+        }
+
+    # Human readable summary, slowest operations first
+    def report(self) -> str:
+        lines = ['Timers (calls, total ms, max ms):']
+        for operation, t in sorted(self.get_timers().items(), key=lambda item: item[1].total, reverse=True):
+            lines.append(f'  {operation:32} {t.calls:8} {t.total * 1000:12.3f} {t.max * 1000:10.3f}')
+        lines.append('Counters:')
+        for name, count in sorted(self.get_counters().items()):
+            lines.append(f'  {name:32} {count:8}')
+        return '\n'.join(lines)
+
+
+stats = Stats(enabled=bool(os.environ.get(STATS_ENVIRONMENT_VARIABLE)))
+
+"""
+Decorator timing every call of the function as operation in stats
+While stats is disabled the function is called directly
+"""
+def timed(operation: str):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add_time(operation, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -1,37 +1,30 @@
-import matplotlib.pyplot as plt
-
-from datetime import datetime
-from typing import List
+from typing import List, Sequence
 
 from backend import Backend
+from backend.timeseries import Bucket, DEFAULT_MAX_POINTS, prepare_cumulative_series
+from service import connect_to_service
+from instrumentation import stats, start_instrumentation_from_environment
 from definitions import FilterOperator, FilterCondition, VisualizeFilters, \
-    DefaultFieldNames, GameName, CustomFieldNames
+    DefaultFieldNames, GameName, CustomFieldNames, Currencies
 
 
 backend = None
 
-def parse_datetime_from_db(timestamp: str):
-    return datetime.strptime(timestamp, "%Y-%m-%d")
-
-def cumulative_sum_from_series(data: List):
-    cumulative = []
-    runSum = 0
-    for d in data:
-        runSum += d
-        cumulative.append(runSum)
-    return cumulative
-
 """
-Plot cumulative value of data over time
-data: List of (time, value) tuples
+Plot cumulative value of values over time
+dates: ISO date of each value, in any order
 """
-def plot_cumulative(data: List[tuple]):
-    time = [
-        parse_datetime_from_db(d[0]) for d in data 
-    ]
-    values = [d[1] for d in data]
-    plt.plot(time, cumulative_sum_from_series(values))
-    plt.gcf().autofmt_xdate()
+def plot_cumulative(dates: Sequence[str], values: Sequence[float], bucket: str=Bucket.DAY,
+                    maxPoints: int=DEFAULT_MAX_POINTS):
+    # Imported on first plot, matplotlib is slow to load
+    with stats.timer('plot.import'):
+        import matplotlib.pyplot as plt
+
+    with stats.timer('plot.prepare'):
+        time, cumulative = prepare_cumulative_series(dates, values, bucket, maxPoints)
+    with stats.timer('plot.render'):
+        plt.plot(time, cumulative)
+        plt.gcf().autofmt_xdate()
     plt.show()
 
 
@@ -41,13 +34,12 @@ def plot_all_time_winnings(_filter=VisualizeFilters({})):
         [ DefaultFieldNames.DATE, DefaultFieldNames.NET_EARN, CustomFieldNames.CURRENCY ],
         _filter=_filter
     )
-    data = sorted(data)
-    
-    rmbConversionRate = backend.get_rmb_conversion_rate()
-    currencyConvertedData = [
-        tuple([t[0], t[1] / (1 if t[2] == 'USD' else rmbConversionRate)]) for t in data
-    ]
-    plot_cumulative(currencyConvertedData)
+    if not data:
+        return
+
+    dates, netEarns, currencies = zip(*data)
+    convertedNetEarns = backend.convert(netEarns, currencies, Currencies.USD, dates)
+    plot_cumulative(dates, convertedNetEarns)
 
 
 """
@@ -56,14 +48,15 @@ Plot summary stats
 def plot_all_time_stats(_filter=VisualizeFilters({})):
     data = get_session_data(
         GameName.TEXAS_HOLDEM,
-        [ DefaultFieldNames.NET_EARN, CustomFieldNames.CURRENCY, CustomFieldNames.OCCASION, DefaultFieldNames.LENGTH ],
+        [ DefaultFieldNames.NET_EARN, CustomFieldNames.CURRENCY, CustomFieldNames.OCCASION, DefaultFieldNames.LENGTH, DefaultFieldNames.DATE ],
         _filter=_filter
     )
+    if not data:
+        return
 
-    rmbConversionRate = backend.get_rmb_conversion_rate()
-    currencyConvertedData = [
-        tuple([t[0] / (1 if t[1] == 'USD' else rmbConversionRate), t[2], t[3]]) for t in data
-    ]
+    netEarns, currencies, occasions, lengths, dates = zip(*data)
+    convertedNetEarns = backend.convert(netEarns, currencies, Currencies.USD, dates)
+    currencyConvertedData = zip(convertedNetEarns, occasions, lengths)
 
     # Print the overall and hourly breakdown by occasion
     # Data structure: {
@@ -108,7 +101,12 @@ def get_session_data(gameName: str, columns: List[str], _filter: VisualizeFilter
 
 def main():
     global backend
-    backend = Backend()
+    start_instrumentation_from_environment()
+    # The running query service already has the database loaded
+    backend = connect_to_service()
+    if not backend:
+        backend = Backend()
+        backend.start_rate_refresher()
     plot_all_time_stats()
     plot_all_time_winnings(
         _filter=VisualizeFilters({
@@ -0,0 +1,291 @@
+import concurrent.futures
+import html
+import io
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Sequence
+
+import click
+
+from backend import Backend, SessionAggregate
+from backend.timeseries import Bucket, to_datetime64
+from database import ConcurrentDatabase
+from definitions import VisualizeFilters, DefaultFieldNames, CustomFieldNames, Currencies
+from instrumentation import stats, start_instrumentation_from_environment
+
+# numpy and matplotlib are imported where they are used, the CLI help should not load them
+
+
+class ReportFormat:
+    PNG = 'png'
+    SVG = 'svg'
+    # One page with every chart inlined as SVG, and the breakdown tables
+    HTML = 'html'
+
+    ALL = [PNG, SVG, HTML]
+
+CHART_SIZE = (10, 5)
+CHART_DPI = 100
+# Fixed margins, a layout engine would draw every chart twice
+CHART_MARGINS = { 'left': 0.15, 'right': 0.97, 'bottom': 0.15, 'top': 0.92 }
+# SVG text stays text instead of being drawn as glyph paths, which is much smaller and faster
+CHART_STYLE = { 'svg.fonttype': 'none' }
+PERIOD_DAYS = { Bucket.DAY: 1, Bucket.WEEK: 7, Bucket.MONTH: 30 }
+
+
+"""
+    ReportData is every session one report draws from, with net earns already converted
+    Loaded once per game, every chart and table of the report reuses it
+
+    Attributes:
+    - name: str : File name of the report, without extension
+    - title: str : Heading of the report
+    - currency: str : Currency of netEarns
+    - dates: numpy.ndarray : datetime64[D] date of each session
+    - netEarns: numpy.ndarray : Converted net earn of each session
+    - lengths: numpy.ndarray : Hours of each session, NaN where not recorded
+    - occasions: List[str] : OCCASION of each session, None where not recorded
+"""
+class ReportData(NamedTuple):
+    name: str
+    title: str
+    currency: str
+    dates: Any
+    netEarns: Any
+    lengths: Any
+    occasions: List[str]
+
+    def select(self, name: str, title: str, indices: Sequence[int]) -> 'ReportData':
+        return ReportData(name, title, self.currency, self.dates[indices], self.netEarns[indices],
+                          self.lengths[indices], [self.occasions[i] for i in indices])
+
+
+def to_file_name(title: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-') or 'report'
+
+# Gives every report its own file name, a numeric suffix tells apart titles which map to the same one
+def make_names_unique(reports: List[ReportData]) -> List[ReportData]:
+    taken = set()
+    uniqueReports = []
+    for data in reports:
+        name, suffix = data.name, 2
+        while name in taken:
+            name, suffix = f'{data.name}-{suffix}', suffix + 1
+        taken.add(name)
+        uniqueReports.append(data._replace(name=name))
+    return uniqueReports
+
+# Builds the ReportData of rows, as read and converted by the Backend
+def to_report_data(title: str, target: str, rows: List[Dict[str, Any]], netEarns, lengths) -> ReportData:
+    import numpy as np
+
+    return ReportData(
+        to_file_name(title), title, target,
+        to_datetime64([row.get(DefaultFieldNames.DATE) for row in rows]),
+        np.asarray(netEarns, dtype=float),
+        np.array([np.nan if length is None else length for length in lengths], dtype=float),
+        [row.get(CustomFieldNames.OCCASION) for row in rows],
+    )
+
+"""
+Loads the sessions of gameName through the Backend, once per filter, and slices the report of every OCCASION
+    from the sessions loaded without a filter
+filters: { title suffix: VisualizeFilters }, the '' suffix reports on every session
+byOccasion: also report on the sessions of each OCCASION
+Returns the ReportData of every slice with sessions, filters first, each with its own file name
+"""
+def load_report_data(backend: Backend, gameName: str, filters: Dict[str, VisualizeFilters]=None,
+                     byOccasion: bool=False, target: str=Currencies.USD) -> List[ReportData]:
+    import numpy as np
+
+    filters = filters or { '': None }
+    reports = []
+    allSessions = None
+    with stats.timer('report.load'):
+        for suffix, _filter in filters.items():
+            title = f'{gameName} - {suffix}' if suffix else gameName
+            _, rows, netEarns, lengths = backend._load_converted_rows(gameName, _filter, target)
+            data = to_report_data(title, target, rows, netEarns, lengths)
+            if _filter is None:
+                allSessions = data
+            if rows:
+                reports.append(data)
+        if byOccasion and allSessions is None:
+            allSessions = to_report_data(gameName, target, *backend._load_converted_rows(gameName, None, target)[1:])
+
+    if byOccasion:
+        # One pass over the sessions, rather than one filtered scan per occasion
+        occasionIndices = {}
+        for index, occasion in enumerate(allSessions.occasions):
+            if occasion is not None:
+                occasionIndices.setdefault(occasion, []).append(index)
+        for occasion in sorted(occasionIndices):
+            title = f'{gameName} - {occasion}'
+            reports.append(allSessions.select(to_file_name(title), title, np.array(occasionIndices[occasion], dtype=np.intp)))
+    return make_names_unique(reports)
+
+
+def plot_cumulative_chart(figure, data: ReportData):
+    from backend.timeseries import prepare_cumulative_series
+
+    time, cumulative = prepare_cumulative_series(data.dates, data.netEarns)
+    axes = figure.subplots()
+    axes.plot(time, cumulative)
+    axes.set_title(f'Cumulative net earn ({data.currency})')
+    figure.autofmt_xdate()
+
+def plot_occasion_chart(figure, occasions: Dict[Any, SessionAggregate], currency: str):
+    labels = [format_group(occasion) for occasion in occasions]
+    axes = figure.subplots()
+    axes.barh(labels, [aggregate.netEarn for aggregate in occasions.values()])
+    axes.set_title(f'Net earn by occasion ({currency})')
+
+def plot_period_chart(figure, starts, sums, currency: str, period: str):
+    axes = figure.subplots()
+    # On a date axis only a handful of ticks are labelled, whatever the number of periods
+    axes.bar(starts, sums, width=PERIOD_DAYS[period] * 0.8, align='edge')
+    axes.set_title(f'Net earn by {period} ({currency})')
+    figure.autofmt_xdate()
+
+def format_group(group) -> str:
+    return '(none)' if group is None else str(group)
+
+def format_hourly(aggregate: SessionAggregate) -> str:
+    hourly = aggregate.get_hourly()
+    return 'no data' if hourly is None else f'{hourly:.2f}'
+
+def breakdown_table(headers: List[str], rows: List[List[str]]) -> str:
+    cells = lambda tag, row: ''.join(f'<{tag}>{html.escape(str(cell))}</{tag}>' for cell in row)
+    body = ''.join(f'<tr>{cells("td", row)}</tr>' for row in rows)
+    return f'<table><tr>{cells("th", headers)}</tr>{body}</table>'
+
+"""
+Renders the charts of one report into outputDirectory, with the Agg backend
+Runs in worker processes, so it must stay a module-level function
+Returns the paths written
+"""
+def render_report(data: ReportData, outputDirectory: str, formats: List[str],
+                  period: str=Bucket.MONTH) -> List[str]:
+    import matplotlib
+    from matplotlib.figure import Figure
+    from backend.aggregate import aggregate_sessions
+    from backend.timeseries import sum_by_bucket
+
+    occasions = aggregate_sessions(data.netEarns, data.lengths, data.occasions)
+    overall = aggregate_sessions(data.netEarns, data.lengths)[None]
+    starts, sums = sum_by_bucket(data.dates, data.netEarns, period)
+
+    # Figures are not attached to pyplot, so no display or global state is involved
+    charts = {}
+    for chartName, plot in (
+        ('cumulative', lambda figure: plot_cumulative_chart(figure, data)),
+        ('occasions', lambda figure: plot_occasion_chart(figure, occasions, data.currency)),
+        ('periods', lambda figure: plot_period_chart(figure, starts, sums, data.currency, period)),
+    ):
+        figure = Figure(figsize=CHART_SIZE, dpi=CHART_DPI)
+        plot(figure)
+        figure.subplots_adjust(**CHART_MARGINS)
+        charts[chartName] = figure
+
+    paths = []
+    with matplotlib.rc_context(CHART_STYLE):
+        for reportFormat in formats:
+            if reportFormat == ReportFormat.HTML:
+                path = os.path.join(outputDirectory, f'{data.name}.html')
+                with open(path, 'w') as f:
+                    f.write(render_html(data, charts, overall, occasions, starts, sums, period))
+                paths.append(path)
+                continue
+            for chartName, figure in charts.items():
+                path = os.path.join(outputDirectory, f'{data.name}-{chartName}.{reportFormat}')
+                figure.savefig(path, format=reportFormat)
+                paths.append(path)
+    return paths
+
+def render_html(data: ReportData, charts: Dict[str, Any], overall: SessionAggregate,
+                occasions: Dict[Any, SessionAggregate], starts, sums, period: str) -> str:
+    svgs = []
+    for figure in charts.values():
+        svg = io.StringIO()
+        figure.savefig(svg, format='svg')
+        # Drops the XML prolog, the SVG is inlined
+        svgs.append(svg.getvalue()[svg.getvalue().index('<svg'):])
+
+    aggregateRow = lambda name, a: [name, a.sessions, f'{a.netEarn:.2f}', f'{a.hours:.1f}', format_hourly(a)]
+    occasionTable = breakdown_table(
+        ['Occasion', 'Sessions', f'Net earn ({data.currency})', 'Hours', 'Hourly'],
+        [aggregateRow('Overall', overall)] +
+            [aggregateRow(format_group(occasion), a) for occasion, a in occasions.items()]
+    )
+    periodTable = breakdown_table(
+        [period.capitalize(), f'Net earn ({data.currency})'],
+        [[str(start), f'{total:.2f}'] for start, total in zip(starts, sums)]
+    )
+    title = html.escape(data.title)
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+        '<style>body{font-family:sans-serif} td,th{padding:2px 8px;text-align:right}</style></head><body>'
+        f'<h1>{title}</h1>{svgs[0]}<h2>By occasion</h2>{svgs[1]}{occasionTable}'
+        f'<h2>By {period}</h2>{svgs[2]}{periodTable}</body></html>'
+    )
+
+"""
+Renders every report, in worker processes if there are several and workers allows it
+Reports sharing a file name, such as those of games named alike, are given their own
+Returns the paths written, per report in the order given
+"""
+def render_reports(reports: List[ReportData], outputDirectory: str, formats: List[str],
+                   period: str=Bucket.MONTH, workers: int=None) -> List[List[str]]:
+    reports = make_names_unique(reports)
+    os.makedirs(outputDirectory, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(reports))
+    with stats.timer('report.render'):
+        if workers <= 1:
+            return [render_report(data, outputDirectory, formats, period) for data in reports]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(render_report, reports, [outputDirectory] * len(reports),
+                                 [formats] * len(reports), [period] * len(reports)))
+
+
+@click.command(help=
+    '''render reports without a display, for scheduled jobs
+       example: py report.py --format html --format png --by-occasion --output-dir reports
+    ''')
+@click.option('--game', 'gameNames', type=str, multiple=True, help='Game to report on, defaults to every game')
+@click.option('--format', 'formats', type=click.Choice(ReportFormat.ALL), multiple=True,
+              default=[ReportFormat.HTML], show_default=True)
+@click.option('--by-occasion', is_flag=True, help='Also report on each occasion of each game')
+@click.option('--period', type=click.Choice([Bucket.DAY, Bucket.WEEK, Bucket.MONTH]), default=Bucket.MONTH,
+              show_default=True, help='Period of the net earn breakdown')
+@click.option('--output-dir', 'outputDirectory', type=str, default='reports', show_default=True)
+@click.option('--workers', type=int, default=None, help='Rendering worker processes, defaults to CPU count')
+@click.option('--db', 'dbFileName', type=str, default=None, help='Database file, defaults to the Backend default')
+def report(gameNames, formats, by_occasion, period, outputDirectory, workers, dbFileName):
+    """CLI command to render reports"""
+    start = time.perf_counter()
+    # Every read shares one parsed copy of the database
+    backend = Backend(db=ConcurrentDatabase, dbFileName=dbFileName)
+    try:
+        reports = []
+        for gameName in gameNames or backend.get_all_games():
+            reports += load_report_data(backend, gameName, byOccasion=by_occasion)
+    finally:
+        backend.close()
+    if not reports:
+        print('No sessions to report on')
+        sys.exit(1)
+
+    for paths in render_reports(reports, outputDirectory, list(formats), period, workers):
+        for path in paths:
+            print(path)
+    print(f'{len(reports)} reports rendered in {time.perf_counter() - start:.2f}s')
+
+
+def main():
+    start_instrumentation_from_environment()
+    report()
+
+if __name__ == '__main__':
+    main()
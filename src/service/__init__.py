@@ -0,0 +1,17 @@
+# Local query service
+# Keeps one Backend resident so scripts skip startup and database parsing
+
+import importlib
+
+from .client import BackendClient, ServiceError, connect_to_service
+
+# The server pulls in http.server, which clients do not need
+LAZY_EXPORTS = {
+    'BackendServer': 'server',
+    'BackendRequestHandler': 'server',
+}
+
+def __getattr__(name: str):
+    if name not in LAZY_EXPORTS:
+        raise AttributeError(f'module {__name__} has no attribute {name}')
+    return getattr(importlib.import_module(f'.{LAZY_EXPORTS[name]}', __name__), name)
@@ -0,0 +1,32 @@
+import click
+
+from definitions import serviceHost, servicePort
+from instrumentation import start_instrumentation_from_environment
+
+from .server import BackendServer
+
+
+@click.command(help=
+    '''run the local query service, which keeps the database loaded for the CLI and plotting scripts
+       example: py -m service --port 8765
+    ''')
+@click.option('--host', type=str, default=serviceHost)
+@click.option('--port', type=int, default=servicePort)
+@click.option('--db', 'dbFileName', type=str, default=None, help='Database file, defaults to the Backend default')
+@click.option('--verbose', is_flag=True, help='Log every request')
+def serve(host, port, dbFileName, verbose):
+    """CLI command to run the query service"""
+    start_instrumentation_from_environment()
+    server = BackendServer(host, port, dbFileName=dbFileName, verbose=verbose)
+    server.backend.start_rate_refresher()
+    print(f'Serving on http://{host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve()
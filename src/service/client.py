@@ -0,0 +1,143 @@
+import http.client
+import json
+from typing import Any, Dict, List, Sequence
+from urllib.parse import quote
+
+from backend.aggregate import SessionAggregate
+from definitions import Game, Session, VisualizeFilters, Currencies, serviceHost, servicePort
+from database.json_database import schema_to_field_definitions
+
+from .protocol import encode_filters, decode_aggregates
+
+
+# How long connect_to_service waits for a running service to answer
+CONNECT_TIMEOUT = 0.5
+
+# Methods sent again on a new connection when the service dropped the old one
+# A dropped POST or DELETE may already have been applied, repeating it could apply it twice
+RETRIED_METHODS = ('GET',)
+
+
+class ServiceError(Exception):
+    pass
+
+
+"""
+    BackendClient talks to a running query service over one persistent HTTP connection
+    It offers the Backend methods the CLI and plotting scripts use, with the same return types
+    Invalid requests raise ValueError with the service's message
+
+    Attributes:
+    - host: str : Address of the service
+    - port: int : Port of the service
+    - timeout: float : Seconds to wait for a response
+"""
+class BackendClient:
+
+    def __init__(self, host: str=serviceHost, port: int=servicePort, timeout: float=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def close(self):
+        self.connection.close()
+
+    """
+    Sends a request over the persistent connection and returns the decoded response
+    Reconnects once if the service closed the idle connection, and resends RETRIED_METHODS only
+    """
+    def request(self, method: str, path: str, body: Dict[str, Any]=None) -> Dict[str, Any]:
+        encodedBody = json.dumps(body).encode() if body is not None else None
+        headers = { 'Content-Type': 'application/json' } if body is not None else {}
+        for attempt in range(2):
+            try:
+                self.connection.request(method, path, body=encodedBody, headers=headers)
+                response = self.connection.getresponse()
+                payload = json.loads(response.read() or b'{}')
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.connection.close()
+                if attempt or method not in RETRIED_METHODS:
+                    raise
+        if response.status == 400:
+            raise ValueError(payload.get('error'))
+        if response.status != 200:
+            raise ServiceError(f'{method} {path} failed with status {response.status}: {payload.get("error")}')
+        return payload
+
+    def game_path(self, gameName: str, *parts: str) -> str:
+        return '/'.join(['/games', quote(gameName, safe='')] + [quote(p, safe='') for p in parts])
+
+    def is_available(self) -> bool:
+        try:
+            self.request('GET', '/health')
+            return True
+        except (OSError, ServiceError):
+            self.connection.close()
+            return False
+
+    def get_all_games(self) -> List[str]:
+        return self.request('GET', '/games')['games']
+
+    def construct_game_from_db(self, gameName: str) -> Game:
+        return Game(gameName, schema_to_field_definitions(self.request('GET', self.game_path(gameName))['fields']))
+
+    def add_session(self, session: Session) -> str:
+        return self.request('POST', self.game_path(session.game.get_name(), 'sessions'), {
+            'values': session.get_values()
+        })['id']
+
+    def decode_sessions(self, gameName: str, payload: Dict[str, Any]) -> Dict[str, Session]:
+        game = Game(gameName, schema_to_field_definitions(payload['fields']))
+        return { _id: Session(game, values) for _id, values in payload['sessions'].items() }
+
+    def get_sessions(self, gameName: str, _filter: VisualizeFilters) -> Dict[str, Session]:
+        payload = self.request('POST', self.game_path(gameName, 'query'), { 'filters': encode_filters(_filter) })
+        return self.decode_sessions(gameName, payload)
+
+    def get_session_by_id(self, gameName: str, sessionId: str):
+        sessions = self.decode_sessions(gameName, self.request('GET', self.game_path(gameName, 'sessions', sessionId)))
+        return sessionId in sessions and sessions[sessionId]
+
+    def delete_session(self, gameName: str, sessionId: str):
+        return self.request('DELETE', self.game_path(gameName, 'sessions', sessionId))['deleted'] or None
+
+    def aggregate(self, gameName: str, groupBy: str=None, _filter: VisualizeFilters=None,
+                  target: str=Currencies.USD) -> Dict[Any, SessionAggregate]:
+        payload = self.request('POST', self.game_path(gameName, 'aggregate'), {
+            'groupBy': groupBy,
+            'filters': encode_filters(_filter),
+            'target': target,
+        })
+        return decode_aggregates(payload['groups'])
+
+    def convert(self, values: Sequence[float], currencies: Sequence[str],
+                target: str=Currencies.USD, dates: Sequence[str]=None) -> 'numpy.ndarray':
+        import numpy as np
+
+        payload = self.request('POST', '/convert', {
+            'values': [float(v) for v in values],
+            'currencies': list(currencies),
+            'target': target,
+            'dates': list(dates) if dates is not None else None,
+        })
+        return np.array(payload['values'], dtype=float)
+
+    # Stats of the service process, see instrumentation.Stats.to_dict
+    def get_stats(self) -> Dict[str, Any]:
+        return self.request('GET', '/stats')
+
+    def reset_stats(self):
+        self.request('DELETE', '/stats')
+
+
+# Returns a BackendClient if the query service is running, None otherwise
+def connect_to_service(host: str=serviceHost, port: int=servicePort) -> BackendClient:
+    client = BackendClient(host, port, timeout=CONNECT_TIMEOUT)
+    if not client.is_available():
+        return
+    client.connection.timeout = None
+    if client.connection.sock:
+        client.connection.sock.settimeout(None)
+    return client
@@ -0,0 +1,34 @@
+from typing import Any, Dict, List
+
+from backend.aggregate import SessionAggregate
+from definitions import FilterOperator, FilterCondition, VisualizeFilters
+
+
+"""
+JSON encoding of the values passed between BackendClient and the query service
+Filters: { field: [[operator value, operand, negate], ...] }
+Aggregates: [[group, [sessions, netEarn, timedNetEarn, hours]], ...], since groups may not be strings
+"""
+
+def encode_filters(_filter: VisualizeFilters) -> Dict[str, List[list]]:
+    if not _filter:
+        return None
+    return {
+        field: [[c.operator.value, c.operand, c.negate] for c in conditions]
+        for field, conditions in _filter.filters.items()
+    }
+
+# Raises ValueError on an unknown operator, TypeError on an operand the operator does not accept
+def decode_filters(encodedFilters: Dict[str, List[list]]) -> VisualizeFilters:
+    if not encodedFilters:
+        return None
+    return VisualizeFilters({
+        field: [FilterCondition(FilterOperator(operator), operand, negate) for operator, operand, negate in conditions]
+        for field, conditions in encodedFilters.items()
+    })
+
+def encode_aggregates(aggregates: Dict[Any, SessionAggregate]) -> List[list]:
+    return [[group, list(aggregate)] for group, aggregate in aggregates.items()]
+
+def decode_aggregates(encodedAggregates: List[list]) -> Dict[Any, SessionAggregate]:
+    return { group: SessionAggregate(*aggregate) for group, aggregate in encodedAggregates }
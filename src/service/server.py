@@ -0,0 +1,178 @@
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from backend import Backend
+from database import ConcurrentDatabase
+from definitions import Session, Currencies, serviceHost, servicePort
+from instrumentation import stats
+
+from .protocol import decode_filters, encode_aggregates
+
+
+"""
+    BackendRequestHandler answers one connection of the query service
+    Connections are kept alive between requests (HTTP/1.1), so clients pay for the TCP handshake once
+
+    Endpoints, request and response bodies are JSON:
+    GET    /health                           -> {}
+    GET    /games                            -> { games: [name] }
+    GET    /games/<game>                     -> { fields: schema }
+    POST   /games/<game>/sessions            { values } -> { id }
+    POST   /games/<game>/query               { filters } -> { fields: schema, sessions: { id: values } }
+    GET    /games/<game>/sessions/<id>       -> { fields: schema, sessions: { id: values } }
+    DELETE /games/<game>/sessions/<id>       -> { deleted }
+    POST   /games/<game>/aggregate           { groupBy, filters, target } -> { groups: encoded aggregates }
+    POST   /convert                          { values, currencies, target, dates } -> { values }
+    GET    /stats                            -> { enabled, counters, timers }, see instrumentation
+    DELETE /stats                            -> {}, resets the stats
+    Invalid requests are answered with status 400 and { error }
+    Failures of the service itself are answered with status 500 and { error }
+"""
+class BackendRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    ROUTES = [
+        ('GET', r'/health', 'get_health'),
+        ('GET', r'/games', 'get_games'),
+        ('GET', r'/games/([^/]+)', 'get_game'),
+        ('POST', r'/games/([^/]+)/sessions', 'add_session'),
+        ('POST', r'/games/([^/]+)/query', 'query_sessions'),
+        ('GET', r'/games/([^/]+)/sessions/([^/]+)', 'get_session'),
+        ('DELETE', r'/games/([^/]+)/sessions/([^/]+)', 'delete_session'),
+        ('POST', r'/games/([^/]+)/aggregate', 'aggregate'),
+        ('POST', r'/convert', 'convert'),
+        ('GET', r'/stats', 'get_stats'),
+        ('DELETE', r'/stats', 'reset_stats'),
+    ]
+
+    @property
+    def backend(self) -> Backend:
+        return self.server.backend
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method: str):
+        path = urlsplit(self.path).path
+        # Read even when the route is unknown, the connection is reused for the next request
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        for routeMethod, pattern, handlerName in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match and routeMethod == method:
+                try:
+                    args = [unquote(arg) for arg in match.groups()]
+                    self.send_json(200, getattr(self, handlerName)(self.decode_body(body), *args))
+                # Raised by the validation of definitions, database and backend
+                except (ValueError, TypeError) as e:
+                    self.send_json(400, { 'error': str(e) })
+                except Exception as e:
+                    self.send_json(500, { 'error': f'{type(e).__name__}: {e}' })
+                return
+        self.send_json(404, { 'error': f'no endpoint {method} {path}' })
+
+    def decode_body(self, body: bytes) -> dict:
+        decoded = json.loads(body or '{}')
+        if not isinstance(decoded, dict):
+            raise ValueError('request body must be a JSON object')
+        return decoded
+
+    # Returns body[key], a request without it is invalid
+    def require(self, body: dict, key: str):
+        if key not in body:
+            raise ValueError(f'request body is missing {key}')
+        return body[key]
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def get_health(self, body):
+        return {}
+
+    def get_stats(self, body):
+        return dict(stats.to_dict(), enabled=stats.enabled)
+
+    def reset_stats(self, body):
+        stats.reset()
+        return {}
+
+    def get_games(self, body):
+        return { 'games': self.backend.get_all_games() }
+
+    def get_game(self, body, gameName):
+        return { 'fields': self.backend.construct_game_from_db(gameName).all_fields_as_dict() }
+
+    def add_session(self, body, gameName):
+        game = self.backend.construct_game_from_db(gameName)
+        return { 'id': self.backend.add_session(Session(game, self.require(body, 'values'))) }
+
+    def query_sessions(self, body, gameName):
+        sessions = self.backend.get_sessions(gameName, decode_filters(body.get('filters')))
+        return {
+            'fields': self.backend.construct_game_from_db(gameName).all_fields_as_dict(),
+            'sessions': { _id: session.get_values() for _id, session in sessions.items() },
+        }
+
+    def get_session(self, body, gameName, sessionId):
+        session = self.backend.get_session_by_id(gameName, sessionId)
+        return {
+            'fields': self.backend.construct_game_from_db(gameName).all_fields_as_dict(),
+            'sessions': { sessionId: session.get_values() } if session else {},
+        }
+
+    def delete_session(self, body, gameName, sessionId):
+        return { 'deleted': bool(self.backend.delete_session(gameName, sessionId)) }
+
+    def aggregate(self, body, gameName):
+        aggregates = self.backend.aggregate(
+            gameName,
+            groupBy=body.get('groupBy'),
+            _filter=decode_filters(body.get('filters')),
+            target=body.get('target') or Currencies.USD
+        )
+        return { 'groups': encode_aggregates(aggregates) }
+
+    def convert(self, body):
+        converted = self.backend.convert(self.require(body, 'values'), self.require(body, 'currencies'), body.get('target') or Currencies.USD,
+                                         body.get('dates'))
+        return { 'values': converted.tolist() }
+
+
+"""
+    BackendServer keeps one Backend, and the database it has parsed, resident for all clients
+    Each connection is served on its own thread, the Backend is shared through a ConcurrentDatabase
+
+    Attributes:
+    - backend: Backend : The shared Backend
+    - verbose: bool : Whether requests are logged
+"""
+class BackendServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, host: str=serviceHost, port: int=servicePort, dbFileName: str=None,
+                 backend: Backend=None, verbose: bool=False):
+        self.backend = backend or Backend(db=ConcurrentDatabase, dbFileName=dbFileName)
+        self.verbose = verbose
+        super().__init__((host, port), BackendRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.backend.close()
@@ -0,0 +1,149 @@
+import unittest
+import os
+
+import numpy as np
+
+from backend import Backend, ANALYTICS_CACHE_SIZE
+from backend.analytics import build_session_series, compute_trends, filter_cache_key
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator
+from instrumentation import stats
+
+
+test_filename = 'test_filename.json'
+
+class TestTrends(unittest.TestCase):
+
+    def setUp(self):
+        # Given out of date order and in every DATE format, the undated session is left out
+        self.series = build_session_series(
+            ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
+            ['2021-03-01', '2021-03-02', '2021/03/02', '2021-3-8', None, '2021/3/10', '2021-02-26'],
+            [10, -5, -20, 30, 99, -1, 40],
+            [2, None, 1, 3, 1, None, 4],
+        )
+        self.trends = compute_trends(self.series, sessionWindow=2, dayWindow=7)
+
+    # Test Case: sessions are sorted by date, same-day sessions keep their order
+    def test_build_session_series(self):
+        self.assertEqual(self.series.ids, ['g', 'a', 'b', 'c', 'd', 'f'])
+        self.assertEqual(self.series.netEarns.tolist(), [40, 10, -5, -20, 30, -1])
+        self.assertTrue(np.isnan(self.series.lengths[2]))
+
+    # Test Case: net earn, sessions and hours per day, week and month
+    def test_buckets(self):
+        self.assertEqual(self.trends.cumulative.tolist(), [40, 50, 45, 25, 55, 54])
+        self.assertEqual(self.trends.daily.netEarn.tolist(), [40, 10, -25, 30, -1])
+        self.assertEqual([str(s) for s in self.trends.weekly.starts], ['2021-02-22', '2021-03-01', '2021-03-08'])
+        self.assertEqual(self.trends.weekly.sessions.tolist(), [1, 3, 2])
+        self.assertEqual(self.trends.monthly.netEarn.tolist(), [40, 14])
+        self.assertEqual(self.trends.monthly.hours.tolist(), [4, 6])
+
+    # Test Case: rolling windows over the last 2 sessions
+    def test_rolling_sessions(self):
+        window = self.trends.rollingSessions
+        self.assertEqual(window.netEarn.tolist(), [40, 50, 5, -25, 10, 29])
+        self.assertEqual(window.winRate.tolist(), [1, 1, 0.5, 0, 0.5, 0.5])
+        # Sessions without a length are left out of the hourly rate
+        self.assertEqual(window.hourly.tolist(), [10, 50 / 6, 5, -20, 10 / 4, 10])
+        # A window without recorded hours has no hourly rate
+        self.assertTrue(np.isnan(compute_trends(self.series, sessionWindow=1).rollingSessions.hourly[2]))
+
+    # Test Case: rolling windows over the last 7 days, the session's day included
+    def test_rolling_days(self):
+        window = self.trends.rollingDays
+        # 2021-03-08 spans 2021-03-02 to 2021-03-08, 2021-03-10 spans 2021-03-04 to 2021-03-10
+        self.assertEqual(window.netEarn.tolist(), [40, 50, 45, 25, 5, 29])
+        self.assertAlmostEqual(window.winRate[4], 1 / 3)
+
+    # Test Case: max drawdown and longest losing streak
+    def test_drawdown_and_streak(self):
+        self.assertEqual(self.trends.maxDrawdown.amount, 25)
+        self.assertEqual(self.trends.maxDrawdown.peakDate, '2021-03-01')
+        self.assertEqual(self.trends.maxDrawdown.troughDate, '2021-03-02')
+        self.assertEqual(tuple(self.trends.longestLosingStreak), (2, '2021-03-02', '2021-03-02'))
+
+    # Test Case: no sessions, no windows
+    def test_empty(self):
+        trends = compute_trends(build_session_series([], [], [], []))
+        self.assertEqual(len(trends.cumulative), 0)
+        self.assertEqual(trends.maxDrawdown.amount, 0)
+        self.assertEqual(trends.longestLosingStreak.sessions, 0)
+        with self.assertRaises(ValueError):
+            compute_trends(self.series, sessionWindow=0)
+
+    # Test Case: equal filters share a cache key
+    def test_filter_cache_key(self):
+        makeFilter = lambda operand: VisualizeFilters({
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, operand)]
+        })
+        self.assertEqual(filter_cache_key(makeFilter(1)), filter_cache_key(makeFilter(1)))
+        self.assertNotEqual(filter_cache_key(makeFilter(1)), filter_cache_key(makeFilter(2)))
+        self.assertEqual(filter_cache_key(None), '')
+
+
+class TestBackendTrends(unittest.TestCase):
+
+    def setUp(self):
+        self.wasEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.backend.cache_exchange_rate(6.5)
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(DefaultFieldNames.LENGTH, FieldType.NUMBER),
+        ])
+        for netEarn, date in ((10, '2021-01-01'), (-20, '2021-01-02')):
+            self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: netEarn, DefaultFieldNames.DATE: date }))
+
+    def tearDown(self):
+        stats.enabled = self.wasEnabled
+        stats.reset()
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: trends are cached until the table changes
+    def test_get_trends_cached(self):
+        trends = self.backend.get_trends(GameName.TEXAS_HOLDEM)
+        self.assertIs(self.backend.get_trends(GameName.TEXAS_HOLDEM), trends)
+        self.assertEqual(stats.get_counters()['backend.analytics_cache_hits'], 1)
+
+        self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: 5, DefaultFieldNames.DATE: '2021-01-03' }))
+        trends = self.backend.get_trends(GameName.TEXAS_HOLDEM)
+        self.assertEqual(trends.cumulative.tolist(), [10, -10, -5])
+        self.assertEqual(trends.maxDrawdown.amount, 20)
+
+    # Test Case: writes to other games keep the cache, exchange rate changes drop it
+    def test_get_trends_other_tables(self):
+        trends = self.backend.get_trends(GameName.TEXAS_HOLDEM)
+        plo = self.backend.add_game(GameName.PLO, [])
+        self.backend.add_session(Session(plo, { DefaultFieldNames.NET_EARN: 1 }))
+        self.assertIs(self.backend.get_trends(GameName.TEXAS_HOLDEM), trends)
+        self.backend.cache_exchange_rate(7.0)
+        self.assertIsNot(self.backend.get_trends(GameName.TEXAS_HOLDEM), trends)
+
+    # Test Case: each game keeps only the results used last
+    def test_cache_size(self):
+        compute = lambda: object()
+        first = self.backend.get_cached_analytics(GameName.TEXAS_HOLDEM, 0, compute)
+        for key in range(1, ANALYTICS_CACHE_SIZE + 1):
+            self.backend.get_cached_analytics(GameName.TEXAS_HOLDEM, key, compute)
+        self.assertEqual(len(self.backend.analyticsCache[GameName.TEXAS_HOLDEM][1]), ANALYTICS_CACHE_SIZE)
+        self.assertIsNot(self.backend.get_cached_analytics(GameName.TEXAS_HOLDEM, 0, compute), first)
+        # Adding 0 again dropped 1, the least recently used
+        last = self.backend.get_cached_analytics(GameName.TEXAS_HOLDEM, ANALYTICS_CACHE_SIZE, compute)
+        self.assertIs(self.backend.get_cached_analytics(GameName.TEXAS_HOLDEM, ANALYTICS_CACHE_SIZE, compute), last)
+        self.assertNotIn(1, self.backend.analyticsCache[GameName.TEXAS_HOLDEM][1])
+
+    # Test Case: filters and windows are part of the cache key
+    def test_get_trends_parameters(self):
+        _filter = VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)] })
+        self.assertEqual(self.backend.get_trends(GameName.TEXAS_HOLDEM, _filter).cumulative.tolist(), [10])
+        self.assertEqual(len(self.backend.get_trends(GameName.TEXAS_HOLDEM).cumulative), 2)
+        self.assertEqual(self.backend.get_trends(GameName.TEXAS_HOLDEM, sessionWindow=1).rollingSessions.netEarn.tolist(), [10, -20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+import os
+
+from backend import Backend
+from backend.async_backend import AsyncBackend
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames
+
+
+test_filename = 'test_filename.json'
+
+# Counts database writes and rate lookups
+class CountingBackend(Backend):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = 0
+        self.rateLookups = 0
+
+    def add_sessions(self, sessions):
+        self.writes += 1
+        return super().add_sessions(sessions)
+
+    def get_rmb_conversion_rate(self):
+        self.rateLookups += 1
+        return super().get_rmb_conversion_rate()
+
+
+class TestAsyncBackend(unittest.TestCase):
+
+    def setUp(self):
+        backend = CountingBackend(dbFileName=test_filename)
+        backend.reset_database()
+        backend.cache_exchange_rate(6.4)
+        self.game = backend.add_game(GameName.PLO, [
+            FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True)
+        ])
+        self.asyncBackend = AsyncBackend(backend)
+
+    def tearDown(self):
+        os.remove(test_filename)
+
+    # Test Case: sessions awaited together should be written together
+    def test_add_sessions_coalesced(self):
+        async def add_all():
+            sessionIds = await asyncio.gather(*[
+                self.asyncBackend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: i })) for i in range(10)
+            ])
+            sessions = await self.asyncBackend.get_sessions(GameName.PLO, _filter=None)
+            await self.asyncBackend.close()
+            return sessionIds, sessions
+
+        sessionIds, sessions = asyncio.run(add_all())
+        self.assertEqual(self.asyncBackend.backend.writes, 1)
+        self.assertCountEqual(sessions, sessionIds)
+        self.assertEqual([sessions[_id].get_values()[DefaultFieldNames.NET_EARN] for _id in sessionIds], list(range(10)))
+
+    # Test Case: an invalid session should fail alone
+    def test_add_invalid_session(self):
+        otherGame = self.asyncBackend.backend.construct_game_from_db(GameName.PLO)
+        invalidSession = Session(otherGame, { DefaultFieldNames.NET_EARN: 1 })
+        invalidSession.fieldValues = { DefaultFieldNames.NOTE: 'no net earn' }
+
+        async def add_all():
+            return await asyncio.gather(
+                self.asyncBackend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: 1 })),
+                self.asyncBackend.add_session(invalidSession),
+                return_exceptions=True
+            )
+
+        validId, error = asyncio.run(add_all())
+        self.assertIsInstance(error, ValueError)
+        self.assertCountEqual(self.asyncBackend.backend.get_sessions(GameName.PLO, _filter=None), [validId])
+
+    # Test Case: concurrent rate lookups should share one lookup, aggregates use the cached rates
+    def test_rate_lookup_shared(self):
+        async def lookup_all():
+            rates = await asyncio.gather(*[self.asyncBackend.get_rmb_conversion_rate() for _ in range(5)])
+            aggregates = await self.asyncBackend.aggregate(GameName.PLO)
+            return rates, aggregates
+
+        rates, aggregates = asyncio.run(lookup_all())
+        self.assertEqual(rates, [6.4] * 5)
+        self.assertEqual(self.asyncBackend.backend.rateLookups, 1)
+        self.assertEqual(aggregates, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,18 @@
 import unittest
 import os
 import datetime
+import threading
 
-from backend import Backend
+import numpy as np
+
+from backend import Backend, ConversionRateRefresher, ExportFormat, ID_COLUMN, RMB_CONVERSION_RATE_ID, read_npz_export
+from backend.export import pyarrow
 from definitions import Game, Session, \
     FilterOperator, FilterCondition, VisualizeFilters, \
     FieldDefinition, DatabaseKeys, FieldType, GameName, \
-    DefaultFieldNames, ConversionRateFieldNames, \
+    DefaultFieldNames, CustomFieldNames, ConversionRateFieldNames, Currencies, \
     DEFAULT_RMB_EXCHANGE_RATE
+from instrumentation import stats
 
 
 test_filename = 'test_filename.json'
@@ -46,6 +51,33 @@ class TestGameAPI(BackendTests):
         # backend.add_game fails if Game is already present in db
         self.assertFalse(self.backend.add_game(GameName.TEXAS_HOLDEM, []))
 
+    # Test Case: backend.alter_game changes the schema, stored sessions are upgraded when read
+    def test_alter_game(self):
+        self.backend.reset_database()
+        game = self.backend.add_game(GameName.PLO, [FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT)])
+        sessionId = self.backend.add_session(Session(game, {
+            DefaultFieldNames.NET_EARN: 10, CustomFieldNames.OCCASION: '3',
+        }))
+
+        game = self.backend.alter_game(
+            GameName.PLO, add=[FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT, required=True)],
+            retype={ CustomFieldNames.OCCASION: FieldType.NUMBER }, defaults={ CustomFieldNames.CURRENCY: Currencies.USD }
+        )
+        self.assertEqual(game.find_field_definition_by_name(CustomFieldNames.OCCASION)[1].get_field_type(), FieldType.NUMBER)
+        self.assertEqual(self.backend.get_session_by_id(GameName.PLO, sessionId).get_values(), {
+            DefaultFieldNames.NET_EARN: 10, CustomFieldNames.OCCASION: 3, CustomFieldNames.CURRENCY: Currencies.USD,
+        })
+
+        # Edited sessions are stored at the new schema
+        self.backend.edit_session(GameName.PLO, sessionId, { DefaultFieldNames.NET_EARN: 20 })
+        storedRow = self.backend.db.read_data_to_memory()[GameName.PLO][DatabaseKeys.ROWS_KEY][sessionId]
+        self.assertEqual(storedRow[CustomFieldNames.CURRENCY], Currencies.USD)
+
+        self.backend.alter_game(GameName.PLO, drop=[CustomFieldNames.OCCASION])
+        self.assertNotIn(CustomFieldNames.OCCASION, self.backend.get_session_by_id(GameName.PLO, sessionId).get_values())
+        with self.assertRaises(ValueError):
+            self.backend.alter_game(GameName.PLO, drop=[DefaultFieldNames.NET_EARN])
+
     # Test Case: backend.get_all_games
     def test_get_all_games(self):
 
@@ -81,6 +113,32 @@ class TestSessionAPI(BackendTests):
         }
         self.assertDictEqual(self.backend.db.get_all_rows(self.game.get_name()), expectedAllRows)
 
+    # Test Case: backend.add_session_values
+    def test_add_session_values(self):
+        rows = [
+            { DefaultFieldNames.NET_EARN: '5' },
+            { DefaultFieldNames.NET_EARN: 'five' },
+            { DefaultFieldNames.LENGTH: 1 },
+            { DefaultFieldNames.NET_EARN: 6, DefaultFieldNames.DATE: '2022/01/01' },
+        ]
+
+        # Should validate in worker processes and report errors by original index
+        sessionIds, errors = self.backend.add_session_values(self.game.get_name(), rows, workers=2, parallelMinRows=1)
+        self.assertEqual([e.index for e in errors], [1, 2])
+        self.assertIsNone(sessionIds[1])
+        self.assertIsNone(sessionIds[2])
+
+        # Should insert valid rows, parsed into their field types
+        allRows = self.backend.db.get_all_rows(self.game.get_name())
+        self.assertEqual(len(allRows), 5)
+        self.assertDictEqual(allRows[sessionIds[0]], { DefaultFieldNames.NET_EARN: 5.0 })
+        self.assertDictEqual(allRows[sessionIds[3]], { DefaultFieldNames.NET_EARN: 6, DefaultFieldNames.DATE: '2022/01/01' })
+
+        # Should give the same result in-process
+        sessionIds, errors = self.backend.add_session_values(self.game.get_name(), rows, workers=1)
+        self.assertEqual([e.index for e in errors], [1, 2])
+        self.assertEqual(len(self.backend.db.get_all_rows(self.game.get_name())), 7)
+
     # Test Case: backend.get_sessions without filter conditions
     # Should return all sessions
     def test_get_sessions_without_filters(self):
@@ -106,6 +164,16 @@ class TestSessionAPI(BackendTests):
         for _id, actualSession in self.backend.get_sessions(self.game.get_name(), _filter=_filter).items():
             self.assertTrue(actualSession.equals(expectedSessions[_id]))
 
+    # Test Case: backend.explain
+    def test_explain(self):
+        _filter = VisualizeFilters({
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, -1)]
+        })
+        plan = self.backend.explain(self.game.get_name(), _filter, analyze=True)
+        self.assertEqual(plan.rows, 3)
+        self.assertEqual(plan.rowsReturned, 2)
+        self.assertEqual([(stage.rowsIn, stage.rowsOut) for stage in plan.stages], [(3, 2)])
+
 
     # Test Case: backend.get_session_by_id
     def test_get_session_by_id(self):
@@ -173,6 +241,80 @@ class TestSessionAPI(BackendTests):
         self.assertFalse(self.backend.delete_session(self.game.get_name(), 'bad id'))
 
 
+# backend.export
+class TestExport(BackendTests):
+
+    def setUp(self):
+        self.backend.reset_database()
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT),
+            FieldDefinition(CustomFieldNames.PEOPLE, FieldType.LIST)
+        ])
+        self.uuids = self.backend.add_sessions([
+            Session(self.game, { DefaultFieldNames.NET_EARN: 10, DefaultFieldNames.DATE: '2022-01-01',
+                CustomFieldNames.OCCASION: 'Home', CustomFieldNames.PEOPLE: ['alan', 'bella'] }),
+            Session(self.game, { DefaultFieldNames.NET_EARN: -5, CustomFieldNames.OCCASION: 'Casino' }),
+            Session(self.game, { DefaultFieldNames.NET_EARN: 3, DefaultFieldNames.DATE: '2022/1/3',
+                CustomFieldNames.OCCASION: 'Home', CustomFieldNames.PEOPLE: ['bella'] }),
+        ])
+        self.exportFilename = None
+
+    def tearDown(self):
+        if self.exportFilename and os.path.exists(self.exportFilename):
+            os.remove(self.exportFilename)
+
+    # Test Case: should export dictionary-encoded columns to npz
+    def test_export_npz(self):
+        self.exportFilename = 'test_export.npz'
+        exported = self.backend.export(self.game.get_name(), self.exportFilename)
+        self.assertEqual(exported, 3)
+
+        columns = read_npz_export(self.exportFilename)
+        self.assertEqual(list(columns), [ID_COLUMN] + list(self.game.all_fields_as_dict()))
+        self.assertEqual(list(columns[ID_COLUMN]), self.uuids)
+        self.assertEqual(list(columns[DefaultFieldNames.NET_EARN]), [10, -5, 3])
+        self.assertEqual(columns[DefaultFieldNames.DATE].dtype, 'datetime64[D]')
+        self.assertEqual(str(columns[DefaultFieldNames.DATE][2]), '2022-01-03')
+        self.assertEqual(list(columns[CustomFieldNames.OCCASION]), ['Home', 'Casino', 'Home'])
+        self.assertEqual(list(columns[DefaultFieldNames.NOTE]), [None, None, None])
+        self.assertEqual(list(columns[CustomFieldNames.PEOPLE]), [['alan', 'bella'], None, ['bella']])
+
+        # TEXT values are stored once per distinct value
+        with np.load(self.exportFilename) as npz:
+            self.assertEqual(list(npz[CustomFieldNames.OCCASION + '.categories']), ['Home', 'Casino'])
+
+    # Test Case: should export selected columns of filtered sessions to CSV
+    def test_export_csv(self):
+        self.exportFilename = 'test_export.csv'
+        _filter = VisualizeFilters({
+            CustomFieldNames.OCCASION: [FilterCondition(FilterOperator.EQUAL, 'Home')]
+        })
+        exported = self.backend.export(self.game.get_name(), self.exportFilename, format=ExportFormat.CSV,
+            _filter=_filter, columns=[DefaultFieldNames.NET_EARN, CustomFieldNames.PEOPLE])
+        self.assertEqual(exported, 2)
+        with open(self.exportFilename) as f:
+            self.assertEqual(f.read().splitlines(), [
+                f'{DefaultFieldNames.NET_EARN},{CustomFieldNames.PEOPLE}',
+                '10.0,"alan,bella"',
+                '3.0,bella',
+            ])
+
+        # Should reject unknown columns
+        self.assertRaises(ValueError, self.backend.export, self.game.get_name(), self.exportFilename,
+            columns=['STAKES'])
+
+    # Test Case: should export to Parquet when pyarrow is installed
+    @unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+    def test_export_parquet(self):
+        self.exportFilename = 'test_export.parquet'
+        self.backend.export(self.game.get_name(), self.exportFilename)
+        table = pyarrow.parquet.read_table(self.exportFilename)
+        self.assertEqual(table.column(DefaultFieldNames.NET_EARN).to_pylist(), [10, -5, 3])
+        self.assertEqual(table.column(CustomFieldNames.OCCASION).to_pylist(), ['Home', 'Casino', 'Home'])
+        self.assertEqual(table.column(CustomFieldNames.PEOPLE).to_pylist(), [['alan', 'bella'], None, ['bella']])
+        self.assertEqual(table.column(DefaultFieldNames.DATE).to_pylist()[1], None)
+
+
 # backend.get_rmb_conversion_rate
 class TestGetRMBConversionRate(BackendTests):
 
@@ -221,6 +363,27 @@ class TestGetRMBConversionRate(BackendTests):
         # Test the main function which calls helper function
         self.assertEqual(self.backend.get_rmb_conversion_rate(), 0.001)
 
+    # Test Case: caching a rate should replace the cached one in a single write
+    def test_cache_exchange_rate(self):
+        # Cached under a random id, as by earlier versions
+        self.backend.db.insert_row(ConversionRateFieldNames.RMB_CONVERSION_RATE, {
+            ConversionRateFieldNames.RATE: 0.001,
+            ConversionRateFieldNames.COLLECTION_TIME: str(datetime.date.today())
+        })
+        self.backend.cache_exchange_rate(6.5)
+        self.assertEqual(list(self.backend.db.get_all_rows(ConversionRateFieldNames.RMB_CONVERSION_RATE)), [RMB_CONVERSION_RATE_ID])
+
+        wasEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        try:
+            self.backend.cache_exchange_rate(7.0)
+            self.assertEqual(stats.get_counters()['database.file_writes'], 1)
+        finally:
+            stats.enabled = wasEnabled
+            stats.reset()
+        self.assertEqual(self.backend.get_conversion_rate_from_cache(), 7.0)
+
     # Test Case: should use conversion rate from URL if cache is expired or missing
     # Number of API calls allowed is limited per month. Do not run until shipping new version
     # def test_get_rate_from_url(self):
@@ -237,3 +400,177 @@ class TestGetRMBConversionRate(BackendTests):
 
     #     # Should cache the updated rate
     #     self.assertEqual(rate, self.backend.get_conversion_rate_from_cache())
+
+
+# backend.convert
+class TestConvert(BackendTests):
+
+    def setUp(self):
+        self.backend.reset_database()
+        self.backend.cache_exchange_rate(6.4)
+
+    # Test Case: should fall back to the cached USD/RMB rate without rate vectors
+    def test_convert_without_rate_vectors(self):
+        converted = self.backend.convert([64, 10, 5], ['RMB', Currencies.USD, None], Currencies.USD)
+        self.assertEqual(list(converted), [10, 10, 5])
+        self.assertRaises(ValueError, self.backend.convert, [1], ['JPY'], Currencies.USD)
+
+    # Test Case: should convert mixed currencies using the rate vector of each date
+    def test_convert_with_rate_vectors(self):
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 6.0, 'JPY': 100.0 },
+            base=Currencies.USD, collectionDate=datetime.date(2022, 1, 1))
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 2.0, Currencies.CNY: 12.0, Currencies.EUR: 1.0 },
+            base=Currencies.EUR, collectionDate=datetime.date(2022, 2, 1))
+
+        # Game tables are unaffected by rate vector caching
+        self.assertEqual(self.backend.get_all_games(), [])
+
+        converted = self.backend.convert(
+            [60, 120, 200, 300, 4],
+            ['RMB', Currencies.CNY, 'JPY', 'JPY', Currencies.EUR],
+            Currencies.USD,
+            ['2022-01-15', '2022-02-01', '2021-06-01', None, '2022-01-01']
+        )
+        # JPY is missing from the later vector and carries over from the earlier one
+        # EUR is missing from the earlier vector and is taken from the later one
+        self.assertEqual(list(converted), [10, 20, 2, 3, 8])
+
+        # Re-caching a date replaces its vector
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 5.0 },
+            base=Currencies.USD, collectionDate=datetime.date(2022, 1, 1))
+        self.assertEqual(list(self.backend.convert([50], [Currencies.CNY], Currencies.USD, ['2022-01-02'])), [10])
+
+    # Test Case: should convert sessions dated in any format a DATE field accepts
+    def test_convert_date_formats(self):
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 6.0 },
+            base=Currencies.USD, collectionDate=datetime.date(2022, 1, 1))
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 12.0 },
+            base=Currencies.USD, collectionDate=datetime.date(2022, 1, 6))
+        self.assertEqual(list(self.backend.convert([1.0], [Currencies.USD], Currencies.USD, ['2022/01/05'])), [1.0])
+        converted = self.backend.convert([60, 60, 60], ['RMB'] * 3, Currencies.USD, ['2022/01/05', '2022-1-6', None])
+        self.assertEqual(list(converted), [10, 5, 5])
+
+    # Test Case: should convert with expired cached rates, without asking the API
+    def test_convert_with_expired_rates(self):
+        def offline():
+            raise OSError('offline')
+        self.backend.get_rmb_conversion_rate = offline
+        self.addCleanup(delattr, self.backend, 'get_rmb_conversion_rate')
+
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        self.backend.cache_exchange_rate(6.4, collectionDate=yesterday)
+        self.assertEqual(list(self.backend.convert([64], ['RMB'], Currencies.USD)), [10])
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 6.0 }, base=Currencies.USD, collectionDate=yesterday)
+        self.assertEqual(list(self.backend.convert([60], ['RMB'], Currencies.USD)), [10])
+
+    # Test Case: rate vectors without a currency in common cannot be converted between
+    def test_convert_without_shared_currency(self):
+        self.backend.cache_exchange_rates(
+            { Currencies.USD: 1.0, Currencies.CNY: 6.0 },
+            base=Currencies.USD, collectionDate=datetime.date(2022, 1, 1))
+        self.backend.cache_exchange_rates(
+            { Currencies.EUR: 1.0, 'JPY': 130.0 },
+            base=Currencies.EUR, collectionDate=datetime.date(2022, 2, 1))
+        self.assertRaises(ValueError, self.backend.convert, [60], ['RMB'], Currencies.USD)
+
+    # Test Case: aggregate should sum converted net earns and recorded hours per group
+    def test_aggregate(self):
+        game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True),
+            FieldDefinition(DefaultFieldNames.LENGTH, FieldType.NUMBER),
+            FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT),
+            FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT),
+            FieldDefinition(DefaultFieldNames.TAGS, FieldType.LIST),
+        ])
+        self.backend.add_sessions([
+            Session(game, { DefaultFieldNames.NET_EARN: 64, CustomFieldNames.CURRENCY: 'RMB', CustomFieldNames.OCCASION: 'home', DefaultFieldNames.LENGTH: 2 }),
+            Session(game, { DefaultFieldNames.NET_EARN: 5, CustomFieldNames.OCCASION: 'casino', DefaultFieldNames.LENGTH: 1 }),
+            Session(game, { DefaultFieldNames.NET_EARN: -3, CustomFieldNames.OCCASION: 'home' }),
+        ])
+
+        overall = self.backend.aggregate(GameName.TEXAS_HOLDEM)[None]
+        self.assertEqual(tuple(overall), (3, 12, 15, 3))
+        self.assertEqual(overall.get_hourly(), 5)
+
+        byOccasion = self.backend.aggregate(GameName.TEXAS_HOLDEM, groupBy=CustomFieldNames.OCCASION)
+        self.assertEqual(tuple(byOccasion['home']), (2, 7, 10, 2))
+        self.assertEqual(tuple(byOccasion['casino']), (1, 5, 5, 1))
+
+        self.assertRaises(ValueError, self.backend.aggregate, GameName.TEXAS_HOLDEM, groupBy=DefaultFieldNames.TAGS)
+        filters = VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 100)] })
+        self.assertEqual(self.backend.aggregate(GameName.TEXAS_HOLDEM, _filter=filters), {})
+
+
+# A Backend whose exchange rate API is replaced by a gate the test controls
+class GatedRateBackend(Backend):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apiGate = threading.Event()
+        self.apiRate = 7.0
+
+    def get_conversion_rate_from_api(self):
+        self.apiGate.wait(5)
+        return self.apiRate
+
+
+# backend.start_rate_refresher
+class TestConversionRateRefresher(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = GatedRateBackend(dbFileName=test_filename)
+        self.backend.reset_database()
+
+    def tearDown(self):
+        self.backend.apiGate.set()
+        self.backend.stop_rate_refresher()
+        os.remove(test_filename)
+
+    # Test Case: should serve the last known rate while a refresh is in flight
+    def test_serve_last_known_rate(self):
+
+        # Mock an expired conversion rate cache in DB
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        self.backend.cache_exchange_rate(0.001, collectionDate=yesterday)
+        self.assertIsNone(self.backend.get_conversion_rate_from_cache())
+
+        # API call is blocked, the stale rate is served without waiting
+        refresher = self.backend.start_rate_refresher()
+        self.assertEqual(self.backend.get_rmb_conversion_rate(), 0.001)
+        self.assertFalse(refresher.wait_for_refresh(timeout=0.05))
+
+        # Once the API responds, the new rate is served and cached
+        self.backend.apiGate.set()
+        self.assertTrue(refresher.wait_for_refresh(timeout=5))
+        self.assertEqual(self.backend.get_rmb_conversion_rate(), 7.0)
+        self.assertEqual(self.backend.get_conversion_rate_from_cache(), 7.0)
+
+    # Test Case: should pre-fetch the rate ahead of cache expiry
+    def test_get_next_refresh(self):
+        leadTime = datetime.timedelta(minutes=10)
+        now = datetime.datetime.combine(datetime.date.today(), datetime.time(12))
+        tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+
+        # Missing cache should be refreshed immediately for today
+        refresher = ConversionRateRefresher(self.backend, leadTime=leadTime)
+        self.assertEqual(refresher.get_next_refresh(now), (now, now.date()))
+
+        # Valid cache should be refreshed shortly before midnight, for tomorrow
+        self.backend.cache_exchange_rate(6.5)
+        refresher = ConversionRateRefresher(self.backend, leadTime=leadTime)
+        self.assertEqual(refresher.get_rate(), 6.5)
+        self.assertEqual(refresher.get_next_refresh(now), (
+            datetime.datetime.combine(tomorrow, datetime.time.min) - leadTime,
+            tomorrow
+        ))
+
+        # A pre-fetched rate is valid through the day it was cached for
+        self.backend.apiGate.set()
+        self.assertTrue(refresher.refresh(tomorrow))
+        self.assertEqual(self.backend.get_conversion_rate_from_cache(), 7.0)
@@ -0,0 +1,147 @@
+import concurrent.futures
+import unittest
+import os
+
+import numpy as np
+
+from backend import Backend
+from backend.bankroll import compute_bankroll_stats, compute_grouped_bankroll_stats, bootstrap_totals
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, CustomFieldNames
+from instrumentation import stats
+
+
+test_filename = 'test_filename.json'
+
+class TestBankrollStats(unittest.TestCase):
+
+    def setUp(self):
+        self.netEarns = [10, -20, 30, 40, -5, 15]
+        self.lengths = [2, 4, None, 3, 1, float('nan')]
+
+    # Test Case: variance per session and standard deviation per hour
+    def test_spread(self):
+        result = compute_bankroll_stats(self.netEarns, self.lengths, resamples=200)
+        self.assertEqual(result.sessions, 6)
+        self.assertEqual(result.netEarn, 70)
+        self.assertAlmostEqual(result.variancePerSession, np.var(self.netEarns, ddof=1))
+        self.assertAlmostEqual(result.stdPerSession, np.std(self.netEarns, ddof=1))
+        # Only the sessions with a length count towards hours
+        self.assertEqual(result.hours, 10)
+        self.assertEqual(result.hourly.estimate, 2.5)
+        residuals = np.array([10 - 5, -20 - 10, 40 - 7.5, -5 - 2.5])
+        self.assertAlmostEqual(result.stdPerHour, np.sqrt((residuals ** 2).sum() / 10))
+
+    # Test Case: intervals contain the estimate and are reproducible from the seed
+    def test_bootstrap_interval(self):
+        result = compute_bankroll_stats(self.netEarns, self.lengths, resamples=2000, seed=7)
+        for interval in (result.meanPerSession, result.hourly):
+            self.assertLessEqual(interval.low, interval.estimate)
+            self.assertGreaterEqual(interval.high, interval.estimate)
+            self.assertEqual(interval.confidence, 0.95)
+        self.assertEqual(compute_bankroll_stats(self.netEarns, self.lengths, resamples=2000, seed=7), result)
+        self.assertNotEqual(compute_bankroll_stats(self.netEarns, self.lengths, resamples=2000, seed=8), result)
+
+    # Test Case: chunking and workers don't change the seeded resamples
+    def test_bootstrap_totals_chunks(self):
+        import backend.bankroll as bankroll
+
+        columns = np.arange(12, dtype=float).reshape(6, 2)
+        totals = bootstrap_totals(columns, resamples=50, seed=3, workers=1)
+        self.assertEqual(totals.shape, (50, 2))
+        # Every resample draws 6 sessions out of rows summing to (0 + 2 + ... + 10, 1 + 3 + ... + 11)
+        self.assertTrue(np.all(totals[:, 1] - totals[:, 0] == 6))
+
+        chunkDraws = bankroll.BOOTSTRAP_CHUNK_DRAWS
+        bankroll.BOOTSTRAP_CHUNK_DRAWS = 60
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                self.assertTrue(np.array_equal(bootstrap_totals(columns, resamples=50, seed=3, workers=1),
+                                               bootstrap_totals(columns, resamples=50, seed=3, executor=executor)))
+        finally:
+            bankroll.BOOTSTRAP_CHUNK_DRAWS = chunkDraws
+
+        # Blocks draw from the chunk's generator in turn, so the block size doesn't change them either
+        blockDraws = bankroll.BOOTSTRAP_BLOCK_DRAWS
+        bankroll.BOOTSTRAP_BLOCK_DRAWS = 20
+        try:
+            self.assertTrue(np.array_equal(bootstrap_totals(columns, resamples=50, seed=3, workers=1), totals))
+        finally:
+            bankroll.BOOTSTRAP_BLOCK_DRAWS = blockDraws
+
+    # Test Case: no hourly stats without lengths, no variance of a single session
+    def test_missing_data(self):
+        result = compute_bankroll_stats([10, -20], [None, None], resamples=100)
+        self.assertIsNone(result.hourly)
+        self.assertIsNone(result.stdPerHour)
+        self.assertEqual(result.hours, 0)
+        single = compute_bankroll_stats([10], [1], resamples=100)
+        self.assertIsNone(single.variancePerSession)
+        self.assertEqual(tuple(single.meanPerSession)[:3], (10, 10, 10))
+
+    # Test Case: invalid input
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            compute_bankroll_stats([], [])
+        with self.assertRaises(ValueError):
+            compute_bankroll_stats([1], [1], confidence=1)
+
+    # Test Case: stats per group in order of first appearance
+    def test_grouped(self):
+        result = compute_grouped_bankroll_stats(self.netEarns, self.lengths, ['a', 'b', 'a', None, 'b', 'a'],
+                                                resamples=100)
+        self.assertEqual(list(result), ['a', 'b', None])
+        self.assertEqual(result['a'].netEarn, 55)
+        self.assertEqual(result['b'].sessions, 2)
+        self.assertEqual(list(compute_grouped_bankroll_stats(self.netEarns, self.lengths, resamples=100)), [None])
+
+
+class TestBackendBankrollStats(unittest.TestCase):
+
+    def setUp(self):
+        self.wasEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.backend.cache_exchange_rate(6.5)
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(DefaultFieldNames.LENGTH, FieldType.NUMBER),
+            FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT),
+            FieldDefinition(CustomFieldNames.PEOPLE, FieldType.LIST),
+        ])
+        for netEarn, length, occasion in ((10, 2, 'home'), (-20, 4, 'club'), (30, 3, 'home')):
+            self.backend.add_session(Session(self.game, {
+                DefaultFieldNames.NET_EARN: netEarn, DefaultFieldNames.LENGTH: length,
+                CustomFieldNames.OCCASION: occasion,
+            }))
+
+    def tearDown(self):
+        stats.enabled = self.wasEnabled
+        stats.reset()
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: stats per occasion, cached until the table changes
+    def test_get_bankroll_stats(self):
+        result = self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, CustomFieldNames.OCCASION, resamples=100)
+        self.assertEqual(result['home'].netEarn, 40)
+        self.assertEqual(result['club'].hourly.estimate, -5)
+        self.assertIs(self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, CustomFieldNames.OCCASION, resamples=100), result)
+        self.assertEqual(stats.get_counters()['backend.analytics_cache_hits'], 1)
+
+        self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: 5 }))
+        self.assertEqual(self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, resamples=100)[None].sessions, 4)
+
+    # Test Case: unknown or LIST group fields and bad confidence are rejected
+    def test_get_bankroll_stats_invalid(self):
+        with self.assertRaises(ValueError):
+            self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, 'unknown')
+        with self.assertRaises(ValueError):
+            self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, CustomFieldNames.PEOPLE)
+        with self.assertRaises(ValueError):
+            self.backend.get_bankroll_stats(GameName.TEXAS_HOLDEM, confidence=1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
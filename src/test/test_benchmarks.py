@@ -0,0 +1,75 @@
+import os
+import unittest
+
+from benchmarks.suite import run_suite, compare_results, results_to_json, results_from_json, time_benchmark, \
+    BenchmarkResult, BenchmarkContext, DATABASE_KINDS, BENCHMARKS, MUTATING_BENCHMARKS
+from benchmarks.synthetic import generate_sessions, build_history, SYNTHETIC_GAME_NAME
+from database import JSONDatabase
+from definitions import CustomFieldNames
+
+
+test_filename = 'test_benchmarks.json'
+
+class TestSynthetic(unittest.TestCase):
+
+    def tearDown(self):
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: the same seed generates the same history
+    def test_generate_deterministic(self):
+        self.assertEqual(generate_sessions(50, seed=3), generate_sessions(50, seed=3))
+        self.assertNotEqual(generate_sessions(50, seed=3), generate_sessions(50, seed=4))
+
+    # Test Case: the built history is valid for the synthetic game
+    def test_build_history(self):
+        db = JSONDatabase(test_filename)
+        ids = build_history(db, 20)
+        rows = db.get_all_rows(SYNTHETIC_GAME_NAME)
+        self.assertEqual(list(rows), ids)
+        for fieldValues in rows.values():
+            self.assertIn(CustomFieldNames.OCCASION, fieldValues)
+
+
+class TestSuite(unittest.TestCase):
+
+    def tearDown(self):
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: every benchmark runs against every database
+    def test_run_suite(self):
+        results = run_suite([20], list(DATABASE_KINDS), list(BENCHMARKS), repeat=1)
+        self.assertEqual(len(results), len(DATABASE_KINDS) * len(BENCHMARKS))
+        for result in results:
+            self.assertGreater(result.median, 0)
+        self.assertEqual(results_from_json(results_to_json(results)), results)
+
+    # Test Case: every run, and every benchmark after a mutating one, sees the history as built
+    def test_mutating_benchmarks(self):
+        context = BenchmarkContext(DATABASE_KINDS['json'], test_filename, 20)
+        try:
+            seen = []
+            countSessions = lambda context: seen.append(len(context.backend.db.get_all_rows(SYNTHETIC_GAME_NAME)))
+            for benchmarkName in MUTATING_BENCHMARKS:
+                benchmark, operations = BENCHMARKS[benchmarkName]
+                time_benchmark(lambda context: (countSessions(context), benchmark(context)), context, 2, operations, mutates=True)
+                time_benchmark(countSessions, context, 1)
+            self.assertEqual(seen, [20] * 3 * len(MUTATING_BENCHMARKS))
+        finally:
+            context.close()
+
+    # Test Case: results slower than the baseline by more than the threshold are regressions
+    def test_compare_results(self):
+        baseline = [BenchmarkResult('filter', 'json', 10, 1.0, 1.0, 3), BenchmarkResult('edit', 'json', 10, 1.0, 1.0, 3)]
+        results = [BenchmarkResult('filter', 'json', 10, 1.1, 1.0, 3), BenchmarkResult('edit', 'json', 10, 2.0, 1.0, 3),
+                   BenchmarkResult('edit', 'json', 100, 5.0, 5.0, 3)]
+        comparisons, regressions = compare_results(results, baseline, threshold=1.2)
+        self.assertEqual([c.key for c in comparisons], ['filter/json/10', 'edit/json/10'])
+        self.assertEqual([c.key for c in regressions], ['edit/json/10'])
+
+
+if __name__ == '__main__':
+    unittest.main()
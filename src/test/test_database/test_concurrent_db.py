@@ -0,0 +1,173 @@
+import unittest
+import os
+import threading
+
+from backend import Backend
+from database import JSONDatabase, ConcurrentDatabase
+from definitions import GameName, FieldType, DatabaseKeys, DefaultFieldNames, \
+    FieldDefinition, Session, VisualizeFilters, FilterCondition, FilterOperator
+
+
+test_filename = 'test_filename.json'
+
+class CountingJSONDatabase(JSONDatabase):
+
+    def __init__(self, filename=None):
+        super().__init__(filename)
+        self.writes = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.blocked = threading.Event()
+
+    def write_data_to_disk(self, data):
+        if not self.gate.is_set():
+            self.blocked.set()
+        self.gate.wait()
+        self.writes += 1
+        super().write_data_to_disk(data)
+
+
+class ConcurrentDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = ConcurrentDatabase(filename=test_filename, database=CountingJSONDatabase)
+        self.db.reset_database()
+        self.db.create_table(GameName.TEXAS_HOLDEM, {
+            DefaultFieldNames.NET_EARN: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.NUMBER,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            DefaultFieldNames.NOTE: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.TEXT,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: False
+            }
+        })
+
+    # Starts insert threads after the first one's commit is held at the disk write
+    def start_behind_blocked_write(self, threads):
+        self.db.database.gate.clear()
+        threads[0].start()
+        self.db.database.blocked.wait()
+        for thread in threads[1:]:
+            thread.start()
+        while self.db.pendingWrites.qsize() < len(threads) - 1:
+            threading.Event().wait(0.001)
+        self.db.database.gate.set()
+        for thread in threads:
+            thread.join()
+
+    def tearDown(self):
+        self.db.close()
+        for filename in (test_filename, self.db.database.lockFilename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class TestConcurrentDatabase(ConcurrentDatabaseTests):
+
+    # Test Case: inserts from many threads should all land, several per disk write
+    def test_group_commit(self):
+        writesBefore = self.db.database.writes
+        ids = []
+        threads = [
+            threading.Thread(target=lambda i=i: ids.append(
+                self.db.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: i })
+            )) for i in range(20)
+        ]
+        self.start_behind_blocked_write(threads)
+
+        self.assertEqual(self.db.database.writes - writesBefore, 2)
+        rows = JSONDatabase(test_filename).get_all_rows(GameName.TEXAS_HOLDEM)
+        self.assertCountEqual(rows, ids)
+        self.assertCountEqual([row[DefaultFieldNames.NET_EARN] for row in rows.values()], range(20))
+
+    # Test Case: a write failing its schema check should not fail the others committed with it
+    def test_failed_write(self):
+        results = {}
+        def insert(name, values):
+            try:
+                results[name] = self.db.insert_row(GameName.TEXAS_HOLDEM, values)
+            except Exception as e:
+                results[name] = e
+        threads = [
+            threading.Thread(target=insert, args=('blocker', { DefaultFieldNames.NET_EARN: 0 })),
+            threading.Thread(target=insert, args=('valid', { DefaultFieldNames.NET_EARN: 1 })),
+            threading.Thread(target=insert, args=('invalid', { DefaultFieldNames.NOTE: 'no net earn' })),
+        ]
+        self.start_behind_blocked_write(threads)
+
+        self.assertIsInstance(results['invalid'], ValueError)
+        self.assertCountEqual(self.db.get_all_rows(GameName.TEXAS_HOLDEM), [results['blocker'], results['valid']])
+
+    # Test Case: reads should share one snapshot until the file changes
+    def test_snapshot(self):
+        _id = self.db.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 1 })
+        self.assertIs(self.db.read_data_to_memory(), self.db.read_data_to_memory())
+        filters = VisualizeFilters({
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)]
+        })
+        self.assertCountEqual(self.db.get_rows_with_filter(GameName.TEXAS_HOLDEM, filters), [_id])
+
+        # Written by another process
+        otherId = JSONDatabase(test_filename).insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 2 })
+        self.assertCountEqual(self.db.get_all_rows(GameName.TEXAS_HOLDEM), [_id, otherId])
+        self.assertTrue(self.db.delete_row(GameName.TEXAS_HOLDEM, otherId))
+        self.assertIsNone(self.db.delete_row(GameName.TEXAS_HOLDEM, otherId))
+        self.assertCountEqual(self.db.get_all_rows(GameName.TEXAS_HOLDEM), [_id])
+
+    # Test Case: a table's version changes with writes to it, also from another process, but not with writes to other tables
+    def test_get_table_version(self):
+        self.db.create_table(GameName.PLO, FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True).as_dict())
+        ploVersion = self.db.get_table_version(GameName.PLO)
+        holdemVersion = self.db.get_table_version(GameName.TEXAS_HOLDEM)
+        self.db.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 1 })
+        self.assertEqual(self.db.get_table_version(GameName.PLO), ploVersion)
+        self.assertNotEqual(self.db.get_table_version(GameName.TEXAS_HOLDEM), holdemVersion)
+
+        # Written by another process
+        JSONDatabase(test_filename).insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 2 })
+        self.assertNotEqual(self.db.get_table_version(GameName.PLO), ploVersion)
+        self.assertIsNone(self.db.get_table_version(GameName.AOE4))
+
+    # Test Case: writes queued before close should be committed, later ones rejected
+    def test_close(self):
+        self.db.close()
+        self.assertRaises(RuntimeError, self.db.insert_row, GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 1 })
+
+    # Test Case: Backend should record and read sessions from many threads
+    def test_backend(self):
+        self.db.close()
+        backend = Backend(db=ConcurrentDatabase, dbFileName=test_filename)
+        game = backend.add_game(GameName.PLO, [FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True)])
+        def record(i):
+            backend.add_session(Session(game, { DefaultFieldNames.NET_EARN: i }))
+            backend.get_sessions(GameName.PLO, _filter=None)
+        threads = [threading.Thread(target=record, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        backend.close()
+
+        sessions = Backend(dbFileName=test_filename).get_sessions(GameName.PLO, _filter=None)
+        self.assertCountEqual([s.get_values()[DefaultFieldNames.NET_EARN] for s in sessions.values()], range(10))
+
+    # Test Case: sessions should be parsed from copies, the shared snapshot is left as written
+    def test_backend_keeps_snapshot(self):
+        self.db.close()
+        backend = Backend(db=ConcurrentDatabase, dbFileName=test_filename)
+        backend.add_game(GameName.PLO, [FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True)])
+        # As written by an importer, Session parses NUMBER values into float
+        _id = backend.db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 1 })
+        row = backend.db.get_all_rows(GameName.PLO)[_id]
+        self.assertIs(type(row[DefaultFieldNames.NET_EARN]), int)
+
+        session = backend.get_sessions(GameName.PLO, _filter=None)[_id]
+        self.assertIs(type(session.get_values()[DefaultFieldNames.NET_EARN]), float)
+        self.assertIs(backend.db.get_all_rows(GameName.PLO)[_id], row)
+        self.assertIs(type(row[DefaultFieldNames.NET_EARN]), int)
+        backend.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 import os
 import json
+import multiprocessing
 
 from database import JSONDatabase
+from database.json_database import fcntl
 from definitions import FieldDefinition, GameName, FieldType, \
     DatabaseKeys, DefaultFieldNames, \
     VisualizeFilters, FilterCondition, FilterOperator
@@ -19,6 +21,8 @@ class JSONDatabaseTests(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         os.remove(test_filename)
+        if os.path.exists(cls.json_db.lockFilename):
+            os.remove(cls.json_db.lockFilename)
 
 class TestDBSanity(JSONDatabaseTests):
 
@@ -77,6 +81,7 @@ class TestTableAPI(JSONDatabaseTests):
             GameName.PLO: {
                 DatabaseKeys.SCHEMA_KEY: schema,
                 DatabaseKeys.ROWS_KEY: {},
+                DatabaseKeys.TABLE_VERSION_KEY: self.json_db.get_table_version(GameName.PLO),
             }
         }
         self.assertDictEqual(self.json_db.read_data_to_memory(), expectedStateJson)
@@ -176,7 +181,8 @@ class TestRowAPI(JSONDatabaseTests):
                         DefaultFieldNames.NET_EARN: 7,
                         DefaultFieldNames.LENGTH: 0.5,
                     }
-                }
+                },
+                DatabaseKeys.TABLE_VERSION_KEY: self.json_db.get_table_version(GameName.TEXAS_HOLDEM),
             },
             GameName.PLO: {
                 DatabaseKeys.SCHEMA_KEY: self.schema,
@@ -189,7 +195,8 @@ class TestRowAPI(JSONDatabaseTests):
                         DefaultFieldNames.NET_EARN: 8,
                         DefaultFieldNames.LENGTH: 3,
                     }
-                }
+                },
+                DatabaseKeys.TABLE_VERSION_KEY: self.json_db.get_table_version(GameName.PLO),
             }
         }
         self.assertDictEqual(self.json_db.read_data_to_memory(), expectedStateJson)
@@ -207,6 +214,32 @@ class TestRowAPI(JSONDatabaseTests):
             DefaultFieldNames.LENGTH: 3
         }))
 
+    # Test Case:db.insert_rows
+    def test_insert_rows(self):
+
+        # db.insert_rows keeps caller-specified uuids and generates the rest
+        uuids = self.json_db.insert_rows(GameName.PLO, [
+            { DefaultFieldNames.NET_EARN: 8, DefaultFieldNames.LENGTH: 3 },
+            { DefaultFieldNames.NET_EARN: 9, DefaultFieldNames.LENGTH: 4 },
+        ], ids=['specifiedId', None])
+        self.assertEqual(len(uuids), 2)
+        self.assertEqual(uuids[0], 'specifiedId')
+        self.assertDictEqual(self.json_db.get_all_rows(GameName.PLO), {
+            self.ploHex: { DefaultFieldNames.NET_EARN: -3, DefaultFieldNames.LENGTH: 1 },
+            uuids[0]: { DefaultFieldNames.NET_EARN: 8, DefaultFieldNames.LENGTH: 3 },
+            uuids[1]: { DefaultFieldNames.NET_EARN: 9, DefaultFieldNames.LENGTH: 4 },
+        })
+
+        # Should insert nothing if any row fails the schema check
+        self.assertRaises(ValueError, self.json_db.insert_rows, GameName.PLO, [
+            { DefaultFieldNames.NET_EARN: 1, DefaultFieldNames.LENGTH: 1 },
+            { DefaultFieldNames.NET_EARN: 1 },
+        ])
+        self.assertEqual(len(self.json_db.get_all_rows(GameName.PLO)), 3)
+
+        # Should fail db.insert_rows with incorrect table name
+        self.assertFalse(self.json_db.insert_rows(GameName.AOE4, []))
+
     # Test Case:db.delete_row
     def test_delete_row(self):
 
@@ -218,7 +251,8 @@ class TestRowAPI(JSONDatabaseTests):
         expectedStateJson = {
             GameName.TEXAS_HOLDEM: {
                 DatabaseKeys.SCHEMA_KEY: self.schema,
-                DatabaseKeys.ROWS_KEY: {}
+                DatabaseKeys.ROWS_KEY: {},
+                DatabaseKeys.TABLE_VERSION_KEY: self.json_db.get_table_version(GameName.TEXAS_HOLDEM),
             },
             GameName.PLO: {
                 DatabaseKeys.SCHEMA_KEY: self.schema,
@@ -365,5 +399,81 @@ class TestRowAPI(JSONDatabaseTests):
         expectedKeys = [uuid1, uuid2]
         self.assertCountEqual(self.json_db.get_rows_with_filter(GameName.TEXAS_HOLDEM, _filter=filters), expectedKeys)
 
+class TestTableVersion(JSONDatabaseTests):
+
+    # Test Case: a table's version changes with writes to it, also by another instance, but not with writes to other tables
+    def test_get_table_version(self):
+        self.json_db.reset_database()
+        self.assertIsNone(self.json_db.get_table_version(GameName.PLO))
+        schema = FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True).as_dict()
+        self.json_db.create_table(GameName.PLO, schema)
+        self.json_db.create_table(GameName.TEXAS_HOLDEM, schema)
+        ploVersion = self.json_db.get_table_version(GameName.PLO)
+        holdemVersion = self.json_db.get_table_version(GameName.TEXAS_HOLDEM)
+        self.assertNotEqual(ploVersion, holdemVersion)
+
+        other = JSONDatabase(filename=test_filename)
+        _id = other.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 1 })
+        self.assertEqual(self.json_db.get_table_version(GameName.PLO), ploVersion)
+        self.assertNotEqual(self.json_db.get_table_version(GameName.TEXAS_HOLDEM), holdemVersion)
+        holdemVersion = self.json_db.get_table_version(GameName.TEXAS_HOLDEM)
+        # Nothing was deleted, nothing changed
+        self.assertFalse(other.delete_row(GameName.PLO, _id))
+        self.assertEqual(self.json_db.get_table_version(GameName.PLO), ploVersion)
+        self.json_db.alter_table(GameName.PLO, add=[FieldDefinition(DefaultFieldNames.NOTE, FieldType.TEXT)])
+        self.assertNotEqual(self.json_db.get_table_version(GameName.PLO), ploVersion)
+        self.assertEqual(other.get_table_version(GameName.TEXAS_HOLDEM), holdemVersion)
+
+    # Test Case: tables written without a version fall back to the version of the file
+    def test_get_table_version_without_key(self):
+        with open(test_filename, 'w') as f:
+            f.write('''{ "TEXAS HOLD'EM": {}, "AOE4": {} }''')
+        fileVersion = self.json_db.get_table_version(GameName.TEXAS_HOLDEM)
+        self.assertIsNotNone(fileVersion)
+        self.assertEqual(self.json_db.get_table_version(GameName.AOE4), fileVersion)
+        self.assertIsNone(self.json_db.get_table_version(GameName.PLO))
+
+
+def insert_rows_in_process(filename, worker, count):
+    db = JSONDatabase(filename=filename)
+    for i in range(count):
+        db.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: worker, DefaultFieldNames.NOTE: str(i) })
+
+class TestConcurrentAccess(JSONDatabaseTests):
+
+    # Test Case: writers in separate processes should not lose each other's rows
+    @unittest.skipUnless(fcntl, 'requires fcntl')
+    def test_concurrent_writers(self):
+        self.json_db.reset_database()
+        self.json_db.create_table(GameName.TEXAS_HOLDEM, {
+            DefaultFieldNames.NET_EARN: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.NUMBER,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            DefaultFieldNames.NOTE: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.TEXT,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: False
+            }
+        })
+        workers, count = 4, 30
+        processes = [
+            multiprocessing.Process(target=insert_rows_in_process, args=(test_filename, worker, count))
+            for worker in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        # Readers should never see a partial file while the writers run
+        while any(process.is_alive() for process in processes):
+            self.assertIsNotNone(self.json_db.get_all_rows(GameName.TEXAS_HOLDEM))
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        rows = self.json_db.get_all_rows(GameName.TEXAS_HOLDEM).values()
+        self.assertCountEqual(
+            [(row[DefaultFieldNames.NET_EARN], row[DefaultFieldNames.NOTE]) for row in rows],
+            [(worker, str(i)) for worker in range(workers) for i in range(count)]
+        )
+
 if __name__ == '__main__':
     unittest.main()
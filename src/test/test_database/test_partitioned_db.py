@@ -0,0 +1,244 @@
+import unittest
+import os
+import gzip
+import shutil
+import multiprocessing
+
+from backend import Backend
+import database.partitioned_database as partitioned_database
+from database import JSONDatabase, PartitionedJSONDatabase, json_to_partitioned, partitioned_to_json
+from database.json_database import fcntl
+from database.partitioned_database import SEGMENTS_KEY, SEGMENT_SEALED_KEY, SEGMENT_PARTITION_KEY, \
+    SEGMENT_FILE_KEY, SEGMENT_DELETED_KEY, MANIFEST_OBSOLETE_KEY, get_partition, compute_column_stats, rules_out
+from database.query_plan import PARTITION_SCAN
+from definitions import GameName, FieldType, DefaultFieldNames, FieldDefinition, Session, \
+    VisualizeFilters, FilterCondition, FilterOperator
+from instrumentation import stats
+
+
+test_directory = 'test_partitioned_database'
+test_filename = 'test_filename.json'
+TABLE = GameName.PLO
+
+def make_row(date: str, netEarn: float, **values):
+    return { DefaultFieldNames.DATE: date, DefaultFieldNames.NET_EARN: netEarn, **values }
+
+# Inserts a row per month, every insert seals the open segment, obsolete files are removed by the next write
+def insert_months_in_process(directory: str, months: int):
+    partitioned_database.OBSOLETE_SEGMENT_GRACE_SECONDS = 0
+    db = PartitionedJSONDatabase(directory)
+    for month in range(months):
+        db.insert_row(TABLE, make_row(f'{2022 + month // 12}-{month % 12 + 1:02d}-01', month))
+
+class TestSegmentStatistics(unittest.TestCase):
+
+    # Test Case: DATE values of either format map to their month
+    def test_get_partition(self):
+        self.assertEqual(get_partition('2021-03-15'), '2021-03')
+        self.assertEqual(get_partition('2021/03/15'), '2021-03')
+        self.assertIsNone(get_partition(None))
+        self.assertIsNone(get_partition('March'))
+
+    # Test Case: columns mixing kinds of values get no statistics
+    def test_compute_column_stats(self):
+        columnStats = compute_column_stats([{ 'a': 1, 'b': 'x', 'c': [1] }, { 'a': 2.5, 'b': 5 }, { 'd': None }])
+        self.assertEqual(columnStats, { 'a': [1, 2.5, 2], 'b': None, 'c': None, 'd': None })
+
+    # Test Case: conditions are ruled out only when no row can satisfy them
+    def test_rules_out(self):
+        # Values 10 to 20, held by 3 of 4 rows
+        columnStats = [10, 20, 3]
+        self.assertTrue(rules_out(columnStats, 4, FilterCondition(FilterOperator.GREATER, 20)))
+        self.assertFalse(rules_out(columnStats, 4, FilterCondition(FilterOperator.GREATER, 19)))
+        self.assertTrue(rules_out(columnStats, 4, FilterCondition(FilterOperator.LESS, 10)))
+        self.assertTrue(rules_out(columnStats, 4, FilterCondition(FilterOperator.EQUAL, 21)))
+        self.assertFalse(rules_out(columnStats, 4, FilterCondition(FilterOperator.CONTAINS, '1')))
+        # The row without a value satisfies every negated condition
+        self.assertFalse(rules_out(columnStats, 4, FilterCondition(FilterOperator.LESS, 30, negate=True)))
+        self.assertTrue(rules_out(columnStats, 3, FilterCondition(FilterOperator.LESS, 30, negate=True)))
+        self.assertTrue(rules_out(columnStats, 3, FilterCondition(FilterOperator.GREATER, 5, negate=True)))
+        with self.assertRaises(TypeError):
+            rules_out(columnStats, 4, FilterCondition(FilterOperator.GREATER, 'x'))
+
+
+class PartitionedJSONDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.statsEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        self.db = PartitionedJSONDatabase(test_directory)
+        self.db.reset_database()
+        self.db.create_table(TABLE, {
+            **FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True).as_dict(),
+            **FieldDefinition(DefaultFieldNames.DATE, FieldType.DATE).as_dict(),
+        })
+        self.ids = self.db.insert_rows(TABLE, [
+            make_row('2021-01-05', 10), make_row('2021-01-20', -5),
+            make_row('2021-02-03', 40), make_row('2021-03-01', 7), make_row('2021-03-09', 0),
+        ])
+
+    def tearDown(self):
+        stats.enabled = self.statsEnabled
+        shutil.rmtree(test_directory, ignore_errors=True)
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def get_segments(self):
+        return self.db.get_table(TABLE)[SEGMENTS_KEY]
+
+    def get_files(self):
+        return [filename for filename in os.listdir(test_directory) if not filename.endswith('.lock')]
+
+    def set_grace_seconds(self, seconds: float):
+        graceSeconds = partitioned_database.OBSOLETE_SEGMENT_GRACE_SECONDS
+        partitioned_database.OBSOLETE_SEGMENT_GRACE_SECONDS = seconds
+        self.addCleanup(setattr, partitioned_database, 'OBSOLETE_SEGMENT_GRACE_SECONDS', graceSeconds)
+
+    # Test Case: a bulk insert is split by month, every segment but the last is sealed and compressed
+    def test_segments(self):
+        segments = self.get_segments()
+        self.assertEqual([segment[SEGMENT_PARTITION_KEY] for segment in segments], ['2021-01', '2021-02', '2021-03'])
+        self.assertEqual([segment[SEGMENT_SEALED_KEY] for segment in segments], [True, True, False])
+        with open(os.path.join(test_directory, segments[0][SEGMENT_FILE_KEY]), 'rb') as f:
+            self.assertIn(b'2021-01-20', gzip.decompress(f.read()))
+        self.assertEqual(len(self.db.get_all_rows(TABLE)), 5)
+
+        # Late rows go to the open segment, a later month seals it
+        self.db.insert_row(TABLE, make_row('2021-01-31', 3))
+        self.assertEqual(len(self.get_segments()), 3)
+        self.db.insert_row(TABLE, make_row('2021-04-01', 3))
+        self.assertEqual([segment[SEGMENT_SEALED_KEY] for segment in self.get_segments()], [True, True, True, False])
+        # The file of the segment sealed is kept for readers of the previous manifest, then removed by a later write
+        obsolete = self.db.manifest.read_data_to_memory()[MANIFEST_OBSOLETE_KEY]
+        self.assertEqual(len(obsolete), 1)
+        self.assertTrue(os.path.exists(os.path.join(test_directory, next(iter(obsolete)))))
+        self.assertEqual(len(self.get_files()), 6)
+        self.set_grace_seconds(0)
+        self.db.insert_row(TABLE, make_row('2021-04-02', 3))
+        self.assertEqual(self.db.manifest.read_data_to_memory()[MANIFEST_OBSOLETE_KEY], {})
+        self.assertEqual(len(self.get_files()), 5)
+
+    # Test Case: filters skip the segments their statistics rule out and return what JSONDatabase returns
+    def test_filter(self):
+        jsonDatabase = JSONDatabase(test_filename)
+        jsonDatabase.write_data_to_disk(self.db.read_data_to_memory())
+        filters = [
+            { DefaultFieldNames.DATE: [FilterCondition(FilterOperator.GREATER, '2021-02-10')] },
+            { DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.LESS, 0)] },
+            { DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.EQUAL, 40)] },
+            { DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 5, negate=True)] },
+            { DefaultFieldNames.LENGTH: [FilterCondition(FilterOperator.EQUAL, 3)] },
+            { DefaultFieldNames.NOTE: [FilterCondition(FilterOperator.EQUAL, 'x')] },
+        ]
+        for filters in filters:
+            _filter = VisualizeFilters(filters)
+            self.assertEqual(self.db.get_rows_with_filter(TABLE, _filter), jsonDatabase.get_rows_with_filter(TABLE, _filter))
+
+        stats.reset()
+        _filter = VisualizeFilters({ DefaultFieldNames.DATE: [FilterCondition(FilterOperator.GREATER, '2021-02-10')] })
+        self.assertEqual(len(self.db.get_rows_with_filter(TABLE, _filter)), 2)
+        self.assertEqual(stats.get_counters()['database.segments_skipped'], 2)
+        plan = self.db.explain(TABLE, _filter)
+        self.assertEqual((plan.access, plan.segmentsRead, plan.segmentsSkipped, plan.rows), (PARTITION_SCAN, 1, 2, 2))
+        with self.assertRaises(ValueError):
+            self.db.explain(GameName.AOE4, _filter)
+
+    # Test Case: rows of sealed segments are deleted and replaced without rewriting the segment
+    def test_delete_and_replace(self):
+        sealed = self.get_segments()[0]
+        with open(os.path.join(test_directory, sealed[SEGMENT_FILE_KEY]), 'rb') as f:
+            content = f.read()
+        version = self.db.get_table_version(TABLE)
+        self.assertTrue(self.db.delete_row(TABLE, self.ids[0]))
+        self.assertFalse(self.db.delete_row(TABLE, self.ids[0]))
+        self.assertNotEqual(self.db.get_table_version(TABLE), version)
+        self.db.insert_row(TABLE, make_row('2021-03-20', 99), _id=self.ids[1])
+        self.db.delete_row(TABLE, self.ids[4])
+
+        with open(os.path.join(test_directory, sealed[SEGMENT_FILE_KEY]), 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(self.get_segments()[0][SEGMENT_DELETED_KEY], [self.ids[0], self.ids[1]])
+        rows = self.db.get_all_rows(TABLE)
+        self.assertEqual(set(rows), { self.ids[1], self.ids[2], self.ids[3] })
+        self.assertEqual(rows[self.ids[1]][DefaultFieldNames.NET_EARN], 99)
+        _filter = VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.LESS, 0)] })
+        self.assertEqual(self.db.get_rows_with_filter(TABLE, _filter), {})
+
+    # Test Case: statistics of columns altered after a segment was sealed are not used
+    def test_alter_table(self):
+        self.db.alter_table(TABLE, add=[FieldDefinition(DefaultFieldNames.LENGTH, FieldType.NUMBER)],
+                            defaults={ DefaultFieldNames.LENGTH: 2 }, retype={ DefaultFieldNames.NET_EARN: FieldType.TEXT })
+        rows = self.db.get_rows_with_filter(TABLE, VisualizeFilters({
+            DefaultFieldNames.LENGTH: [FilterCondition(FilterOperator.EQUAL, 2)],
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.EQUAL, '40')],
+        }))
+        self.assertEqual(list(rows), [self.ids[2]])
+        self.assertIsNone(self.db.insert_row(GameName.AOE4, make_row('2021-01-01', 1)))
+
+    # Test Case: conversion to and from a single JSON file keeps every table
+    def test_conversion(self):
+        self.db.delete_row(TABLE, self.ids[0])
+        partitioned_to_json(test_directory, test_filename)
+        self.db.reset_database()
+        self.assertEqual(self.db.get_all_table_names(), [])
+        obsolete = self.db.manifest.read_data_to_memory()[MANIFEST_OBSOLETE_KEY]
+        self.assertCountEqual(['manifest.json', *obsolete], self.get_files())
+        json_to_partitioned(test_filename, test_directory)
+        self.assertEqual(self.db.read_data_to_memory(), JSONDatabase(test_filename).read_data_to_memory())
+        self.assertEqual(len(self.get_segments()), 3)
+
+    # Test Case: a segment file missing from the manifest read makes the read use the newer manifest
+    def test_missing_segment(self):
+        rows = self.db.get_all_rows(TABLE)
+        reader = PartitionedJSONDatabase(test_directory)
+        self.assertEqual(reader.get_all_rows(TABLE), rows)
+        self.set_grace_seconds(0)
+        # Seals the open segment, whose file the next write removes
+        self.db.insert_row(TABLE, make_row('2021-04-01', 1))
+        oldManifest = reader.manifestCache
+        self.db.insert_row(TABLE, make_row('2021-04-02', 1))
+
+        stats.reset()
+        loadManifest = reader.load_manifest
+        manifests = iter([oldManifest])
+        reader.load_manifest = lambda: next(manifests, None) or loadManifest()
+        self.assertEqual(len(reader.get_all_rows(TABLE)), 7)
+        self.assertEqual(stats.get_counters()['database.segment_read_retries'], 1)
+        # The manifest lists a file which is gone
+        os.remove(os.path.join(test_directory, self.get_segments()[0][SEGMENT_FILE_KEY]))
+        reader.segmentCache.clear()
+        with self.assertRaises(FileNotFoundError):
+            reader.get_all_rows(TABLE)
+
+    # Test Case: a reader never loses rows while another process seals segments and removes their files
+    @unittest.skipUnless(fcntl, 'requires fcntl')
+    def test_concurrent_reader(self):
+        months = 60
+        writer = multiprocessing.Process(target=insert_months_in_process, args=(test_directory, months))
+        writer.start()
+        counts = [len(self.db.get_all_rows(TABLE))]
+        while writer.is_alive():
+            counts.append(len(self.db.get_all_rows(TABLE)))
+            self.assertGreaterEqual(counts[-1], counts[-2])
+        writer.join()
+        self.assertEqual(writer.exitcode, 0)
+        self.assertEqual(len(self.db.get_all_rows(TABLE)), 5 + months)
+        self.assertGreater(len(counts), 2)
+
+    # Test Case: the Backend runs on a partitioned database
+    def test_backend(self):
+        backend = Backend(db=PartitionedJSONDatabase, dbFileName=test_directory)
+        backend.cache_exchange_rate(6.5)
+        game = backend.construct_game_from_db(TABLE)
+        _id = backend.add_session(Session(game, make_row('2021-05-02', 3)))
+        backend.edit_session(TABLE, self.ids[0], { DefaultFieldNames.NET_EARN: 12 })
+        sessions = backend.get_sessions(TABLE, None)
+        self.assertEqual(len(sessions), 6)
+        self.assertEqual(sessions[self.ids[0]].get_values()[DefaultFieldNames.NET_EARN], 12)
+        self.assertTrue(backend.delete_session(TABLE, _id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+
+from database import JSONDatabase, SnapshotDatabase, ConcurrentDatabase
+from database.query_plan import FULL_SCAN, MIN_ROWS_TO_REORDER, plan_filter_stages
+from definitions import DatabaseKeys, DefaultFieldNames, CustomFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator
+
+
+test_filename = 'test_filename.json'
+test_snapshot_filename = 'test_filename.snapshot'
+
+# 100 rows, OCCASION is Home for one in ten, NET_EARN is positive for half
+test_data = {
+    'GAME': {
+        DatabaseKeys.SCHEMA_KEY: {},
+        DatabaseKeys.ROWS_KEY: {
+            f'id{i}': {
+                DefaultFieldNames.NET_EARN: i - 50,
+                CustomFieldNames.OCCASION: 'Home' if i % 10 == 0 else 'Global',
+            } for i in range(100)
+        }
+    }
+}
+test_filter = VisualizeFilters({
+    DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)],
+    CustomFieldNames.OCCASION: [FilterCondition(FilterOperator.EQUAL, 'Home')],
+})
+
+class TestQueryPlan(unittest.TestCase):
+
+    def setUp(self):
+        JSONDatabase(test_filename).write_data_to_disk(test_data)
+        SnapshotDatabase(test_snapshot_filename).write_data_to_disk(test_data)
+        self.databases = [
+            JSONDatabase(test_filename), SnapshotDatabase(test_snapshot_filename), ConcurrentDatabase(test_filename)
+        ]
+
+    def tearDown(self):
+        for db in self.databases:
+            db.close()
+        for filename in (test_filename, test_snapshot_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: the most selective condition runs first, on every Database
+    def test_explain(self):
+        for db in self.databases:
+            plan = db.explain('GAME', test_filter)
+            self.assertEqual(plan.database, type(db).__name__)
+            self.assertEqual(plan.access, FULL_SCAN)
+            self.assertEqual(plan.rows, 100)
+            self.assertEqual([stage.column for stage in plan.stages], [CustomFieldNames.OCCASION, DefaultFieldNames.NET_EARN])
+            self.assertAlmostEqual(plan.stages[0].selectivity, 0.1)
+            self.assertEqual(plan.estimatedRows, 5)
+            self.assertFalse(plan.analyzed)
+            self.assertIsNone(plan.stages[0].rowsIn)
+
+    # Test Case: analyze records the rows each stage examined and kept
+    def test_explain_analyze(self):
+        for db in self.databases:
+            plan = db.explain('GAME', test_filter, analyze=True)
+            self.assertTrue(plan.analyzed)
+            self.assertEqual([(stage.rowsIn, stage.rowsOut) for stage in plan.stages], [(100, 10), (10, 4)])
+            self.assertEqual(plan.rowsReturned, len(db.get_rows_with_filter('GAME', test_filter)))
+            self.assertIn('OCCASION', plan.describe())
+            self.assertEqual(plan.to_dict()['stages'][0]['operator'], 'EQUAL')
+
+    # Test Case: without filters the plan is a bare scan
+    def test_explain_no_filter(self):
+        plan = self.databases[0].explain('GAME', None, analyze=True)
+        self.assertEqual(plan.stages, [])
+        self.assertEqual(plan.rowsReturned, 100)
+
+    # Test Case: explaining a missing table raises
+    def test_explain_missing_table(self):
+        for db in self.databases:
+            with self.assertRaises(ValueError):
+                db.explain('MISSING', test_filter)
+
+    # Test Case: small tables are filtered in the order given, without sampling
+    def test_plan_small_table(self):
+        rows = test_data['GAME'][DatabaseKeys.ROWS_KEY]
+        stages = plan_filter_stages(rows, test_filter, self.databases[0].get_single_filter_function)
+        self.assertEqual([stage.column for stage, _ in stages], [DefaultFieldNames.NET_EARN, CustomFieldNames.OCCASION])
+        self.assertEqual([stage.selectivity for stage, _ in stages], [1.0, 1.0])
+
+        largeRows = { f'{_id}-{i}': row for i in range(MIN_ROWS_TO_REORDER // len(rows) + 1) for _id, row in rows.items() }
+        stages = plan_filter_stages(largeRows, test_filter, self.databases[0].get_single_filter_function)
+        self.assertEqual(stages[0][0].column, CustomFieldNames.OCCASION)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+
+from database import JSONDatabase, SnapshotDatabase, ConcurrentDatabase
+from database.schema_evolution import convert_value, build_migration, upgrade_rows
+from definitions import FieldDefinition, FieldType, DatabaseKeys
+
+
+test_filename = 'test_filename.json'
+TABLE = 'table'
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = {
+            'a': { DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.NUMBER, DatabaseKeys.SCHEMA_REQUIRED_KEY: True },
+            'b': { DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.TEXT, DatabaseKeys.SCHEMA_REQUIRED_KEY: False },
+        }
+
+    # Test Case: values are converted, None where they can't be
+    def test_convert_value(self):
+        self.assertEqual(convert_value(5, FieldType.TEXT), '5')
+        self.assertEqual(convert_value(['x', 'y'], FieldType.TEXT), 'x,y')
+        self.assertEqual(convert_value('2.5', FieldType.NUMBER), 2.5)
+        self.assertIsNone(convert_value('abc', FieldType.NUMBER))
+        self.assertEqual(convert_value('x,y', FieldType.LIST), ['x', 'y'])
+        self.assertIsNone(convert_value('2021-13-45', FieldType.DATE))
+
+    # Test Case: migrations which don't fit the schema are rejected
+    def test_build_migration_invalid(self):
+        with self.assertRaises(ValueError):
+            build_migration(self.schema)
+        with self.assertRaises(ValueError):
+            build_migration(self.schema, drop=['missing'])
+        with self.assertRaises(ValueError):
+            build_migration(self.schema, add=[FieldDefinition('b', FieldType.TEXT)])
+        with self.assertRaises(ValueError):
+            build_migration(self.schema, add=[FieldDefinition('c', FieldType.TEXT, required=True)])
+        with self.assertRaises(ValueError):
+            build_migration(self.schema, retype={ 'b': 'COLOR' })
+        with self.assertRaises(ValueError):
+            build_migration(self.schema, drop=['b'], retype={ 'b': FieldType.NUMBER })
+        with self.assertRaises(TypeError):
+            build_migration(self.schema, add=[FieldDefinition('c', FieldType.NUMBER)], defaults={ 'c': 'abc' })
+
+    # Test Case: rows are upgraded through every migration after their version
+    def test_upgrade_rows(self):
+        first = build_migration(self.schema, add=[FieldDefinition('c', FieldType.NUMBER)], defaults={ 'c': 1 })
+        second = build_migration(self.schema, drop=['b'], retype={ 'a': FieldType.TEXT })
+        rows = { 'old': { 'a': 1, 'b': 'x' }, 'mid': { 'a': 2, 'b': 'y', 'c': 5 }, 'new': { 'a': '3' } }
+        upgraded = upgrade_rows(rows, [first, second], { 'mid': 1, 'new': 2 })
+        self.assertEqual(upgraded, { 'old': { 'a': '1', 'c': 1 }, 'mid': { 'a': '2', 'c': 5 }, 'new': { 'a': '3' } })
+        # Stored rows are left as they are, rows at the current version are shared
+        self.assertEqual(rows['old'], { 'a': 1, 'b': 'x' })
+        self.assertIs(upgraded['new'], rows['new'])
+        self.assertIs(upgrade_rows(rows, [], None), rows)
+
+
+class TestAlterTable(unittest.TestCase):
+
+    databases = [JSONDatabase, SnapshotDatabase, ConcurrentDatabase]
+
+    def tearDown(self):
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def create_table(self, databaseClass):
+        db = databaseClass(filename=test_filename)
+        db.reset_database()
+        db.create_table(TABLE, {
+            **FieldDefinition('a', FieldType.NUMBER, required=True).as_dict(),
+            **FieldDefinition('b', FieldType.NUMBER).as_dict(),
+        })
+        db.insert_rows(TABLE, [{ 'a': 1, 'b': 10 }, { 'a': 2 }], ids=['x', 'y'])
+        return db
+
+    # Test Case: altering changes the schema only, rows are upgraded on read
+    def test_alter_table(self):
+        for databaseClass in self.databases:
+            db = self.create_table(databaseClass)
+            try:
+                version = db.alter_table(TABLE, add=[FieldDefinition('c', FieldType.TEXT, required=True)],
+                                         retype={ 'b': FieldType.TEXT }, defaults={ 'c': 'none' })
+                self.assertEqual(version, 1)
+                self.assertEqual({ field.get_field_name(): field.get_field_type() for field in db.get_table_schema(TABLE) },
+                                 { 'a': FieldType.NUMBER, 'b': FieldType.TEXT, 'c': FieldType.TEXT })
+                self.assertEqual(db.get_all_rows(TABLE), { 'x': { 'a': 1, 'b': '10', 'c': 'none' }, 'y': { 'a': 2, 'c': 'none' } })
+
+                # Written rows are stored at the current version, deleted rows forget theirs
+                db.insert_row(TABLE, { 'a': 3, 'c': 'set' }, _id='x')
+                db.alter_table(TABLE, drop=['a'])
+                self.assertEqual(db.get_all_rows(TABLE), { 'x': { 'c': 'set' }, 'y': { 'c': 'none' } })
+                db.delete_row(TABLE, 'x')
+                db.close()
+                fileFormat = SnapshotDatabase if databaseClass is SnapshotDatabase else JSONDatabase
+                raw = fileFormat(filename=test_filename).read_data_to_memory()
+                self.assertEqual(raw[TABLE][DatabaseKeys.ROW_SCHEMA_VERSIONS_KEY], {})
+                self.assertEqual(raw[TABLE][DatabaseKeys.ROWS_KEY]['y'], { 'a': 2 })
+            finally:
+                db.close()
+
+    # Test Case: missing tables and invalid changes are rejected
+    def test_alter_table_invalid(self):
+        db = self.create_table(JSONDatabase)
+        with self.assertRaises(ValueError):
+            db.alter_table('missing', drop=['a'])
+        with self.assertRaises(ValueError):
+            db.alter_table(TABLE, drop=['c'])
+        self.assertNotIn(DatabaseKeys.SCHEMA_MIGRATIONS_KEY, db.read_data_to_memory()[TABLE])
+
+
+if __name__ == '__main__':
+    unittest.main()
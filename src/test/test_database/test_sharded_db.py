@@ -0,0 +1,109 @@
+import unittest
+import os
+import shutil
+import multiprocessing
+
+from backend import Backend
+from database import JSONDatabase, ShardedJSONDatabase, json_to_sharded, sharded_to_json
+from database.json_database import fcntl
+from database.sharded_database import MANIFEST_FILENAME
+from definitions import GameName, FieldType, DefaultFieldNames, FieldDefinition, Session, \
+    VisualizeFilters, FilterCondition, FilterOperator
+
+
+test_directory = 'test_sharded_database'
+test_filename = 'test_filename.json'
+
+def insert_rows_in_process(directory: str, gameName: str, count: int):
+    db = ShardedJSONDatabase(directory)
+    for i in range(count):
+        db.insert_row(gameName, { DefaultFieldNames.NET_EARN: i })
+
+class ShardedJSONDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = ShardedJSONDatabase(test_directory)
+        self.db.reset_database()
+        for gameName in (GameName.TEXAS_HOLDEM, GameName.PLO):
+            self.db.create_table(gameName, FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True).as_dict())
+
+    def tearDown(self):
+        shutil.rmtree(test_directory, ignore_errors=True)
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def get_shard_filename(self, gameName: str) -> str:
+        return self.db.get_shard(gameName).filename
+
+    # Test Case: every table has its own file, listed in the manifest
+    def test_tables(self):
+        self.assertCountEqual(self.db.get_all_table_names(), [GameName.TEXAS_HOLDEM, GameName.PLO])
+        self.assertTrue(os.path.exists(os.path.join(test_directory, MANIFEST_FILENAME)))
+        self.assertNotEqual(self.get_shard_filename(GameName.TEXAS_HOLDEM), self.get_shard_filename(GameName.PLO))
+        self.assertFalse(self.db.create_table(GameName.PLO, {}))
+        self.assertIsNone(self.db.get_all_rows(GameName.AOE4))
+        self.assertIsNone(self.db.insert_row(GameName.AOE4, { DefaultFieldNames.NET_EARN: 1 }))
+        with self.assertRaises(ValueError):
+            self.db.get_table_schema(GameName.AOE4)
+
+    # Test Case: a write replaces only the shard of its table
+    def test_write_touches_one_shard(self):
+        holdemVersion = self.db.get_table_version(GameName.TEXAS_HOLDEM)
+        ploVersion = self.db.get_table_version(GameName.PLO)
+        _id = self.db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 5 })
+        self.assertEqual(self.db.get_table_version(GameName.TEXAS_HOLDEM), holdemVersion)
+        self.assertNotEqual(self.db.get_table_version(GameName.PLO), ploVersion)
+        self.assertEqual(self.db.get_all_rows(GameName.PLO), { _id: { DefaultFieldNames.NET_EARN: 5 } })
+        self.assertEqual(len(self.db.get_rows_with_filter(GameName.PLO, VisualizeFilters({
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 1)]
+        }))), 1)
+        self.assertTrue(self.db.delete_row(GameName.PLO, _id))
+        self.assertEqual(self.db.explain(GameName.PLO, None).database, 'ShardedJSONDatabase')
+
+    # Test Case: a damaged shard loses only its own table
+    def test_damaged_shard(self):
+        self.db.insert_row(GameName.TEXAS_HOLDEM, { DefaultFieldNames.NET_EARN: 1 })
+        with open(self.get_shard_filename(GameName.PLO), 'w') as f:
+            f.write('{ "truncated": ')
+        self.assertEqual(len(self.db.get_all_rows(GameName.TEXAS_HOLDEM)), 1)
+        self.assertIsNone(self.db.get_all_rows(GameName.PLO))
+
+    # Test Case: conversion to and from a single JSON file keeps every table
+    def test_conversion(self):
+        self.db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 1 }, _id='a')
+        sharded_to_json(test_directory, test_filename)
+        self.db.reset_database()
+        self.assertEqual(self.db.get_all_table_names(), [])
+        json_to_sharded(test_filename, test_directory)
+        self.assertEqual(self.db.read_data_to_memory(), JSONDatabase(test_filename).read_data_to_memory())
+        self.assertEqual(self.db.get_all_rows(GameName.PLO), { 'a': { DefaultFieldNames.NET_EARN: 1 } })
+
+    # Test Case: the Backend runs on a sharded database
+    def test_backend(self):
+        backend = Backend(db=ShardedJSONDatabase, dbFileName=test_directory)
+        game = backend.construct_game_from_db(GameName.PLO)
+        _id = backend.add_session(Session(game, { DefaultFieldNames.NET_EARN: 3 }))
+        self.assertEqual(backend.get_sessions(GameName.PLO, None)[_id].get_values()[DefaultFieldNames.NET_EARN], 3)
+        backend.alter_game(GameName.PLO, add=[FieldDefinition(DefaultFieldNames.NOTE + '2', FieldType.TEXT)])
+        self.assertIn(DefaultFieldNames.NOTE + '2', [f.get_field_name() for f in backend.db.get_table_schema(GameName.PLO)])
+
+    # Test Case: writers to different games in separate processes keep every row
+    @unittest.skipUnless(fcntl, 'requires fcntl')
+    def test_concurrent_writers(self):
+        count = 20
+        processes = [
+            multiprocessing.Process(target=insert_rows_in_process, args=(test_directory, gameName, count))
+            for gameName in (GameName.TEXAS_HOLDEM, GameName.PLO, GameName.PLO)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(len(self.db.get_all_rows(GameName.TEXAS_HOLDEM)), count)
+        self.assertEqual(len(self.db.get_all_rows(GameName.PLO)), 2 * count)
+
+
+if __name__ == '__main__':
+    unittest.main()
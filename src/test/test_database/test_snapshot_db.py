@@ -0,0 +1,175 @@
+import unittest
+import os
+
+from backend import Backend
+from database import JSONDatabase, SnapshotDatabase, json_to_snapshot, snapshot_to_json
+from definitions import GameName, FieldType, DatabaseKeys, DefaultFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator, Session
+
+
+test_filename = 'test_filename.snapshot'
+test_json_filename = 'test_filename.json'
+
+class SnapshotDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.schema = {
+            DefaultFieldNames.NET_EARN: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.NUMBER,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: True
+            },
+            DefaultFieldNames.DATE: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.DATE,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: False
+            },
+            DefaultFieldNames.NOTE: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.TEXT,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: False
+            },
+            DefaultFieldNames.TAGS: {
+                DatabaseKeys.SCHEMA_TYPE_KEY: FieldType.LIST,
+                DatabaseKeys.SCHEMA_REQUIRED_KEY: False
+            }
+        }
+        self.stateJson = {
+            GameName.TEXAS_HOLDEM: {
+                DatabaseKeys.SCHEMA_KEY: self.schema,
+                DatabaseKeys.ROWS_KEY: {
+                    'id1': {
+                        DefaultFieldNames.NET_EARN: 10,
+                        DefaultFieldNames.DATE: '2022-01-01',
+                        DefaultFieldNames.NOTE: 'ünïcode',
+                        DefaultFieldNames.TAGS: ['tag1', 'tag2'],
+                    },
+                    'id2': {
+                        DefaultFieldNames.NET_EARN: -2.5,
+                        DefaultFieldNames.NOTE: None,
+                        'UNKNOWN FIELD': { 'nested': [1, 2] },
+                    },
+                    'id3': {
+                        DefaultFieldNames.NET_EARN: 0,
+                        DefaultFieldNames.DATE: '2022-01-01',
+                        DefaultFieldNames.TAGS: [],
+                    },
+                }
+            },
+            GameName.PLO: {
+                DatabaseKeys.SCHEMA_KEY: self.schema,
+                DatabaseKeys.ROWS_KEY: {}
+            },
+            GameName.AOE4: {}
+        }
+        self.snapshot_db = SnapshotDatabase(filename=test_filename)
+        self.snapshot_db.write_data_to_disk(self.stateJson)
+
+    def tearDown(self):
+        for filename in (test_filename, test_json_filename, self.snapshot_db.lockFilename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class TestSnapshotFormat(SnapshotDatabaseTests):
+
+    # Test Case: snapshot should restore exactly the data it was written from
+    def test_round_trip(self):
+        self.assertDictEqual(self.snapshot_db.read_data_to_memory(), self.stateJson)
+        self.assertEqual(type(self.snapshot_db.get_all_rows(GameName.TEXAS_HOLDEM)['id1'][DefaultFieldNames.NET_EARN]), int)
+
+    # Test Case: should convert between the JSON and the snapshot format
+    def test_convert(self):
+        snapshot_to_json(test_filename, test_json_filename)
+        self.assertDictEqual(JSONDatabase(test_json_filename).read_data_to_memory(), self.stateJson)
+
+        os.remove(test_filename)
+        json_to_snapshot(test_json_filename, test_filename)
+        self.assertDictEqual(SnapshotDatabase(test_filename).read_data_to_memory(), self.stateJson)
+
+    # Test Case: a missing or foreign source should raise and leave the target as it was
+    def test_convert_invalid_source(self):
+        snapshot_to_json(test_filename, test_json_filename)
+        with open(test_json_filename, 'rb') as f:
+            jsonContent = f.read()
+        with open(test_filename, 'rb') as f:
+            snapshotContent = f.read()
+
+        self.assertRaises(FileNotFoundError, snapshot_to_json, 'missing.snapshot', test_json_filename)
+        self.assertRaises(FileNotFoundError, json_to_snapshot, 'missing.json', test_filename)
+        self.assertRaises(ValueError, snapshot_to_json, test_json_filename, test_json_filename)
+        self.assertRaises(ValueError, json_to_snapshot, test_filename, test_filename)
+        with open(test_json_filename, 'rb') as f:
+            self.assertEqual(f.read(), jsonContent)
+        with open(test_filename, 'rb') as f:
+            self.assertEqual(f.read(), snapshotContent)
+
+    # Test Case: the snapshot should be unmapped before a write replaces it
+    def test_write_closes_mapping(self):
+        self.assertTrue(self.snapshot_db.map_snapshot())
+        mapping = self.snapshot_db.mapping
+        self.snapshot_db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 3 })
+        self.assertTrue(mapping.closed)
+        self.assertEqual(len(self.snapshot_db.get_all_rows(GameName.PLO)), 1)
+
+    # Test Case: NUMBER columns should be readable without decoding rows
+    def test_number_views(self):
+        table = self.snapshot_db.get_snapshot_table(GameName.TEXAS_HOLDEM)
+        states, values = table.get_number_views(DefaultFieldNames.NET_EARN)
+        self.assertEqual(list(values), [10, -2.5, 0])
+        self.assertIs(values.obj, table.buffer.obj)
+
+        # TEXT values are stored once per distinct value
+        dateLocation = table.entry['columns'][DefaultFieldNames.DATE]
+        self.assertEqual(dateLocation['count'], 1)
+
+    # Test Case: should treat a missing or foreign file like JSONDatabase does
+    def test_missing_or_corrupt_file(self):
+        os.remove(test_filename)
+        self.assertDictEqual(self.snapshot_db.read_data_to_memory(), {})
+        self.assertEqual(self.snapshot_db.get_all_table_names(), [])
+
+        with open(test_filename, 'w') as f:
+            f.write('{ "key": "value" }')
+        self.assertDictEqual(self.snapshot_db.read_data_to_memory(), {})
+
+
+class TestSnapshotRowAPI(SnapshotDatabaseTests):
+
+    # Test Case: table and row APIs should work on the snapshot
+    def test_row_api(self):
+        self.assertCountEqual(self.snapshot_db.get_all_table_names(), [GameName.TEXAS_HOLDEM, GameName.PLO, GameName.AOE4])
+        self.assertEqual(len(self.snapshot_db.get_table_schema(GameName.PLO)), 4)
+        self.assertRaises(ValueError, self.snapshot_db.get_table_schema, 'non-existing table')
+
+        _id = self.snapshot_db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 3 })
+        self.assertDictEqual(self.snapshot_db.get_all_rows(GameName.PLO), { _id: { DefaultFieldNames.NET_EARN: 3 } })
+        self.assertTrue(self.snapshot_db.delete_row(GameName.TEXAS_HOLDEM, 'id2'))
+        self.assertFalse(self.snapshot_db.delete_row(GameName.TEXAS_HOLDEM, 'id2'))
+
+        filters = VisualizeFilters({
+            DefaultFieldNames.TAGS: [FilterCondition(FilterOperator.CONTAINS, 'tag1')]
+        })
+        self.assertCountEqual(self.snapshot_db.get_rows_with_filter(GameName.TEXAS_HOLDEM, filters), ['id1'])
+
+    # Test Case: a table's version should change with writes to it, but not with writes to other tables
+    def test_get_table_version(self):
+        holdemVersion = self.snapshot_db.get_table_version(GameName.TEXAS_HOLDEM)
+        self.assertIsNotNone(holdemVersion)
+        self.snapshot_db.insert_row(GameName.PLO, { DefaultFieldNames.NET_EARN: 3 })
+        ploVersion = self.snapshot_db.get_table_version(GameName.PLO)
+        self.snapshot_db.delete_row(GameName.TEXAS_HOLDEM, 'id2')
+        self.assertEqual(self.snapshot_db.get_table_version(GameName.PLO), ploVersion)
+        self.assertNotEqual(self.snapshot_db.get_table_version(GameName.TEXAS_HOLDEM), holdemVersion)
+        self.assertIsNone(self.snapshot_db.get_table_version('non-existing table'))
+
+    # Test Case: Backend should run on the snapshot database
+    def test_backend(self):
+        backend = Backend(db=SnapshotDatabase, dbFileName=test_filename)
+        game = backend.construct_game_from_db(GameName.PLO)
+        _id = backend.add_session(Session(game, { DefaultFieldNames.NET_EARN: '7', DefaultFieldNames.TAGS: 'a,b' }))
+        self.assertTrue(backend.get_session_by_id(GameName.PLO, _id).equals(
+            Session(game, { DefaultFieldNames.NET_EARN: 7, DefaultFieldNames.TAGS: ['a', 'b'] })
+        ))
+        self.assertCountEqual(backend.get_all_games(), [GameName.TEXAS_HOLDEM, GameName.PLO, GameName.AOE4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+import os
+import datetime
+
+import openpyxl
+
+import import_data
+from backend import Backend
+from benchmarks.startup import measure_import_times, find_heavy_imports
+from definitions import GameName, DefaultFieldNames, CustomFieldNames, FieldDefinition, FieldType
+
+
+test_filename = 'test_filename.json'
+test_workbook_filename = 'test_workbook.xlsx'
+
+class TestImportLegacyData(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Mock a workbook in the legacy layout
+        wb = openpyxl.Workbook()
+        sheet = wb.active
+        sheet['F1'] = 'Global'
+        sheet['J1'] = 'SanMateo(RMB)'
+        sheet['M1'] = 'Home'
+
+        # Global block: unrecorded sessions, then withdrawn diff, account diff and note
+        sheet['F7'], sheet['G7'] = 10, 5
+        sheet['E8'], sheet['G8'], sheet['H8'] = datetime.datetime(2021, 6, 1), 20, 'deposit'
+        sheet['F9'], sheet['G9'] = 50, -50
+
+        # Normal blocks: date, net earn and note
+        sheet['I5'], sheet['J5'], sheet['K5'] = datetime.datetime(2021, 6, 2), 100, 'good'
+        sheet['I6'], sheet['J6'] = datetime.datetime(2021, 6, 3), -30
+        sheet['L5'], sheet['M5'] = datetime.datetime(2021, 6, 4), 7
+        wb.save(test_workbook_filename)
+
+        import_data.backend = Backend(dbFileName=test_filename)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(test_filename)
+        os.remove(test_workbook_filename)
+
+    # Test Case: import_legacy_data should stream every column block into the database
+    def test_import_legacy_data(self):
+        progress = []
+        imported = import_data.import_legacy_data(test_workbook_filename, batchSize=2, reportProgress=progress.append)
+        self.assertEqual(imported, 6)
+        self.assertEqual(progress, [2, 4, 6])
+
+        sessions = import_data.backend.get_sessions(GameName.TEXAS_HOLDEM, _filter=None).values()
+        actualValues = sorted(
+            (
+                s.get_values()[CustomFieldNames.OCCASION],
+                s.get_values()[DefaultFieldNames.DATE],
+                s.get_values()[DefaultFieldNames.NET_EARN],
+                s.get_values()[CustomFieldNames.CURRENCY],
+                tuple(s.get_values().get(DefaultFieldNames.TAGS) or [])
+            ) for s in sessions
+        )
+        self.assertEqual(actualValues, [
+            ('Global', '2021-05-14', 15, 'USD', ()),
+            ('Global', '2021-06-01', 0, 'USD', ('Withdraw',)),
+            ('Global', '2021-06-01', 20, 'USD', ()),
+            ('Home', '2021-06-04', 7, 'USD', ()),
+            ('SanMateo(RMB)', '2021-06-02', 100, 'RMB', ()),
+            ('SanMateo(RMB)', '2021-06-03', -30, 'RMB', ()),
+        ])
+
+
+class TestAddSessionRecords(unittest.TestCase):
+
+    def setUp(self):
+        import_data.backend = Backend(dbFileName=test_filename)
+        import_data.backend.reset_database()
+        import_data.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT, required=True)
+        ])
+
+    def tearDown(self):
+        os.remove(test_filename)
+
+    def get_net_earns(self):
+        rows = import_data.backend.db.get_all_rows(GameName.TEXAS_HOLDEM).values()
+        return sorted(row[DefaultFieldNames.NET_EARN] for row in rows)
+
+    # Test Case: should add every valid JSON line and report the others by line number
+    def test_add_jsonl_records(self):
+        lines = [
+            '{"NET EARN": 100, "CURRENCY": "USD", "DATE": "2022-01-01"}\n',
+            '\n',
+            '{"NET EARN": "abc", "CURRENCY": "USD"}\n',
+            'not json\n',
+            '{"NET EARN": -20, "CURRENCY": "RMB", "TAGS": ["a", "b"]}\n',
+            '{"CURRENCY": "USD"}\n',
+        ]
+        added, errors = import_data.add_session_records(GameName.TEXAS_HOLDEM, lines)
+        self.assertEqual(added, 2)
+        self.assertEqual([lineNumber for lineNumber, _ in errors], [3, 4, 6])
+        self.assertEqual(self.get_net_earns(), [-20, 100])
+
+        sessions = import_data.backend.get_sessions(GameName.TEXAS_HOLDEM, _filter=None).values()
+        self.assertCountEqual(
+            [s.get_values()[DefaultFieldNames.DATE] for s in sessions],
+            ['2022-01-01', str(datetime.date.today())]
+        )
+
+    # Test Case: should read CSV with a header row, and add nothing in strict mode if a line is invalid
+    def test_add_csv_records(self):
+        lines = [
+            'NET EARN,CURRENCY,TAGS\n',
+            '10,USD,"a,b"\n',
+            'x,USD,\n',
+        ]
+        added, errors = import_data.add_session_records(GameName.TEXAS_HOLDEM, lines, import_data.RecordFormat.CSV, strict=True)
+        self.assertEqual((added, [lineNumber for lineNumber, _ in errors]), (0, [3]))
+        self.assertEqual(self.get_net_earns(), [])
+
+        added, errors = import_data.add_session_records(GameName.TEXAS_HOLDEM, lines[:2], import_data.RecordFormat.CSV, strict=True)
+        self.assertEqual((added, errors), (1, []))
+        self.assertEqual(self.get_net_earns(), [10])
+
+
+class TestStartup(unittest.TestCase):
+
+    # Test Case: importing the CLI should leave heavy modules to the commands which use them
+    def test_no_heavy_imports(self):
+        self.assertEqual(find_heavy_imports(measure_import_times('import_data')), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
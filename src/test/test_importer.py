@@ -0,0 +1,151 @@
+import unittest
+import os
+import csv
+
+import openpyxl
+
+from backend import Backend
+from definitions import FieldDefinition, FieldType, GameName, \
+    DefaultFieldNames, CustomFieldNames
+from importer import ImportSpec, ImportPipeline
+from importer.spec import column_letter_to_index
+
+
+test_filename = 'test_filename.json'
+test_csv_filename = 'test_import.csv'
+test_xlsx_filename = 'test_import.xlsx'
+test_errors_filename = 'test_errors.csv'
+
+EXPORT_ROWS = [
+    ['Day', 'Profit', 'Hours', 'Comment', 'Friends'],
+    ['2022-01-01', '100', '2', 'good', 'alan,bella'],
+    ['2022-01-02', 'lots', '1', 'typo', ''],
+    ['', '', '', '', ''],
+    ['2022-01-03', '-50', '', '', 'cora'],
+    ['yesterday', '10', '1', '', ''],
+]
+
+class ImporterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.backend.add_game(GameName.PLO, [
+            FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT, required=True),
+            FieldDefinition(CustomFieldNames.PEOPLE, FieldType.LIST)
+        ])
+        self.spec = ImportSpec(GameName.PLO, {
+            DefaultFieldNames.DATE: 'Day',
+            DefaultFieldNames.NET_EARN: '$B',
+            DefaultFieldNames.LENGTH: 3,
+            DefaultFieldNames.NOTE: 'Comment',
+            CustomFieldNames.PEOPLE: 'Friends',
+        }, constants={ CustomFieldNames.CURRENCY: 'USD' })
+
+    def tearDown(self):
+        for filename in (test_filename, test_csv_filename, test_xlsx_filename, test_errors_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def get_imported_values(self):
+        sessions = self.backend.get_sessions(GameName.PLO, _filter=None).values()
+        return sorted(
+            (s.get_values()[DefaultFieldNames.DATE], s.get_values()[DefaultFieldNames.NET_EARN],
+             s.get_values().get(CustomFieldNames.PEOPLE), s.get_values()[CustomFieldNames.CURRENCY])
+            for s in sessions
+        )
+
+    def check_report(self, report):
+        self.assertEqual(report.rowsRead, 4)
+        self.assertEqual(report.imported, 2)
+        self.assertEqual([r.rowNumber for r in report.rejected], [3, 6])
+        self.assertEqual(self.get_imported_values(), [
+            ('2022-01-01', 100, ['alan', 'bella'], 'USD'),
+            ('2022-01-03', -50, ['cora'], 'USD'),
+        ])
+
+
+class TestImportSpec(ImporterTests):
+
+    # Test Case: column letters of any length should resolve to indices
+    def test_column_letter_to_index(self):
+        self.assertEqual(column_letter_to_index('A'), 0)
+        self.assertEqual(column_letter_to_index('Z'), 25)
+        self.assertEqual(column_letter_to_index('AA'), 26)
+        self.assertEqual(column_letter_to_index('AZ'), 51)
+        self.assertEqual(column_letter_to_index('ZZ'), 701)
+        self.assertEqual(column_letter_to_index('AAA'), 702)
+
+    # Test Case: should resolve header names, letters and indices
+    def test_resolve_column_indices(self):
+        self.assertDictEqual(self.spec.resolve_column_indices(EXPORT_ROWS[0]), {
+            DefaultFieldNames.DATE: 0,
+            DefaultFieldNames.NET_EARN: 1,
+            DefaultFieldNames.LENGTH: 2,
+            DefaultFieldNames.NOTE: 3,
+            CustomFieldNames.PEOPLE: 4,
+        })
+        self.assertRaises(ValueError, self.spec.resolve_column_indices, ['Day'])
+
+    # Test Case: only marked columns are column letters, short upper case header names are header names
+    def test_resolve_column_letters(self):
+        spec = ImportSpec(GameName.PLO, { DefaultFieldNames.NOTE: 'PNL', DefaultFieldNames.NET_EARN: '$c' })
+        self.assertDictEqual(spec.resolve_column_indices(['Day', 'Hours', 'PNL']), {
+            DefaultFieldNames.NOTE: 2,
+            DefaultFieldNames.NET_EARN: 2,
+        })
+        self.assertRaises(ValueError, spec.resolve_column_indices, ['Day', 'Hours'])
+
+    # Test Case: should refuse specs mapping fields the Game does not define
+    def test_verify_fields(self):
+        spec = ImportSpec(GameName.PLO, { 'STAKES': 'Stakes' })
+        game = self.backend.construct_game_from_db(GameName.PLO)
+        self.assertRaises(ValueError, spec.verify_fields, game)
+        self.spec.verify_fields(game)
+
+
+class TestImportPipeline(ImporterTests):
+
+    # Test Case: should import valid CSV rows and report rejected ones
+    def test_import_csv(self):
+        with open(test_csv_filename, 'w', newline='') as f:
+            csv.writer(f).writerows(EXPORT_ROWS)
+
+        report = ImportPipeline(self.backend, self.spec, workers=1).run(test_csv_filename)
+        self.check_report(report)
+
+        report.write_error_report(test_errors_filename)
+        with open(test_errors_filename) as f:
+            errorRows = list(csv.reader(f))
+        self.assertEqual(errorRows[0][:2], ['ROW', 'ERROR'])
+        self.assertEqual([r[0] for r in errorRows[1:]], ['3', '6'])
+
+    # Test Case: should refuse files without the spec's header row
+    def test_missing_header_row(self):
+        with open(test_csv_filename, 'w', newline='') as f:
+            csv.writer(f).writerows(EXPORT_ROWS)
+
+        for spec in (
+            ImportSpec(GameName.PLO, self.spec.columns, self.spec.constants, headerRow=len(EXPORT_ROWS) + 1),
+            ImportSpec(GameName.PLO, self.spec.columns, self.spec.constants, headerRow=3, firstDataRow=2),
+        ):
+            with self.assertRaisesRegex(ValueError, f'header row {spec.headerRow} was not found'):
+                ImportPipeline(self.backend, spec, workers=1).run(test_csv_filename)
+        self.assertEqual(self.backend.db.get_all_rows(GameName.PLO), {})
+
+    # Test Case: should import XLSX rows in batches validated by worker processes
+    def test_import_xlsx_in_parallel(self):
+        wb = openpyxl.Workbook()
+        for row in EXPORT_ROWS:
+            wb.active.append([cell or None for cell in row])
+        wb.save(test_xlsx_filename)
+
+        progress = []
+        pipeline = ImportPipeline(self.backend, self.spec, batchSize=2, workers=2, parallelMinRows=2)
+        report = pipeline.run(test_xlsx_filename, lambda r: progress.append(r.rowsRead))
+        self.check_report(report)
+        self.assertEqual(progress, [2, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import pstats
+import unittest
+
+from backend import Backend
+from database import JSONDatabase, ConcurrentDatabase
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator
+from instrumentation import Stats, stats, timed, profiled
+
+
+test_filename = 'test_filename.json'
+test_profile_filename = 'test_profile.prof'
+
+class TestStats(unittest.TestCase):
+
+    # Test Case: a disabled Stats records nothing
+    def test_disabled(self):
+        disabledStats = Stats()
+        disabledStats.count('rows')
+        with disabledStats.timer('read'):
+            pass
+        self.assertEqual(disabledStats.to_dict(), { 'counters': {}, 'timers': {} })
+
+    # Test Case: counters add up and timers count calls
+    def test_enabled(self):
+        enabledStats = Stats(enabled=True)
+        enabledStats.count('rows', 3)
+        enabledStats.count('rows')
+        for _ in range(2):
+            with enabledStats.timer('read'):
+                pass
+        self.assertEqual(enabledStats.get_counters(), { 'rows': 4 })
+        self.assertEqual(enabledStats.get_timers()['read'].calls, 2)
+        self.assertIn('read', enabledStats.report())
+        enabledStats.reset()
+        self.assertEqual(enabledStats.get_counters(), {})
+
+
+class TestHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.wasEnabled = stats.enabled
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True),
+        ])
+        for netEarn in (10, -5, 20):
+            self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: netEarn }))
+        stats.enable()
+        stats.reset()
+
+    def tearDown(self):
+        stats.enabled = self.wasEnabled
+        stats.reset()
+        for filename in (test_filename, test_filename + '.lock', test_profile_filename):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: reads, parsed bytes, scanned and returned rows and validations are counted
+    def test_get_sessions(self):
+        self.backend.get_sessions(GameName.TEXAS_HOLDEM, VisualizeFilters({
+            DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)]
+        }))
+        counters = stats.get_counters()
+        self.assertEqual(counters['database.file_reads'], 2)
+        self.assertEqual(counters['database.bytes_parsed'], 2 * os.path.getsize(test_filename))
+        self.assertEqual(counters['database.rows_scanned'], 3)
+        self.assertEqual(counters['database.rows_returned'], 2)
+        self.assertEqual(counters['session.validations'], 2)
+        timers = stats.get_timers()
+        self.assertEqual(timers['backend.get_sessions'].calls, 1)
+        self.assertEqual(timers['database.filter'].calls, 1)
+
+    # Test Case: ConcurrentDatabase counts reads served from its snapshot
+    def test_snapshot_hits(self):
+        db = ConcurrentDatabase(test_filename)
+        try:
+            for _ in range(3):
+                db.get_all_rows(GameName.TEXAS_HOLDEM)
+        finally:
+            db.close()
+        self.assertEqual(stats.get_counters()['database.snapshot_misses'], 1)
+        self.assertEqual(stats.get_counters()['database.snapshot_hits'], 2)
+
+    # Test Case: a timed function records each call, and nothing while stats are disabled
+    def test_timed(self):
+        timedFunction = timed('test.operation')(lambda x: x + 1)
+        self.assertEqual(timedFunction(1), 2)
+        stats.disable()
+        self.assertEqual(timedFunction(1), 2)
+        self.assertEqual(stats.get_timers()['test.operation'].calls, 1)
+
+    # Test Case: a profiled block is dumped for pstats
+    def test_profiled(self):
+        with profiled(test_profile_filename):
+            JSONDatabase(test_filename).read_data_to_memory()
+        profile = pstats.Stats(test_profile_filename)
+        self.assertTrue(any(name == 'read_data_to_memory' for _, _, name in profile.stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+
+from backend import Backend
+from backend.list_index import build_list_field_index
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, CustomFieldNames
+from instrumentation import stats
+
+
+test_filename = 'test_filename.json'
+
+class TestListFieldIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = build_list_field_index(
+            CustomFieldNames.PEOPLE,
+            ['a', 'b', 'c', 'd', 'e'],
+            [['Alan', 'Bella'], ['Bella'], None, ['Cora', 'Alan', 'Bella', 'Alan'], []],
+            [10, -20, 5, 30, 1],
+            [2, None, 1, 3, 4],
+        )
+
+    # Test Case: postings and aggregates per value, a value listed twice counts once
+    def test_aggregates(self):
+        self.assertEqual(list(self.index.postings), ['Alan', 'Bella', 'Cora'])
+        self.assertEqual(self.index.postings['Bella'].tolist(), [0, 1, 3])
+        alan = self.index.aggregates['Alan']
+        self.assertEqual((alan.sessions, alan.netEarn, alan.hours), (2, 40, 5))
+        bella = self.index.aggregates['Bella']
+        self.assertEqual((bella.sessions, bella.netEarn, bella.hours), (3, 20, 5))
+        self.assertEqual(bella.get_hourly(), 8)
+
+    # Test Case: co-occurrence counts in both directions
+    def test_cooccurrences(self):
+        self.assertEqual(self.index.cooccurrences['Alan'], { 'Bella': 2, 'Cora': 1 })
+        self.assertEqual(self.index.cooccurrences['Bella']['Alan'], 2)
+        self.assertNotIn('Bella', self.index.cooccurrences['Bella'])
+
+    # Test Case: sessions listing every value
+    def test_aggregate_with(self):
+        self.assertEqual(self.index.get_session_ids(['Bella', 'Alan']), ['a', 'd'])
+        self.assertEqual(self.index.aggregate_with(['Cora', 'Bella']).netEarn, 30)
+        self.assertEqual(self.index.aggregate_with(['Dan']).sessions, 0)
+        self.assertEqual(self.index.aggregate_with([]).sessions, 5)
+
+    # Test Case: no sessions list anything
+    def test_empty(self):
+        index = build_list_field_index(DefaultFieldNames.TAGS, ['a'], [None], [1], [None])
+        self.assertEqual(index.postings, {})
+        self.assertEqual(index.aggregates, {})
+        self.assertEqual(index.aggregate_with(['Cash']).sessions, 0)
+
+
+class TestBackendListFieldIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.wasEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.backend.cache_exchange_rate(6.5)
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(CustomFieldNames.PEOPLE, FieldType.LIST),
+        ])
+        for netEarn, people, tags in ((10, ['Alan'], ['Cash']), (-20, ['Alan', 'Bella'], ['Cash', 'Live'])):
+            self.backend.add_session(Session(self.game, {
+                DefaultFieldNames.NET_EARN: netEarn, CustomFieldNames.PEOPLE: people, DefaultFieldNames.TAGS: tags,
+            }))
+
+    def tearDown(self):
+        stats.enabled = self.wasEnabled
+        stats.reset()
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: per person and per tag, cached until the table changes
+    def test_get_list_field_index(self):
+        people = self.backend.get_list_field_index(GameName.TEXAS_HOLDEM, CustomFieldNames.PEOPLE)
+        self.assertEqual(people.aggregates['Alan'].netEarn, -10)
+        self.assertEqual(people.cooccurrences['Bella'], { 'Alan': 1 })
+        self.assertIs(self.backend.get_list_field_index(GameName.TEXAS_HOLDEM, CustomFieldNames.PEOPLE), people)
+        self.assertEqual(stats.get_counters()['backend.analytics_cache_hits'], 1)
+
+        self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: 5, DefaultFieldNames.TAGS: ['Live'] }))
+        tags = self.backend.get_list_field_index(GameName.TEXAS_HOLDEM, DefaultFieldNames.TAGS)
+        self.assertEqual(tags.aggregates['Live'].sessions, 2)
+        self.assertEqual(tags.aggregates['Cash'].netEarn, -10)
+
+    # Test Case: only LIST fields can be indexed
+    def test_get_list_field_index_invalid(self):
+        with self.assertRaises(ValueError):
+            self.backend.get_list_field_index(GameName.TEXAS_HOLDEM, DefaultFieldNames.NOTE)
+        with self.assertRaises(ValueError):
+            self.backend.get_list_field_index(GameName.TEXAS_HOLDEM, 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
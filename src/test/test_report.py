@@ -0,0 +1,115 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from backend import Backend
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, CustomFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator, Currencies
+from report import ReportFormat, load_report_data, render_reports
+
+
+test_filename = 'test_filename.json'
+
+class TestReport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.backend = Backend(dbFileName=test_filename)
+        cls.backend.reset_database()
+        cls.backend.cache_exchange_rate(6.5)
+        game = cls.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT),
+            FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT),
+        ])
+        cls.backend.add_sessions([
+            Session(game, { DefaultFieldNames.NET_EARN: 100, DefaultFieldNames.DATE: '2021-01-05',
+                            DefaultFieldNames.LENGTH: 2, CustomFieldNames.OCCASION: 'Home' }),
+            Session(game, { DefaultFieldNames.NET_EARN: 650, DefaultFieldNames.DATE: '2021-02-01',
+                            CustomFieldNames.OCCASION: 'Casino', CustomFieldNames.CURRENCY: 'RMB' }),
+            Session(game, { DefaultFieldNames.NET_EARN: -50, DefaultFieldNames.DATE: '2021-02-03',
+                            CustomFieldNames.OCCASION: 'Home' }),
+        ])
+
+    @classmethod
+    def tearDownClass(cls):
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def setUp(self):
+        self.outputDirectory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outputDirectory)
+
+    # Test Case: sessions are loaded once, converted, and sliced per filter and per occasion
+    def test_load_report_data(self):
+        reports = load_report_data(self.backend, GameName.TEXAS_HOLDEM, filters={
+            '': None,
+            'Winning': VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)] }),
+        }, byOccasion=True)
+        self.assertEqual([r.title for r in reports], [
+            GameName.TEXAS_HOLDEM, f'{GameName.TEXAS_HOLDEM} - Winning',
+            f'{GameName.TEXAS_HOLDEM} - Casino', f'{GameName.TEXAS_HOLDEM} - Home',
+        ])
+        self.assertEqual(reports[0].currency, Currencies.USD)
+        self.assertEqual(reports[0].netEarns.tolist(), [100, 100, -50])
+        self.assertEqual(len(reports[1].netEarns), 2)
+        self.assertEqual(reports[3].occasions, ['Home', 'Home'])
+
+    # Test Case: sessions are read and converted by the Backend, as its analytics read them
+    def test_load_report_data_through_backend(self):
+        game = self.backend.construct_game_from_db(GameName.TEXAS_HOLDEM)
+        _id = self.backend.add_session(Session(game, { DefaultFieldNames.NET_EARN: 65, DefaultFieldNames.DATE: '2021/2/4',
+                                                       CustomFieldNames.CURRENCY: 'RMB' }))
+        try:
+            winning = VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)] })
+            reports = load_report_data(self.backend, GameName.TEXAS_HOLDEM, filters={ '': None, 'Winning': winning })
+            self.assertEqual(str(reports[0].dates[-1]), '2021-02-04')
+            for data, _filter in zip(reports, (None, winning)):
+                self.assertEqual(data.netEarns.sum(), self.backend.aggregate(GameName.TEXAS_HOLDEM, _filter=_filter)[None].netEarn)
+            self.assertEqual(sorted(reports[0].netEarns.tolist()), sorted(self.backend.get_session_series(GameName.TEXAS_HOLDEM).netEarns.tolist()))
+        finally:
+            self.backend.delete_session(GameName.TEXAS_HOLDEM, _id)
+
+    # Test Case: occasions named like a filter or like each other keep their own report and files
+    def test_colliding_names(self):
+        game = self.backend.construct_game_from_db(GameName.TEXAS_HOLDEM)
+        ids = self.backend.add_sessions([
+            Session(game, { DefaultFieldNames.NET_EARN: 5, DefaultFieldNames.DATE: '2021-03-01', CustomFieldNames.OCCASION: 'Winning' }),
+            Session(game, { DefaultFieldNames.NET_EARN: 5, DefaultFieldNames.DATE: '2021-03-02', CustomFieldNames.OCCASION: 'home' }),
+        ])
+        try:
+            reports = load_report_data(self.backend, GameName.TEXAS_HOLDEM, filters={
+                'Winning': VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.GREATER, 0)] }),
+            }, byOccasion=True)
+            self.assertEqual([(r.name, len(r.netEarns)) for r in reports], [
+                ('texas-hold-em-winning', 4), ('texas-hold-em-casino', 1), ('texas-hold-em-home', 2),
+                ('texas-hold-em-winning-2', 1), ('texas-hold-em-home-2', 1),
+            ])
+            paths = render_reports(reports + reports[:1], self.outputDirectory, [ReportFormat.HTML], workers=1)
+            self.assertEqual(len(set(path for reportPaths in paths for path in reportPaths)), 6)
+        finally:
+            for _id in ids:
+                self.backend.delete_session(GameName.TEXAS_HOLDEM, _id)
+
+    # Test Case: every format is written, in worker processes too
+    def test_render_reports(self):
+        reports = load_report_data(self.backend, GameName.TEXAS_HOLDEM, byOccasion=True)
+        for workers in (1, 2):
+            paths = render_reports(reports, self.outputDirectory, ReportFormat.ALL, workers=workers)
+            self.assertEqual(len(paths), len(reports))
+            for reportPaths in paths:
+                # Three charts as PNG and as SVG, and one HTML page
+                self.assertEqual(len(reportPaths), 7)
+                for path in reportPaths:
+                    self.assertTrue(os.path.getsize(path))
+        with open(os.path.join(self.outputDirectory, 'texas-hold-em.html')) as f:
+            page = f.read()
+        self.assertEqual(page.count('<svg'), 3)
+        self.assertIn('<td>Casino</td>', page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import os
+
+from backend import Backend
+from database import JSONDatabase, ConcurrentDatabase
+from backend.search import TextIndex, parse_query, tokenize
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, CustomFieldNames
+from instrumentation import stats
+
+
+test_filename = 'test_filename.json'
+
+class TestTextIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TextIndex([DefaultFieldNames.NOTE, CustomFieldNames.OCCASION])
+        self.index.add_rows({
+            'a': { DefaultFieldNames.NOTE: 'Bluffed the river, tilted after', CustomFieldNames.OCCASION: 'Home' },
+            'b': { DefaultFieldNames.NOTE: 'Tilting all night' },
+            'c': { DefaultFieldNames.NOTE: 'River card killed me', CustomFieldNames.OCCASION: 'Club' },
+            'd': { DefaultFieldNames.NET_EARN: 5 },
+        })
+
+    # Test Case: words are lowercased, punctuation splits them
+    def test_parse_query(self):
+        self.assertEqual(tokenize("Don't TILT, ever"), ['don', 't', 'tilt', 'ever'])
+        self.assertEqual(tokenize(None), [])
+        self.assertEqual(parse_query('River AND bluff* OR tilt'), [['river', 'bluff*'], ['tilt']])
+        self.assertEqual(parse_query('OR ,'), [])
+
+    # Test Case: AND, OR and prefix terms
+    def test_search(self):
+        self.assertEqual(self.index.search('river'), { 'a', 'c' })
+        self.assertEqual(self.index.search('river home'), { 'a' })
+        self.assertEqual(self.index.search('river AND club'), { 'c' })
+        self.assertEqual(self.index.search('bluffed OR night'), { 'a', 'b' })
+        self.assertEqual(self.index.search('tilt*'), { 'a', 'b' })
+        self.assertEqual(self.index.search('tilt* river'), { 'a' })
+        self.assertEqual(self.index.search('missing'), set())
+        self.assertEqual(self.index.search(''), set())
+
+    # Test Case: sessions are replaced and removed without leaving their terms behind
+    def test_update(self):
+        self.index.add('b', { DefaultFieldNames.NOTE: 'Calm night' })
+        self.assertEqual(self.index.search('tilt*'), { 'a' })
+        self.assertEqual(self.index.search('calm'), { 'b' })
+        self.index.remove('c')
+        self.index.remove('missing')
+        self.assertEqual(self.index.search('river'), { 'a' })
+        self.assertNotIn('killed', self.index.postings)
+        self.assertNotIn('killed', self.index.sortedTerms)
+        self.assertEqual(len(self.index), 2)
+
+
+class TestBackendSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.wasEnabled = stats.enabled
+        stats.enable()
+        stats.reset()
+        self.backend = Backend(dbFileName=test_filename)
+        self.backend.reset_database()
+        self.game = self.backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(CustomFieldNames.OCCASION, FieldType.TEXT),
+        ])
+        self.ids = self.backend.add_sessions([
+            Session(self.game, { DefaultFieldNames.NET_EARN: 10, DefaultFieldNames.NOTE: 'Bluffed the river' }),
+            Session(self.game, { DefaultFieldNames.NET_EARN: -5, DefaultFieldNames.NOTE: 'Tilted', CustomFieldNames.OCCASION: 'club' }),
+        ])
+
+    def tearDown(self):
+        stats.enabled = self.wasEnabled
+        stats.reset()
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    # Test Case: the index is built once, then kept up to date by inserts, edits and deletes
+    def test_search_incremental(self):
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'river OR club'), set(self.ids))
+
+        newId = self.backend.add_session(Session(self.game, { DefaultFieldNames.NET_EARN: 1, DefaultFieldNames.NOTE: 'River again' }))
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'river'), { self.ids[0], newId })
+        self.backend.edit_session(GameName.TEXAS_HOLDEM, self.ids[0], { DefaultFieldNames.NOTE: 'Folded' })
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'riv*'), { newId })
+        self.backend.delete_session(GameName.TEXAS_HOLDEM, newId)
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'river'), set())
+        ids, _ = self.backend.add_session_values(GameName.TEXAS_HOLDEM, [{ DefaultFieldNames.NET_EARN: '3', DefaultFieldNames.NOTE: 'river' }])
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'river'), set(ids))
+
+        self.assertEqual(stats.get_counters()['backend.search_index_builds'], 1)
+
+    # Test Case: writes made by another Backend rebuild the index
+    def test_search_external_write(self):
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'tilted'), { self.ids[1] })
+        Backend(dbFileName=test_filename).delete_session(GameName.TEXAS_HOLDEM, self.ids[1])
+        self.assertEqual(self.backend.search(GameName.TEXAS_HOLDEM, 'tilted'), set())
+        self.assertEqual(stats.get_counters()['backend.search_index_builds'], 2)
+
+    def check_search_two_games(self, db):
+        backend = Backend(db=db, dbFileName=test_filename)
+        try:
+            self.assertEqual(backend.search(GameName.TEXAS_HOLDEM, 'tilted'), { self.ids[1] })
+            plo = backend.add_game(GameName.PLO, [])
+            ploId = backend.add_session(Session(plo, { DefaultFieldNames.NET_EARN: 1, DefaultFieldNames.NOTE: 'Tilted too' }))
+            self.assertEqual(backend.search(GameName.PLO, 'tilted'), { ploId })
+            Backend(dbFileName=test_filename).add_session(Session(plo, { DefaultFieldNames.NET_EARN: 2 }))
+            backend.cache_exchange_rate(7.0)
+            self.assertEqual(backend.search(GameName.TEXAS_HOLDEM, 'tilted'), { self.ids[1] })
+            self.assertEqual(backend.search(GameName.PLO, 'tilted'), { ploId })
+        finally:
+            backend.close()
+        # One build per game, and the PLO index again after the other Backend's write
+        self.assertEqual(stats.get_counters()['backend.search_index_builds'], 3)
+
+    # Test Case: writes to another game or to the exchange rates keep the index of a game
+    def test_search_two_games(self):
+        self.check_search_two_games(JSONDatabase)
+
+    # Test Case: the same holds for a Backend on a ConcurrentDatabase
+    def test_search_two_games_concurrent(self):
+        self.check_search_two_games(ConcurrentDatabase)
+
+
+if __name__ == '__main__':
+    unittest.main()
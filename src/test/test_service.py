@@ -0,0 +1,153 @@
+import unittest
+import os
+import threading
+import http.client
+
+from backend import Backend
+from definitions import Session, FieldDefinition, FieldType, GameName, DefaultFieldNames, CustomFieldNames, \
+    VisualizeFilters, FilterCondition, FilterOperator, Currencies
+from instrumentation import stats
+from service import BackendServer, BackendClient, ServiceError, connect_to_service
+
+
+test_filename = 'test_filename.json'
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        backend = Backend(dbFileName=test_filename)
+        backend.reset_database()
+        backend.cache_exchange_rate(6.4)
+        backend.add_game(GameName.TEXAS_HOLDEM, [
+            FieldDefinition(DefaultFieldNames.NET_EARN, FieldType.NUMBER, required=True),
+            FieldDefinition(CustomFieldNames.CURRENCY, FieldType.TEXT),
+            FieldDefinition(DefaultFieldNames.TAGS, FieldType.LIST),
+        ])
+        cls.server = BackendServer('127.0.0.1', 0, dbFileName=test_filename)
+        cls.serverThread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.serverThread.start()
+        cls.port = cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        for filename in (test_filename, test_filename + '.lock'):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def setUp(self):
+        self.client = BackendClient('127.0.0.1', self.port)
+
+    def tearDown(self):
+        self.client.close()
+
+    # Test Case: sessions should be added, read, filtered and deleted over one connection
+    def test_session_endpoints(self):
+        game = self.client.construct_game_from_db(GameName.TEXAS_HOLDEM)
+        self.assertIn(GameName.TEXAS_HOLDEM, self.client.get_all_games())
+        firstId = self.client.add_session(Session(game, { DefaultFieldNames.NET_EARN: 64, CustomFieldNames.CURRENCY: 'RMB', DefaultFieldNames.TAGS: 'a,b' }))
+        secondId = self.client.add_session(Session(game, { DefaultFieldNames.NET_EARN: -5 }))
+        connection = self.client.connection.sock
+
+        session = self.client.get_session_by_id(GameName.TEXAS_HOLDEM, firstId)
+        self.assertEqual(session.get_values()[DefaultFieldNames.TAGS], ['a', 'b'])
+        filters = VisualizeFilters({ DefaultFieldNames.NET_EARN: [FilterCondition(FilterOperator.LESS, 0)] })
+        self.assertCountEqual(self.client.get_sessions(GameName.TEXAS_HOLDEM, filters), [secondId])
+
+        aggregates = self.client.aggregate(GameName.TEXAS_HOLDEM, groupBy=CustomFieldNames.CURRENCY)
+        self.assertEqual(aggregates['RMB'].netEarn, 10)
+        self.assertEqual(aggregates[None].netEarn, -5)
+        self.assertEqual(list(self.client.convert([64, 1], ['RMB', Currencies.USD])), [10, 1])
+
+        self.assertTrue(self.client.delete_session(GameName.TEXAS_HOLDEM, secondId))
+        self.assertIsNone(self.client.delete_session(GameName.TEXAS_HOLDEM, secondId))
+        self.assertFalse(self.client.get_session_by_id(GameName.TEXAS_HOLDEM, secondId))
+
+        # Every request reused the connection
+        self.assertIs(self.client.connection.sock, connection)
+
+        # Writes land in the shared database file
+        self.assertCountEqual(Backend(dbFileName=test_filename).get_sessions(GameName.TEXAS_HOLDEM, None), [firstId])
+
+    # Test Case: invalid requests should raise ValueError and keep the connection usable
+    def test_invalid_requests(self):
+        self.assertRaises(ValueError, self.client.construct_game_from_db, 'non-existing game')
+        game = self.client.construct_game_from_db(GameName.TEXAS_HOLDEM)
+        session = Session(game, { DefaultFieldNames.NET_EARN: 1 })
+        del session.get_values()[DefaultFieldNames.NET_EARN]
+        self.assertRaises(ValueError, self.client.add_session, session)
+        self.assertRaises(ValueError, self.client.aggregate, GameName.TEXAS_HOLDEM, groupBy=DefaultFieldNames.TAGS)
+        self.assertTrue(self.client.is_available())
+
+    # Test Case: missing body fields are invalid requests, failures of the service are errors of the service
+    def test_error_statuses(self):
+        self.assertRaises(ValueError, self.client.request, 'POST', self.client.game_path(GameName.TEXAS_HOLDEM, 'sessions'), {})
+        self.assertRaises(ValueError, self.client.request, 'POST', '/convert', [1])
+
+        def fail():
+            raise KeyError('games')
+        self.server.backend.get_all_games = fail
+        self.addCleanup(delattr, self.server.backend, 'get_all_games')
+        with self.assertRaisesRegex(ServiceError, 'status 500: KeyError'):
+            self.client.get_all_games()
+        # The connection is still answered
+        self.assertTrue(self.client.is_available())
+
+    # Test Case: only GET requests are resent after the service dropped the connection
+    def test_retries(self):
+        # Drops the first request, passes the others on to the real connection
+        class DroppedConnection:
+            def __init__(self, connection):
+                self.connection = connection
+                self.requests = []
+            def request(self, method, *args, **kwargs):
+                self.requests.append(method)
+                if len(self.requests) == 1:
+                    raise http.client.RemoteDisconnected('dropped')
+                self.connection.request(method, *args, **kwargs)
+            def getresponse(self):
+                return self.connection.getresponse()
+            def close(self):
+                self.connection.close()
+
+        game = self.client.construct_game_from_db(GameName.TEXAS_HOLDEM)
+        realConnection = self.client.connection
+        self.client.connection = dropped = DroppedConnection(realConnection)
+        self.assertIn(GameName.TEXAS_HOLDEM, self.client.get_all_games())
+        self.assertEqual(dropped.requests, ['GET', 'GET'])
+
+        self.client.connection = dropped = DroppedConnection(realConnection)
+        self.assertRaises(http.client.RemoteDisconnected, self.client.add_session,
+                          Session(game, { DefaultFieldNames.NET_EARN: 1 }))
+        self.assertEqual(dropped.requests, ['POST'])
+
+    # Test Case: connect_to_service should find a running service only
+    def test_connect_to_service(self):
+        client = connect_to_service('127.0.0.1', self.port)
+        self.assertIsInstance(client, BackendClient)
+        client.close()
+
+        unusedPort = BackendServer('127.0.0.1', 0, backend=Backend(dbFileName=test_filename))
+        port = unusedPort.server_address[1]
+        unusedPort.server_close()
+        self.assertIsNone(connect_to_service('127.0.0.1', port))
+
+    # Test Case: the service reports the stats of its own process
+    def test_stats(self):
+        wasEnabled = stats.enabled
+        stats.enable()
+        try:
+            self.client.reset_stats()
+            self.client.get_sessions(GameName.TEXAS_HOLDEM, None)
+            serviceStats = self.client.get_stats()
+            self.assertTrue(serviceStats['enabled'])
+            self.assertEqual(serviceStats['timers']['backend.get_sessions']['calls'], 1)
+        finally:
+            stats.enabled = wasEnabled
+            stats.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from backend.timeseries import Bucket, DownsampleMethod, to_datetime64, sum_by_bucket, \
+    cumulative_by_bucket, downsample, downsample_minmax, downsample_lttb
+
+
+class TestBuckets(unittest.TestCase):
+
+    dates = ['2021-03-02', '2021-03-01', None, '2021-02-28', '2021-03-02', '2021-04-10']
+    values = [1, 2, 4, 8, 16, 32]
+
+    # Test Case: dates are parsed in bulk, None becomes NaT
+    def test_to_datetime64(self):
+        days = to_datetime64(self.dates)
+        self.assertEqual(days.dtype, np.dtype('datetime64[D]'))
+        self.assertTrue(np.isnat(days[2]))
+
+    # Test Case: every format a DATE field accepts is parsed, others raise
+    def test_to_datetime64_formats(self):
+        days = to_datetime64(['2022/01/05', '2022-1-6', None, '2022/1/7', '2022-01-08'])
+        self.assertEqual(days[[0, 1, 3, 4]].tolist(), to_datetime64(['2022-01-05', '2022-01-06', '2022-01-07', '2022-01-08']).tolist())
+        self.assertTrue(np.isnat(days[2]))
+        with self.assertRaises(ValueError):
+            to_datetime64(['2022-01-05', 'January'])
+
+    # Test Case: values are summed per day, in date order, undated values are left out
+    def test_sum_by_day(self):
+        starts, sums = sum_by_bucket(self.dates, self.values)
+        self.assertEqual([str(s) for s in starts], ['2021-02-28', '2021-03-01', '2021-03-02', '2021-04-10'])
+        self.assertEqual(sums.tolist(), [8, 2, 17, 32])
+
+    # Test Case: weeks start on Monday, months on their first day
+    def test_sum_by_week_and_month(self):
+        starts, sums = sum_by_bucket(self.dates, self.values, Bucket.WEEK)
+        self.assertEqual([str(s) for s in starts], ['2021-02-22', '2021-03-01', '2021-04-05'])
+        self.assertEqual(sums.tolist(), [8, 19, 32])
+        starts, sums = sum_by_bucket(self.dates, self.values, Bucket.MONTH)
+        self.assertEqual([str(s) for s in starts], ['2021-02-01', '2021-03-01', '2021-04-01'])
+        self.assertEqual(sums.tolist(), [8, 19, 32])
+
+    # Test Case: the cumulative series ends at the total of the dated values
+    def test_cumulative_by_bucket(self):
+        _, cumulative = cumulative_by_bucket(self.dates, self.values)
+        self.assertEqual(cumulative.tolist(), [8, 10, 27, 59])
+
+    # Test Case: unknown buckets are rejected
+    def test_unknown_bucket(self):
+        with self.assertRaises(ValueError):
+            sum_by_bucket(self.dates, self.values, 'fortnight')
+
+
+class TestDownsample(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.arange('2000-01-01', '2027-05-19', dtype='datetime64[D]')
+        self.y = np.cumsum(np.random.default_rng(0).normal(size=len(self.x)))
+
+    # Test Case: min/max downsampling keeps the extremes and both ends
+    def test_minmax(self):
+        indices = downsample_minmax(self.y, 200)
+        self.assertLessEqual(len(indices), 200)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual(self.y[indices].max(), self.y.max())
+        self.assertEqual(self.y[indices].min(), self.y.min())
+        self.assertEqual((indices[0], indices[-1]), (0, len(self.y) - 1))
+
+    # Test Case: LTTB keeps exactly maxPoints points, in order, on datetime64 x
+    def test_lttb(self):
+        indices = downsample_lttb(self.x, self.y, 200)
+        self.assertEqual(len(indices), 200)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual((indices[0], indices[-1]), (0, len(self.y) - 1))
+
+    # Test Case: short series are drawn in full
+    def test_short_series(self):
+        for method in (DownsampleMethod.MINMAX, DownsampleMethod.LTTB):
+            self.assertEqual(downsample(self.x[:50], self.y[:50], 200, method).tolist(), list(range(50)))
+        with self.assertRaises(ValueError):
+            downsample(self.x, self.y, 200, 'random')
+
+
+if __name__ == '__main__':
+    unittest.main()